@@ -0,0 +1,47 @@
+"""
+סנכרון שעון מול השרת בסגנון NTP.
+
+הלקוח שולח ping עם זמן השליחה המקומי t0, השרת עונה pong עם זמן המשחק של החדר
+(server_ms), והלקוח רושם את זמן הקבלה t3. בהנחה שהדרך הלוך וחזור שוות:
+    offset = server_ms - (t0 + t3) / 2        rtt = t3 - t0
+מדידה עם rtt גבוה (תור עמוס, חבילה שנתקעה) היא גם הפחות מדויקת, ולכן מכל
+החלון האחרון משתמשים במדידה עם ה-rtt הנמוך ביותר (ה-clock filter של NTP).
+"""
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+SAMPLE_WINDOW = 8  # כמה מדידות אחרונות נשמרות
+
+
+class ClockSync:
+    """הפרש השעונים בין זמן המשחק של החדר בשרת לבין השעון המקומי של Game"""
+
+    def __init__(self, window: int = SAMPLE_WINDOW):
+        self.samples: Deque[Tuple[float, float]] = deque(maxlen=window)  # (rtt, offset)
+        self.offset_ms: Optional[float] = None
+        self.rtt_ms: Optional[float] = None
+
+    def add_sample(self, t0: float, server_ms: float, t3: float) -> bool:
+        """רישום pong - False למדידה לא הגיונית (התקבלה לפני שנשלחה)"""
+        rtt = t3 - t0
+        if rtt < 0:
+            return False
+        self.samples.append((rtt, server_ms - (t0 + t3) / 2))
+        self.rtt_ms, self.offset_ms = min(self.samples)
+        return True
+
+    @property
+    def synced(self) -> bool:
+        return self.offset_ms is not None
+
+    def to_local(self, server_ms: Optional[float]) -> Optional[int]:
+        """זמן משחק של השרת -> השעון המקומי (None אם עוד אין מדידה)"""
+        if server_ms is None or self.offset_ms is None:
+            return None
+        return int(round(server_ms - self.offset_ms))
+
+    def to_server(self, local_ms: float) -> Optional[int]:
+        """השעון המקומי -> זמן המשחק של השרת (None אם עוד אין מדידה)"""
+        if self.offset_ms is None:
+            return None
+        return int(round(local_ms + self.offset_ms))
@@ -18,7 +18,11 @@ from ScoreBoard import ScoreBoard
 from VictoryManager import VictoryManager
 from GameMessagesManager import GameMessagesManager
 from SoundManager import SoundManager
-from Physics import LongRestPhysics
+from Physics import LongRestPhysics, MovePhysics
+from MovePredictions import MovePredictions, Prediction, PREDICTION_TIMEOUT_MS
+from TimerWheel import TimerWheel
+import BoardHash
+import LocalBoard
 import asyncio
 import json
 import websockets
@@ -33,6 +37,9 @@ class Game:
         self.piece_factory = PieceFactory(board, pieces_root)
         self.pieces: Dict[str, Piece] = {}
         self.pos_to_piece: Dict[Tuple[int, int], Piece] = {}
+        self.server_board: Dict[str, str] = {}  # מראה של board_state בשרת - מיקום אלגברי -> סוג כלי
+        # מהלכים שהשרת ביצע ועוד לא נחתו בו - משבצת יעד -> משבצת מקור
+        self._server_flights: Dict[str, str] = {}
         self._current_board = None
         self._load_pieces_from_csv(placement_csv)
         
@@ -53,7 +60,19 @@ class Game:
         self._selection_mode2 = "source"
         self._selected_source2: Optional[Tuple[int, int]] = None 
         self._lock = threading.Lock()
+        # מצב הכלים והלוח - הלולאה מחזיקה אותו בעדכון ובציור, והלקוח ביישום אצווה מהשרת
+        self.state_lock = threading.RLock()
         self._running = True
+        # טיימרים של המשחק (ספירה לאחור לניצחון, קידום מושהה) - מופעלים מלולאת run
+        self.timers = TimerWheel(tick_ms=10, now_ms=self.game_time_ms())
+        self._timers_lock = threading.Lock()
+        self._victory_timer = None
+        # המהלכים שלנו שכבר זזים מקומית ומחכים לאישור או לדחייה מהשרת
+        self.predictions = MovePredictions()
+        # מהלכים מהשרת שהלוח כבר כולל וממתינים בבאפר הג'יטר לרגע ההנפשה שלהם
+        self._remote_moves = set()
+        # קידומים שמחכים לטיימר - עד אז הכלי המקומי עוד חייל
+        self._promotions = set()
         self.event_manager = EventManager()
         self.move_history = MoveHistory()
         self.scoreboard = ScoreBoard()
@@ -97,6 +116,36 @@ class Game:
     def game_time_ms(self) -> int:
         return int((time.monotonic() - self.start_time) * 1000)
 
+    def schedule_timer(self, delay_ms: int, kind: str, payload=None):
+        """טיימר שיופעל מלולאת המשחק - אפשר לקרוא מכל חוט"""
+        with self._timers_lock:
+            now = self.game_time_ms()
+            return self.timers.schedule(now + delay_ms, kind, payload, now_ms=now)
+
+    def _fire_timers(self, now_ms: int) -> bool:
+        """הפעלת הטיימרים שזמנם הגיע - False אם צריך לצאת מהלולאה"""
+        with self._timers_lock:
+            fired = self.timers.advance(now_ms)
+        for timer in fired:
+            if timer.kind == "victory_end":
+                return False
+            if timer.kind == "promote":
+                with self.state_lock:
+                    self._promotions.discard(timer)
+                piece, cell = timer.payload
+                self.promote_to_queen(piece, cell)
+            elif timer.kind == "remote_move":
+                with self.state_lock:
+                    if timer in self._remote_moves:
+                        self._remote_moves.discard(timer)
+                        self._animate_server_move(*timer.payload)
+            elif timer.kind == "prediction":
+                with self.state_lock:
+                    if self.predictions.expire(timer.payload):
+                        print(f"⌛ אין תשובה מהשרת על {timer.payload.from_pos} -> {timer.payload.to_pos} - מבטל")
+                        self._roll_back(timer.payload)
+        return True
+
     def clone_board(self) -> Board:
         return self.board.clone()
 
@@ -158,19 +207,18 @@ class Game:
             'message': 'Game Started!'
         }
         self.event_manager.publish("game_start", game_start_data)
-        victory_start_time = None
         while self._running:
             now = self.game_time_ms()
-            if self.victory_manager.is_victory() or self._is_win():
-                if victory_start_time is None:
-                    victory_start_time = time.monotonic()
-                elapsed_time = time.monotonic() - victory_start_time
-                if elapsed_time >= 10.0:
-                    break
+            if self._victory_timer is None and (self.victory_manager.is_victory() or self._is_win()):
+                # עשר שניות של מסך ניצחון ואז יציאה
+                self._victory_timer = self.schedule_timer(10000, "victory_end")
+            if not self._fire_timers(now):
+                break
 
-            for piece in self.pieces.values():
-                piece.update(now)
-            self._update_position_mapping()
+            with self.state_lock:
+                for piece in self.pieces.values():
+                    piece.update(now)
+                self._update_position_mapping()
                 
             while not self.user_input_queue.empty():
                 cmd = self.user_input_queue.get()
@@ -186,6 +234,9 @@ class Game:
                     continue
                 moving_piece = self.pos_to_piece[src_cell]
                 if isinstance(moving_piece._state._physics, LongRestPhysics):
+                    # כלי במנוחה - המהלך נשלח כ-premove, והשרת מבצע אותו ברגע שהמנוחה נגמרת
+                    if cmd.type == "move" and dst_cell != src_cell and moving_piece.get_id()[1:2] == self.player_color[0].upper():
+                        self.send_premove_to_server(cmd.params[0], cmd.params[1], moving_piece.get_id())
                     continue
                 piece_id = moving_piece.get_id()
                 if piece_id.startswith('P'):
@@ -206,6 +257,7 @@ class Game:
                         else:
                             if dr != forward_step or abs(dc) != 1:
                                 continue 
+                captured_piece = None  # כלי היריב שמוסר מקומית - חוזר ללוח אם השרת דוחה את המהלך
                 if dst_cell in self.pos_to_piece:
                     target_piece = self.pos_to_piece[dst_cell]
                     if target_piece.get_id()[1] == moving_piece.get_id()[1]:
@@ -232,6 +284,7 @@ class Game:
                             removed = self.pieces.pop(target_piece.get_unique(), None)
                             
                         removed = self.pieces.pop(target_piece.get_unique(), None)
+                        captured_piece = target_piece
                     
                 path_clear = True
                 dx = dst_cell[1] - src_cell[1]
@@ -274,7 +327,8 @@ class Game:
                     # קפיצה במקום - מבוצעת מקומית
                     moving_piece.on_command(cmd, now)
                 else:
-                    # מהלך אמיתי - נשלח לשרת
+                    # מהלך אמיתי - מתחיל לזוז מיד כניחוש, והשרת מאשר או דוחה אותו
+                    self.predict_move(moving_piece, from_pos, to_pos, now, captured_piece)
                     self.send_move_to_server(from_pos, to_pos, piece_id)
 
                 # הקוד הישן - כבר לא מבוצע מקומית
@@ -283,7 +337,8 @@ class Game:
 
                 # הקוד למלכה נועבר לשרת
 
-            self._draw()
+            with self.state_lock:
+                self._draw()
 
             cv2.imshow("Chess", self._current_board.img.img)
             cv2.waitKey(1)
@@ -783,37 +838,187 @@ class Game:
             
         print(f"✅ חייל קודם בהצלחה: {old_id} -> {new_id}")
 
+    def predict_move(self, piece: Piece, from_pos: str, to_pos: str, now_ms: int, captured: Optional[Piece] = None):
+        """
+        מהלך שלנו מתחיל לזוז מיד, בלי לחכות ל-move_executed מהשרת (rtt שלם).
+        נרשם כמהלך בהמתנה - גם אם האנימציה לא יכולה להתחיל, כדי שכלי שנלכד מקומית יחזור בדחייה.
+        """
+        with self.state_lock:
+            prediction = Prediction(from_pos, to_pos, piece, now_ms, captured=captured)
+            move_cmd = Command(timestamp=now_ms, piece_id=piece.get_id(), type="move", params=[from_pos, to_pos])
+            if piece.is_command_possible(move_cmd):
+                prediction.idle_state = piece._state
+                piece.on_command(move_cmd, now_ms)
+            prediction.timer = self.schedule_timer(PREDICTION_TIMEOUT_MS, "prediction", prediction)
+            self.predictions.add(prediction)
+
+    def reject_prediction(self, from_pos: Optional[str] = None, to_pos: Optional[str] = None):
+        """השרת דחה מהלך שלנו (או שלא נשלח) - הכלי חוזר למקום שממנו יצא"""
+        with self.state_lock:
+            prediction = self.predictions.reject(from_pos, to_pos)
+            if prediction is not None:
+                self._roll_back(prediction)
+
+    def _roll_back(self, prediction: Prediction):
+        """ביטול מהלך שנוחש - הכלי במצב המנוחה במשבצת המקור, והכלי שנלכד מקומית חוזר"""
+        with self._timers_lock:
+            self.timers.cancel(prediction.timer)
+        piece = prediction.piece
+        from_cell = self.board.algebraic_to_cell(prediction.from_pos)
+        if prediction.idle_state is not None:
+            idle_cmd = Command(self.game_time_ms(), piece.get_id(), "idle", [from_cell, from_cell])
+            piece._current_cmd = idle_cmd
+            piece._state = prediction.idle_state
+            piece._state.reset(idle_cmd)
+        captured = prediction.captured
+        if captured is not None and captured.get_unique() not in self.pieces:
+            self.pieces[captured.get_unique()] = captured
+        print(f"↩️ המהלך {prediction.from_pos} -> {prediction.to_pos} בוטל - {piece.get_id()} חזר ל-{prediction.from_pos}")
+
+    def _confirm_prediction(self, from_pos: str, to_pos: str, departed_ms: Optional[int]) -> Optional[Piece]:
+        """
+        move_executed על מהלך שכבר רץ מקומית - לא מתחילים אותו מחדש, רק מעגנים את
+        האנימציה לזמן היציאה בשרת. None אם המהלך לא נוחש (או שהאנימציה לא התחילה).
+        """
+        with self.state_lock:
+            prediction = self.predictions.confirm(from_pos, to_pos)
+            if prediction is None:
+                return None
+            with self._timers_lock:
+                self.timers.cancel(prediction.timer)
+            if prediction.idle_state is None:
+                return None
+            physics = prediction.piece._state._physics
+            if isinstance(physics, MovePhysics) and not physics.finished and physics.start_time is not None:
+                physics.start_time = MovePredictions.anchor(physics.start_time, departed_ms)
+            return prediction.piece
+
     def apply_board_state(self, board_state: Dict[str, str]):
-        """יישום מצב לוח מהשרת"""
+        """יישום מצב לוח מלא מהשרת"""
+        # המצב המלא הוא האמת - מהלכים שעוד חיכו (לתשובה או בבאפר הג'יטר) כבר כלולים בו (או לא).
+        # כלים שנלכדו רק מקומית חוזרים למאגר, והשיבוץ למטה מחליט אם הם עוד על הלוח
+        with self._timers_lock:
+            for timer in self._remote_moves:
+                self.timers.cancel(timer)
+        self._remote_moves.clear()
+        for prediction in self.predictions.clear():
+            with self._timers_lock:
+                self.timers.cancel(prediction.timer)
+            captured = prediction.captured
+            if captured is not None and captured.get_unique() not in self.pieces:
+                self.pieces[captured.get_unique()] = captured
+        self.server_board = {pos: piece_type for pos, piece_type in board_state.items() if piece_type}
+        self._server_flights.clear()
+        wanted = {self.board.algebraic_to_cell(pos): piece_type for pos, piece_type in self.server_board.items()}
+        
         # ניקוי המיפוי הנוכחי
         self.pos_to_piece.clear()
+        unplaced = []
         
-        # עדכון הכלים לפי המצב החדש
-        for algebraic_pos, piece_id in board_state.items():
-            if piece_id:
-                cell = self.board.algebraic_to_cell(algebraic_pos)
-                # חיפוש הכלי במבנה הנתונים
-                for piece in self.pieces.values():
-                    if piece.get_id() == piece_id:
-                        # עדכון המיקום של הכלי
-                        piece._state._physics.start_cell = cell
-                        piece._state._physics.pos = piece._state._physics.board.cell_to_world(cell)
-                        self.pos_to_piece[cell] = piece
-                        break
-
-    def apply_server_move(self, from_pos: str, to_pos: str, piece_id: str, captured_piece: str = None, promoted: bool = False):
-        """יישום מהלך שהגיע מהשרת"""
+        # כלים שכבר עומדים במקום הנכון נשארים כמו שהם
+        for piece in self.pieces.values():
+            cell = piece._state._physics.get_pos_in_cell()
+            if wanted.get(cell) == piece.get_id().split('_')[0] and cell not in self.pos_to_piece:
+                self.pos_to_piece[cell] = piece
+            else:
+                unplaced.append(piece)
+        
+        # שאר המשבצות מקבלות כלי פנוי מאותו סוג
+        for cell, piece_type in wanted.items():
+            if cell in self.pos_to_piece:
+                continue
+            for piece in unplaced:
+                if piece.get_id().split('_')[0] == piece_type:
+                    unplaced.remove(piece)
+                    # עדכון המיקום של הכלי
+                    piece._state._physics.start_cell = cell
+                    piece._state._physics.pos = piece._state._physics.board.cell_to_world(cell)
+                    self.pos_to_piece[cell] = piece
+                    break
+        
+        # כלים שלא מופיעים במצב של השרת נלכדו
+        for piece in unplaced:
+            self.pieces.pop(piece.get_unique(), None)
+
+    def apply_board_delta(self, changes: Dict[str, Optional[str]]):
+        """עדכון המראה של לוח השרת לפי משבצות שהשתנו בלבד - כלי שהוצב ביעד שלו נחת"""
+        for pos, piece_type in changes.items():
+            if piece_type:
+                self.server_board[pos] = piece_type
+                self._server_flights.pop(pos, None)
+            else:
+                self.server_board.pop(pos, None)
+
+    def local_board(self) -> Dict[str, str]:
+        """הלוח לפי הכלים שעל המסך - משבצות שבאמצע מעבר לפי המראה של השרת (LocalBoard)"""
+        with self.state_lock:
+            in_transit = set(self._server_flights)
+            in_transit.update(self._server_flights.values())
+            for prediction in self.predictions.pending.values():
+                in_transit.update((prediction.from_pos, prediction.to_pos))
+            for timer in self._promotions:
+                in_transit.add(self.board.cell_to_algebraic(timer.payload[1]))
+            return LocalBoard.local_board(self.pieces.values(), self.board, self.server_board, in_transit)
+
+    @property
+    def board_hash(self) -> int:
+        """גיבוב Zobrist של הלוח המקומי - מה שהלקוח מצייר, לא רק מה שהשרת שלח"""
+        return BoardHash.hash_board(self.local_board())
+
+    def apply_server_move(self, from_pos: str, to_pos: str, piece_id: str, captured_piece: str = None, promoted: bool = False,
+                          changes: Optional[Dict[str, Optional[str]]] = None, departed_ms: Optional[int] = None):
+        """
+        יישום מהלך שהגיע מהשרת.
+        departed_ms - רגע היציאה בשרת בשעון של המשחק המקומי (לפי סנכרון השעון):
+        האנימציה מתחילה ממנו, כך שהכלי נמצא באמצע הדרך כמו בשרת ולא מאחר ב-rtt.
+        """
+        self.apply_board_delta(changes or {from_pos: None, to_pos: piece_id})
+        self._animate_server_move(from_pos, to_pos, piece_id, promoted, departed_ms)
+
+    def schedule_remote_move(self, from_pos: str, to_pos: str, piece_id: str, captured_piece: str = None,
+                             promoted: bool = False, changes: Optional[Dict[str, Optional[str]]] = None,
+                             departed_ms: Optional[int] = None, playout_ms: Optional[int] = None):
+        """
+        מהלך מהשרת דרך באפר הג'יטר: המראה של לוח השרת מתעדכן מיד, והאנימציה
+        מתחילה ב-playout_ms. מהלך שאיחר מעבר לבאפר מתחיל באמצע התנועה, ומהלך שלנו
+        (ניחוש שמחכה לאישור) מאושר מיד לפי departed_ms.
+        """
+        with self.state_lock:
+            now = self.game_time_ms()
+            # הכלי באוויר עד piece_arrived (ואם הוא יוצא שוב מהיעד - הוא כבר נחת שם)
+            self._server_flights.pop(from_pos, None)
+            self._server_flights[to_pos] = from_pos
+            if (from_pos, to_pos) in self.predictions.pending:
+                self.apply_server_move(from_pos, to_pos, piece_id, captured_piece, promoted, changes, departed_ms)
+                return
+            if playout_ms is None or playout_ms <= now:
+                self.apply_server_move(from_pos, to_pos, piece_id, captured_piece, promoted, changes,
+                                       departed_ms if playout_ms is None else playout_ms)
+                return
+            self.apply_board_delta(changes or {from_pos: None, to_pos: piece_id})
+            timer = self.schedule_timer(playout_ms - now, "remote_move", (from_pos, to_pos, piece_id, promoted, playout_ms))
+            self._remote_moves.add(timer)
+
+    def _animate_server_move(self, from_pos: str, to_pos: str, piece_id: str, promoted: bool = False,
+                             departed_ms: Optional[int] = None):
+        """הזזת הכלי על המסך לפי מהלך של השרת (המראה של הלוח כבר עודכן)"""
         from_cell = self.board.algebraic_to_cell(from_pos)
         to_cell = self.board.algebraic_to_cell(to_pos)
         
-        # העברת הכלי
-        if from_cell in self.pos_to_piece:
+        current_time = self.game_time_ms()
+        if departed_ms is not None:
+            current_time = min(current_time, departed_ms)
+        
+        # העברת הכלי - מהלך שלנו שכבר זז מקומית רק מאושר, בלי להתחיל אותו מחדש
+        piece = self._confirm_prediction(from_pos, to_pos, departed_ms)
+        if piece is not None:
+            self.pos_to_piece.pop(from_cell, None)
+            self.pos_to_piece[to_cell] = piece
+        elif from_cell in self.pos_to_piece:
             piece = self.pos_to_piece[from_cell]
             original_piece_id = piece.get_id()
             
             # במקום פשוט להעביר את הכלי, נפעיל את פקודת התזוזה שלו
-            current_time = self.game_time_ms()
-            
             # בדיקה איזה סוג מהלך זה - כל הכלים מקבלים "move" רגיל
             # הפיזיקה תטפל בהבדלים (קפיצה מול החלקה)
             move_cmd = Command(
@@ -837,7 +1042,8 @@ class Game:
                 piece._state._physics.start_cell = to_cell
                 piece._state._physics.pos = piece._state._physics.board.cell_to_world(to_cell)
                 piece.reset(current_time)
-            
+        
+        if piece is not None:
             # טיפול בקידום חייל למלכה אם השרת אמר שצריך
             if promoted:
                 print(f"👑 השרת אמר לקדם חייל במיקום {to_pos}")
@@ -846,13 +1052,8 @@ class Game:
                 if to_cell in self.pos_to_piece:
                     piece_to_promote = self.pos_to_piece[to_cell]
                     print(f"✅ מצאתי כלי לקידום: {piece_to_promote.get_id()}")
-                    # נחכה רגע קצר שהאנימציה תתחיל ואז נקדם
-                    def promote_after_delay():
-                        time.sleep(0.2)  # המתנה קצרה לאנימציה
-                        self.promote_to_queen(piece_to_promote, to_cell)
-                    
-                    import threading
-                    threading.Thread(target=promote_after_delay, daemon=True).start()
+                    # נחכה רגע קצר שהאנימציה תתחיל ואז נקדם (מלולאת המשחק, בלי חוט ישן)
+                    self._promotions.add(self.schedule_timer(200, "promote", (piece_to_promote, to_cell)))
                 else:
                     print(f"❌ לא מצאתי כלי במיקום {to_cell} לקידום")
             
@@ -870,4 +1071,9 @@ class Game:
         """שליחת מהלך לשרת דרך הלקוח"""
         if self.client:
             self.client.send_move_from_thread(from_pos, to_pos, piece_id)
+
+    def send_premove_to_server(self, from_pos: str, to_pos: str, piece_id: str):
+        """שליחת premove לכלי במנוחה - מחליף premove קודם של אותו כלי"""
+        if self.client:
+            self.client.send_move_from_thread(from_pos, to_pos, piece_id, premove=True)
    
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""
+באפר ג'יטר (playout buffer) למהלכים של היריב.
+
+מהלך מהשרת נושא את זמן היציאה שלו (timestamp, בשעון המשחק של החדר). זמן המעבר
+של הודעה הוא arrival - timestamp; ההפרש בין השעונים קבוע ולכן לא משנה - רק
+השינויים בזמן המעבר הם ג'יטר. כל מהלך מתוזמן ל:
+    playout = timestamp + (זמן המעבר המינימלי בחלון) + depth
+כך שמהלכים שהגיעו בפרץ אחד (אצווה, טיק, חבילה שנתקעה) מתחילים לזוז במרווחים
+המקוריים שלהם. depth עוקב אחרי הג'יטר הנמדד (המשערך של RFC 3550):
+    J += (|D| - J) / 16        depth = DEPTH_FACTOR * J
+"""
+from collections import deque
+from typing import Deque, Optional
+
+TRANSIT_WINDOW = 32     # כמה זמני מעבר אחרונים נשמרים לבסיס (המינימום)
+JITTER_GAIN = 1 / 16    # קצב ההתכנסות של משערך הג'יטר (RFC 3550)
+DEPTH_FACTOR = 3.0      # depth = DEPTH_FACTOR * jitter
+MIN_DEPTH_MS = 10
+MAX_DEPTH_MS = 250      # מעבר לזה עדיף לקפוץ לאמצע התנועה מאשר לפגר
+
+
+class JitterBuffer:
+    """מתי להתחיל להנפיש מהלך מרוחק - לפי זמן היציאה שלו בשרת והג'יטר שנמדד"""
+
+    def __init__(self, window: int = TRANSIT_WINDOW, factor: float = DEPTH_FACTOR,
+                 min_depth_ms: float = MIN_DEPTH_MS, max_depth_ms: float = MAX_DEPTH_MS):
+        self.transits: Deque[float] = deque(maxlen=window)
+        self.factor = factor
+        self.min_depth_ms = min_depth_ms
+        self.max_depth_ms = max_depth_ms
+        self.jitter_ms = 0.0
+        self._last_transit: Optional[float] = None
+        self.late = 0  # מהלכים שהגיעו אחרי זמן ההתחלה שלהם (התחילו באמצע התנועה)
+
+    def observe(self, server_ms: float, arrival_ms: float) -> int:
+        """רישום הודעה שהגיעה - מחזיר את זמן ההתחלה שלה בשעון המקומי"""
+        transit = arrival_ms - server_ms
+        if self._last_transit is not None:
+            self.jitter_ms += (abs(transit - self._last_transit) - self.jitter_ms) * JITTER_GAIN
+        self._last_transit = transit
+        self.transits.append(transit)
+        playout = self.playout_ms(server_ms)
+        if playout < arrival_ms:
+            self.late += 1
+        return playout
+
+    @property
+    def depth_ms(self) -> float:
+        return min(self.max_depth_ms, max(self.min_depth_ms, self.factor * self.jitter_ms))
+
+    def playout_ms(self, server_ms: float) -> int:
+        """זמן השרת -> רגע ההתחלה המקומי (אחרי observe אחד לפחות)"""
+        return int(round(server_ms + min(self.transits) + self.depth_ms))
+
+    def reset(self):
+        """שעון חדר חדש (חיבור מחדש, שרת שהתאושש) - הבסיס הישן כבר לא נכון"""
+        self.transits.clear()
+        self.jitter_ms = 0.0
+        self._last_transit = None
@@ -0,0 +1,44 @@
+"""
+הלוח כפי שהלקוח מצייר אותו - ממנו נבנה הגיבוב שנבדק מול השרת.
+
+המראה של לוח השרת (server_board) נבנה רק מההודעות של השרת, ולכן גיבוב שלו לא
+מגלה סטייה של הכלים שעל המסך. כאן הלוח נבנה מהכלים עצמם: כל כלי שעומד נספר
+במשבצת שבה הוא מצויר. משבצות שבאמצע מעבר - כלי בתנועה, מהלך שהשרת ביצע ועוד
+לא נחת, ניחוש שמחכה לתשובה או קידום שעוד לא קרה - נלקחות מהמראה של השרת, כי
+בהן הלקוח והשרת מתעדכנים ברגעים שונים. סטייה במשבצת כזו תתגלה כשהמעבר ייגמר.
+"""
+from typing import Dict, Iterable
+
+from Physics import MovePhysics
+
+
+def is_moving(physics) -> bool:
+    """כלי שבאמצע תנועה - עוד לא הגיע (והשרת לא מחזיק אותו על הלוח)"""
+    return isinstance(physics, MovePhysics) and physics.cmd is not None and not physics.finished
+
+
+def local_board(pieces: Iterable, board, server_board: Dict[str, str], in_transit: Iterable[str]) -> Dict[str, str]:
+    """
+    מיקום אלגברי -> סוג כלי, לפי הכלים המקומיים.
+    in_transit - משבצות שבאמצע מעבר: בהן הערך לקוח מ-server_board.
+    """
+    in_transit = set(in_transit)
+    view, movers = {}, set()
+    for piece in pieces:
+        physics = piece._state._physics
+        if is_moving(physics):
+            in_transit.add(board.cell_to_algebraic(physics.start_cell))
+            in_transit.add(board.cell_to_algebraic(physics.end_cell))
+            continue
+        pos = board.cell_to_algebraic(physics.get_pos_in_cell())
+        # כלי שנחת על כלי שעוד לא הוסר - הנוחת תופס את המשבצת, כמו ב-_update_position_mapping
+        if pos in movers:
+            continue
+        if isinstance(physics, MovePhysics):
+            movers.add(pos)
+        view[pos] = piece.get_id().split('_')[0]
+    for pos in in_transit:
+        view.pop(pos, None)
+        if server_board.get(pos):
+            view[pos] = server_board[pos]
+    return view
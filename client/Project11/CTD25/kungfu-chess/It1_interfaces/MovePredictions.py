@@ -0,0 +1,94 @@
+"""
+ניחוש מהלכים בצד הלקוח (client-side prediction).
+
+מהלך שלנו מתחיל לזוז מיד כשהוא נשלח, בלי לחכות לסיבוב של move_executed מהשרת.
+עד שמגיעה תשובה הוא "מהלך בהמתנה": אישור (move_executed עם אותם from/to) מעגן
+את האנימציה לזמן היציאה בשרת, ודחייה (move_error) או תפוגה מחזירים את הכלי
+למשבצת שממנה יצא ואת הכלי שנלכד מקומית ללוח.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+PREDICTION_TIMEOUT_MS = 3000  # בלי תשובה עד אז - המהלך מבוטל מקומית
+SNAP_THRESHOLD_MS = 40  # הפרש קטן מזה בין היציאה המקומית ליציאה בשרת לא מתוקן
+
+
+class Prediction:
+    """מהלך שהתחיל מקומית - מספיק כדי לאשר אותו או לגלגל אותו אחורה"""
+
+    __slots__ = ("from_pos", "to_pos", "piece", "started_ms", "idle_state", "captured", "timer")
+
+    def __init__(self, from_pos: str, to_pos: str, piece: Any, started_ms: int,
+                 idle_state: Any = None, captured: Any = None):
+        self.from_pos = from_pos
+        self.to_pos = to_pos
+        self.piece = piece
+        self.started_ms = started_ms
+        self.idle_state = idle_state  # המצב של הכלי לפני המהלך - אליו חוזרים בדחייה
+        self.captured = captured      # כלי היריב שהוסר מקומית בגלל המהלך
+        self.timer = None             # טיימר התפוגה של המהלך
+
+
+class MovePredictions:
+    """המהלכים שלנו שמחכים לתשובה מהשרת, לפי (from, to) ובסדר השליחה"""
+
+    def __init__(self):
+        self.pending: Dict[Tuple[str, str], Prediction] = {}
+        self.confirmed = 0
+        self.rolled_back = 0
+
+    def add(self, prediction: Prediction) -> Prediction:
+        # אותו מהלך פעמיים (הראשון לא נענה) - הישן מפנה את מקומו
+        self.pending.pop((prediction.from_pos, prediction.to_pos), None)
+        self.pending[(prediction.from_pos, prediction.to_pos)] = prediction
+        return prediction
+
+    def confirm(self, from_pos: str, to_pos: str) -> Optional[Prediction]:
+        """השרת ביצע את המהלך - None אם הוא לא שלנו (או כבר גולגל אחורה)"""
+        prediction = self.pending.pop((from_pos, to_pos), None)
+        if prediction is not None:
+            self.confirmed += 1
+        return prediction
+
+    def reject(self, from_pos: Optional[str] = None, to_pos: Optional[str] = None) -> Optional[Prediction]:
+        """
+        השרת דחה מהלך. דחייה בלי from/to (שרת ישן) שייכת למהלך הוותיק ביותר,
+        כי השרת עונה על מהלכים של חיבור אחד לפי הסדר.
+        """
+        if from_pos is not None and to_pos is not None:
+            prediction = self.pending.pop((from_pos, to_pos), None)
+        elif self.pending:
+            prediction = self.pending.pop(next(iter(self.pending)))
+        else:
+            prediction = None
+        if prediction is not None:
+            self.rolled_back += 1
+        return prediction
+
+    def expire(self, prediction: Prediction) -> bool:
+        """תפוגה - True רק אם המהלך עוד מחכה (ולא נענה בינתיים)"""
+        key = (prediction.from_pos, prediction.to_pos)
+        if self.pending.get(key) is not prediction:
+            return False
+        del self.pending[key]
+        self.rolled_back += 1
+        return True
+
+    def clear(self) -> List[Prediction]:
+        """מצב מלא מהשרת מחליף הכל - אין יותר מה לאשר"""
+        predictions = list(self.pending.values())
+        self.pending.clear()
+        return predictions
+
+    @staticmethod
+    def anchor(started_ms: int, departed_ms: Optional[int]) -> int:
+        """
+        זמן ההתחלה של האנימציה אחרי אישור. המהלך יצא בשרת מאוחר יותר (חצי rtt),
+        וכדי שהכלי יגיע יחד עם piece_arrived האנימציה נצמדת לזמן של השרת -
+        אלא אם ההפרש קטן מכדי שיורגש, ואז לא מזיזים את הכלי בכלל.
+        """
+        if departed_ms is None or abs(departed_ms - started_ms) < SNAP_THRESHOLD_MS:
+            return started_ms
+        return departed_ms
+
+    def __len__(self) -> int:
+        return len(self.pending)
@@ -60,6 +60,7 @@ from typing import Tuple
 from Command import Command
 from Board import Board
 from Physics import Physics
+from Lockstep import travel_time_ms
 
 
 class MovePhysics(Physics):
@@ -80,13 +81,16 @@ class MovePhysics(Physics):
         self.start_pos = self.board.cell_to_world(self.start_cell)
         self.end_pos = self.board.cell_to_world(self.end_cell)
         self.pos = self.start_pos
-        dist = ((self.end_pos[0] - self.start_pos[0]) ** 2 +
-                (self.end_pos[1] - self.start_pos[1]) ** 2) ** 0.5
-        # חישוב הזמן הנדרש בהתבסס על המרחק והמהירות – החלק של התנועה
-        self.duration_ms = max(1, int((dist / self.speed) * 1000))
+        # חישוב הזמן הנדרש בהתבסס על המרחק והמהירות – החלק של התנועה.
+        # במספרים שלמים, כמו השרת (Lockstep.travel_time_ms) - שני הצדדים מגיעים לאותו ms
+        self.duration_ms = travel_time_ms(round(self.end_pos[0] - self.start_pos[0]),
+                                          round(self.end_pos[1] - self.start_pos[1]),
+                                          round(self.speed))
         # סך כל הזמן כולל העיכוב לאחר התנועה
         self.total_duration_ms = self.duration_ms + self.extra_delay_ms
-        self.start_time = None
+        # התנועה מתחילה בזמן הפקודה - מהלך מהשרת מגיע עם זמן היציאה שלו
+        # (פקודה בלי זמן מתחילה בעדכון הראשון)
+        self.start_time = getattr(cmd, "timestamp", None)
 
     def update(self, now_ms: int) -> Command:
         if self.finished:
@@ -97,11 +101,11 @@ class MovePhysics(Physics):
 
         elapsed = now_ms - self.start_time
         if elapsed < self.duration_ms:
-            # תנועה נורמלית עד היעד – המיקום מתעדכן במגמה ליניארית
-            t = elapsed / self.duration_ms
+            # תנועה נורמלית עד היעד – המיקום מתעדכן במגמה ליניארית,
+            # בפיקסלים שלמים (בלי נקודה צפה) כך שאותו רגע נותן תמיד אותו מיקום
             self.pos = (
-                self.start_pos[0] + t * (self.end_pos[0] - self.start_pos[0]),
-                self.start_pos[1] + t * (self.end_pos[1] - self.start_pos[1])
+                self.start_pos[0] + (self.end_pos[0] - self.start_pos[0]) * elapsed // self.duration_ms,
+                self.start_pos[1] + (self.end_pos[1] - self.start_pos[1]) * elapsed // self.duration_ms
             )
         elif elapsed < self.total_duration_ms:
             # סיימנו את התנועה – המיקום קבוע וממתינים לסיום הזמן הכולל
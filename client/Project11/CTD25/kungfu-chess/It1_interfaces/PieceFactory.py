@@ -1,11 +1,11 @@
 import pathlib
 from typing import Dict, Tuple
-import json
 from Board import Board
+from Graphics import Graphics
 from GraphicsFactory import GraphicsFactory
-from Moves import Moves
 from PhysicsFactory import PhysicsFactory
 from Piece import Piece
+from RulesRegistry import shared_rules
 from State import State
 from Command import Command
 class PieceFactory:
@@ -15,30 +15,31 @@ class PieceFactory:
         self._physics_factory = PhysicsFactory(board)
         self._graphics_factory = GraphicsFactory(board)
         self._templates: Dict[str, Piece] = {}
+        # החוקים וההגדרות נקראים פעם אחת לכל התהליך ומשותפים לכל הכלים
+        self._rules = shared_rules(pieces_root, (board.H_cells, board.W_cells))
+        # התמונות נטענות פעם אחת לכל (סוג כלי, מצב) - כל כלי מקבל Graphics.copy()
+        self._graphics: Dict[Tuple[str, str], Graphics] = {}
         self.counter = {}
     def _build_state_machine(self, piece_dir: pathlib.Path, cell: Tuple[int, int]) -> State:
-        """Build a state machine for a piece from its directory."""
+        """Build a state machine for a piece from the shared rules registry."""
         states: Dict[str, State] = {}
-        moves = Moves(piece_dir / "moves.txt", (self.board.H_cells, self.board.W_cells))
-        states_root = piece_dir / "states"
-        for state_dir in states_root.iterdir():
-            if not state_dir.is_dir():
-                continue
-            state_name = state_dir.name
-            cfg_path = state_dir / "config.json"
-            with open(cfg_path, "r") as f:
-                cfg = json.load(f)
+        spec = self._rules.get(piece_dir.name)
+        if spec is None:
+            raise ValueError(f"Unknown piece type: {piece_dir.name}")
+        for state_name, cfg in spec.configs.items():
             physics = self._physics_factory.create(
                 state_name,
                 cell,
                 cfg["physics"]
             )
-            graphics = self._graphics_factory.load(
-                state_dir / "sprites",
-                cfg["graphics"],
-                (self.board.cell_H_pix, self.board.cell_W_pix)
-            )
-            states[state_name] = State(moves, graphics, physics)
+            key = (spec.piece_type, state_name)
+            if key not in self._graphics:
+                self._graphics[key] = self._graphics_factory.load(
+                    spec.piece_dir / "states" / state_name / "sprites",
+                    cfg["graphics"],
+                    (self.board.cell_H_pix, self.board.cell_W_pix)
+                )
+            states[state_name] = State(spec.moves, self._graphics[key].copy(), physics)
         states["idle"].set_transition("move", states["move"])
         states["idle"].set_transition("jump", states["jump"])
         states["move"].set_transition("long_rest", states["long_rest"])
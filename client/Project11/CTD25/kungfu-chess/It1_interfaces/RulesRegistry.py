@@ -0,0 +1,107 @@
+"""
+חוקי הכלים של כל התהליך - נטענים פעם אחת ומשותפים לכל הכלים.
+
+לכל סוג כלי בתיקיית הכלים, pieces/*/moves.txt נקרא לאובייקט Moves אחד משותף,
+ו-pieces/*/states/*/config.json נקראים פעם אחת. PieceFactory לוקח הכל מכאן,
+כך שיצירת כלי חדש לא קוראת אף קובץ.
+הרישום לא משתנה אחרי הטעינה (MappingProxyType וטבלאות ב-tuple), כך שמותר לשתף
+אותו בין כל הכלים. הטעינה, המהירויות והמטמון לפי תיקייה - כמו ברישום של השרת.
+"""
+import json
+import os
+import pathlib
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+from Moves import Moves
+
+# תיקיית חוקי הכלים - ליד התיקייה של הלקוח, או לפי PIECES_DIR
+PIECES_DIR = pathlib.Path(os.getenv("PIECES_DIR", pathlib.Path(__file__).resolve().parent.parent / "pieces"))
+
+DEFAULT_SPEED_M_PER_SEC = 1.5
+BOARD_DIMS = (8, 8)
+
+
+def load_move_speeds(pieces_dir: pathlib.Path) -> Dict[str, float]:
+    """מהירות התנועה של כל סוג כלי מ-pieces/*/states/move/config.json"""
+    speeds = {}
+    if not pieces_dir.is_dir():
+        return speeds
+    for piece_dir in sorted(pieces_dir.iterdir()):
+        config_file = piece_dir / "states" / "move" / "config.json"
+        if not config_file.exists():
+            continue
+        try:
+            with open(config_file, encoding="utf-8") as f:
+                physics = json.load(f).get("physics", {})
+            speeds[piece_dir.name] = float(physics.get("speed_m_per_sec", DEFAULT_SPEED_M_PER_SEC))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ שגיאה בקריאת {config_file}: {e}")
+    return speeds
+
+
+class PieceSpec:
+    """החוקים וההגדרות של כל מצב עבור סוג כלי אחד (PW, NB, ...)"""
+
+    __slots__ = ("piece_type", "piece_dir", "moves", "configs")
+
+    def __init__(self, piece_type: str, piece_dir: pathlib.Path, moves: Moves,
+                 configs: Mapping[str, Mapping]):
+        self.piece_type = piece_type
+        self.piece_dir = piece_dir
+        self.moves = moves
+        self.configs = configs
+
+
+def _load_spec(piece_dir: pathlib.Path, dims: Tuple[int, int]) -> Optional[PieceSpec]:
+    """חוקי התזוזה וההגדרות של כל המצבים של כלי אחד - None אם זו לא תיקיית כלי"""
+    moves_file = piece_dir / "moves.txt"
+    states_root = piece_dir / "states"
+    if not moves_file.exists() or not states_root.is_dir():
+        return None
+    moves = Moves(moves_file, dims)
+    moves.rules = tuple(moves.rules)
+    configs = {}
+    for state_dir in sorted(states_root.iterdir()):
+        if not state_dir.is_dir():
+            continue
+        with open(state_dir / "config.json", encoding="utf-8") as f:
+            configs[state_dir.name] = MappingProxyType(json.load(f))
+    return PieceSpec(piece_dir.name, piece_dir, moves, MappingProxyType(configs))
+
+
+class RulesRegistry:
+    """חוקי התזוזה, ההגדרות והמהירות של כל סוגי הכלים, לפי סוג כלי (PW, NB, ...) - לקריאה בלבד"""
+
+    def __init__(self, specs: Mapping[str, PieceSpec], move_speeds: Mapping[str, float]):
+        self.specs: Mapping[str, PieceSpec] = MappingProxyType(dict(specs))
+        self.move_speeds: Mapping[str, float] = MappingProxyType(dict(move_speeds))
+
+    @classmethod
+    def load(cls, pieces_dir: pathlib.Path, dims: Tuple[int, int] = BOARD_DIMS) -> "RulesRegistry":
+        pieces_dir = pathlib.Path(pieces_dir)
+        specs = {}
+        for piece_dir in sorted(pieces_dir.iterdir()):
+            spec = _load_spec(piece_dir, dims)
+            if spec is not None:
+                specs[piece_dir.name] = spec
+        return cls(specs, load_move_speeds(pieces_dir))
+
+    @property
+    def piece_types(self):
+        return self.specs.keys()
+
+    def get(self, piece_type: str) -> Optional[PieceSpec]:
+        return self.specs.get(piece_type)
+
+
+_registries: Dict[Tuple[pathlib.Path, Tuple[int, int]], RulesRegistry] = {}
+
+
+def shared_rules(pieces_dir: Optional[pathlib.Path] = None, dims: Tuple[int, int] = BOARD_DIMS) -> RulesRegistry:
+    """הרישום המשותף של התהליך לתיקיית הכלים (ולגודל הלוח) - נטען בקריאה הראשונה בלבד"""
+    key = (pathlib.Path(pieces_dir or PIECES_DIR).resolve(), tuple(dims))
+    registry = _registries.get(key)
+    if registry is None:
+        registry = _registries[key] = RulesRegistry.load(key[0], key[1])
+    return registry
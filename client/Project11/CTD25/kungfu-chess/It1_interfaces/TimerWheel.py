@@ -0,0 +1,190 @@
+"""
+גלגל טיימרים היררכי - טיימרים רבים (מנוחות, תפוגת מושבים, התעוררות חדרים)
+בעלות O(1) לתזמון ולביטול.
+
+הזמן מחולק לטיקים של tick_ms. לכל רמה יש slots תאים:
+רמה 0 מכסה slots טיקים, רמה 1 מכסה slots^2 טיקים, וכן הלאה.
+טיימר נכנס לרמה הנמוכה ביותר שהטווח שלה מגיע לזמן שלו. כשרמה 0 משלימה סיבוב,
+התא המתאים ברמה שמעליה "נשפך" לרמות הנמוכות. כך כל טיימר זז לכל היותר levels פעמים.
+
+advance(now_ms) מחזיר את כל הטיימרים שהגיע זמנם כאצווה אחת, ממוינת לפי
+(due_ms, סדר התזמון). טיימר לא יוצא לפני ה-due_ms שלו, ולכל היותר טיק אחד אחריו.
+advance לא עובר טיק-טיק על זמן ריק: תאים ריקים ברמה 0 מדולגים, ואם אין כלום עד
+סוף הסיבוב - הגלגל קופץ ישר לטיימר הקרוב ומסדר מחדש את מה שבו. גלגל ריק
+שמקבל טיימר חדש (schedule עם now_ms) מתחיל מהזמן הנוכחי, לא מהטיק שבו התרוקן.
+"""
+import itertools
+from typing import Any, Dict, List, Optional
+
+
+class TimerHandle:
+    """טיימר מתוזמן - מספיק לשמור אותו כדי לבטל"""
+
+    __slots__ = ("due_ms", "order", "kind", "payload", "cancelled", "_slot")
+
+    def __init__(self, due_ms: int, order: int, kind: str, payload: Any):
+        self.due_ms = due_ms
+        self.order = order
+        self.kind = kind
+        self.payload = payload
+        self.cancelled = False
+        self._slot: Optional[Dict[int, "TimerHandle"]] = None
+
+    def __lt__(self, other: "TimerHandle") -> bool:
+        return (self.due_ms, self.order) < (other.due_ms, other.order)
+
+
+class TimerWheel:
+    """גלגל טיימרים היררכי - תזמון וביטול ב-O(1), הוצאה באצוות לכל טיק"""
+
+    def __init__(self, tick_ms: int = 10, slot_bits: int = 8, levels: int = 4, now_ms: int = 0):
+        self.tick_ms = tick_ms
+        self.slot_bits = slot_bits
+        self.slots = 1 << slot_bits
+        self.levels = levels
+        self._mask = self.slots - 1
+        # כל תא הוא מילון order -> טיימר, כך שביטול הוא מחיקה אחת
+        self._wheel: List[List[Dict[int, TimerHandle]]] = [
+            [{} for _ in range(self.slots)] for _ in range(levels)
+        ]
+        self._overflow: Dict[int, TimerHandle] = {}  # רחוק מכל הרמות - נבדק בכל סיבוב של הרמה העליונה
+        self._expired: Dict[int, TimerHandle] = {}   # זמנו כבר עבר כשתוזמן - יוצא ב-advance הבא
+        self._tick = now_ms // tick_ms                # הטיק האחרון שכבר עובד
+        self._order = itertools.count()
+        self._live = 0
+
+    # ─── תזמון וביטול ─────────────────────────────────────────────────
+
+    def schedule(self, due_ms: int, kind: str, payload: Any = None, now_ms: Optional[int] = None) -> TimerHandle:
+        """
+        תזמון טיימר חדש - O(1).
+        now_ms - הזמן הנוכחי: גלגל ריק (שאף אחד לא קידם בזמן שהיה ריק) מתיישר אליו.
+        """
+        if not self._live and now_ms is not None:
+            self._tick = max(self._tick, now_ms // self.tick_ms)
+        handle = TimerHandle(due_ms, next(self._order), kind, payload)
+        self._place(handle)
+        self._live += 1
+        return handle
+
+    def cancel(self, handle: TimerHandle):
+        """ביטול טיימר - O(1), מוציאים אותו מהתא שלו"""
+        if handle.cancelled:
+            return
+        handle.cancelled = True
+        if handle._slot is not None:
+            del handle._slot[handle.order]
+            handle._slot = None
+            self._live -= 1
+
+    def _place(self, handle: TimerHandle):
+        # טיק היעד מעוגל למעלה - טיימר לעולם לא יוצא לפני הזמן שלו
+        due_tick = -(-handle.due_ms // self.tick_ms)
+        if due_tick <= self._tick:
+            slot = self._expired
+        else:
+            # הרמה = הספרה הגבוהה ביותר (בבסיס slots) שבה טיק היעד שונה מהטיק הנוכחי
+            slot = self._overflow
+            for level in range(self.levels):
+                shift = self.slot_bits * (level + 1)
+                if due_tick >> shift == self._tick >> shift:
+                    slot = self._wheel[level][(due_tick >> (self.slot_bits * level)) & self._mask]
+                    break
+        slot[handle.order] = handle
+        handle._slot = slot
+
+    # ─── התקדמות בזמן ─────────────────────────────────────────────────
+
+    def advance(self, now_ms: int) -> List[TimerHandle]:
+        """כל הטיימרים שזמנם הגיע עד now_ms - אצווה אחת, לפי הסדר"""
+        target = now_ms // self.tick_ms
+        fired: List[TimerHandle] = []
+        self._collect(self._expired, fired)
+        while self._tick < target:
+            if not self._live:
+                # אין טיימרים - קופצים ישר לזמן הנוכחי
+                self._tick = target
+                break
+            self._skip_idle(target)
+            self._tick += 1
+            self._cascade()
+            self._collect(self._wheel[0][self._tick & self._mask], fired)
+            # טיימר שנשפך מרמה גבוהה בדיוק בטיק שלו
+            self._collect(self._expired, fired)
+        fired.sort()
+        return fired
+
+    def _skip_idle(self, target: int):
+        """
+        קפיצה על טיקים שאין בהם כלום, עד לטיק שלפני הבא שיש בו משהו (או שלפני target).
+        עד סוף הסיבוב של רמה 0 מספיק לדלג על תאים ריקים; אם כל הסיבוב ריק,
+        הטיימר הקרוב נמצא ברמות הגבוהות - קופצים אליו ומסדרים אותן מחדש.
+        """
+        level0 = self._wheel[0]
+        boundary = (self._tick | self._mask) + 1  # הטיק הראשון של הסיבוב הבא
+        tick = self._tick + 1
+        stop = min(target, boundary)
+        while tick < stop and not level0[tick & self._mask]:
+            tick += 1
+        if tick < boundary or self.levels < 2 or self._wheel[1][(boundary >> self.slot_bits) & self._mask]:
+            # עד הסיבוב הבא אין מה לסדר מחדש - מספיק לדלג על התאים הריקים
+            self._tick = tick - 1
+            return
+        due_tick = min(-(-handle.due_ms // self.tick_ms) for handle in self._pending())
+        jump_to = min(due_tick, target) - 1
+        if jump_to < boundary:
+            self._tick = boundary - 1
+            return
+        handles = list(self._pending())
+        for level in self._wheel:
+            for slot in level:
+                slot.clear()
+        self._overflow.clear()
+        self._tick = jump_to
+        for handle in handles:
+            self._place(handle)
+
+    def _pending(self):
+        """כל הטיימרים שמחכים ברמות וב-overflow"""
+        for level in self._wheel:
+            for slot in level:
+                yield from slot.values()
+        yield from self._overflow.values()
+
+    def _cascade(self):
+        """
+        בתחילת סיבוב של רמה - פיזור התא הבא שלה לרמות שמתחתיה.
+        מהרמה הגבוהה למטה, כדי שמה שנשפך לרמה נמוכה ייפוזר שוב באותו טיק.
+        """
+        top = 0
+        while top < self.levels and not (self._tick >> (self.slot_bits * top)) & self._mask:
+            top += 1
+        for level in range(top, 0, -1):
+            if level == self.levels:
+                slot = self._overflow
+            else:
+                slot = self._wheel[level][(self._tick >> (self.slot_bits * level)) & self._mask]
+            if not slot:
+                continue
+            handles = list(slot.values())
+            slot.clear()
+            for handle in handles:
+                self._place(handle)
+
+    def _collect(self, slot: Dict[int, TimerHandle], fired: List[TimerHandle]):
+        if not slot:
+            return
+        for handle in slot.values():
+            handle._slot = None
+        self._live -= len(slot)
+        fired.extend(slot.values())
+        slot.clear()
+
+    def next_due(self) -> Optional[int]:
+        """זמן הטיימר הקרוב (סריקה של התאים - לא לשימוש בכל טיק)"""
+        if self._expired:
+            return min(handle.due_ms for handle in self._expired.values())
+        return min((handle.due_ms for handle in self._pending()), default=None)
+
+    def __len__(self) -> int:
+        return self._live
@@ -4,17 +4,37 @@ import json
 import threading
 import time
 import queue
+import sys
 from pathlib import Path
-from typing import Optional, Dict, Any
+from urllib.parse import urlencode
+from typing import Optional, Dict, Any, List
 from Board import Board
 from Game import Game
 from img import Img
+from ClockSync import ClockSync
+from JitterBuffer import JitterBuffer
+from Lockstep import LockstepDesync, LockstepSim
+import WireProtocol
+
+# המתנה בין ניסיונות חיבור מחדש (שניות) - מכפילה את עצמה עד המקסימום
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 8.0
+
+# כל כמה שניות הלקוח שולח לשרת את הגיבוב של הלוח שלו (verify) - מצב מלא רק באי-התאמה
+VERIFY_INTERVAL = 5.0
+
+# סנכרון שעון: כמה pings מהירים בהתחלה (כל SYNC_BURST_INTERVAL שניות), ואחר כך אחד כל PING_INTERVAL
+SYNC_BURST = 5
+SYNC_BURST_INTERVAL = 0.2
+PING_INTERVAL = 10.0
 
 
 class GameClient:
     """לקוח המשחק שמתקשר עם השרת המרכזי"""
     
-    def __init__(self, board: Board, pieces_root: Path, placement_csv: Path):
+    def __init__(self, board: Board, pieces_root: Path, placement_csv: Path, prefer_binary: bool = True,
+                 spectator: bool = False, max_rate: Optional[float] = None, batch: bool = True,
+                 tick: Optional[float] = None, jitter_buffer: bool = True, lockstep: bool = False):
         self.board = board
         self.pieces_root = pieces_root
         self.placement_csv = placement_csv
@@ -24,23 +44,142 @@ class GameClient:
         self.game: Optional[Game] = None
         self.running = False
         self.move_queue = queue.Queue()  # תור למהלכים
+        self.prefer_binary = prefer_binary  # להציע לשרת את הפרוטוקול הבינארי
+        self.wire_format = WireProtocol.FORMAT_JSON  # הפורמט שסוכם בפועל
+        self.board_version: Optional[int] = None  # גרסת הלוח האחרונה שיושמה
+        self.awaiting_snapshot = False  # האם ביקשנו מצב מלא בגלל פער בגרסאות
+        self.snapshot_due = False  # בקשת מצב מלא שנרשמה בזמן היישום ועוד לא נשלחה
+        self.server_uri = "ws://localhost:8765"
+        self.room: Optional[str] = None
+        self.resume_token: Optional[str] = None  # מאפשר לחזור לאותו מושב אחרי ניתוק
+        self.last_seq: Optional[int] = None  # מספר ההודעה האחרונה מהחדר שטופלה
+        self.move_task: Optional[asyncio.Task] = None
+        self.spectator = spectator  # צופה - רק מקבל את המשחק, לא שולח מהלכים
+        self.max_rate = max_rate  # לצופה: עד כמה עדכונים לשנייה (השרת ממזג את מה שביניהם)
+        self.batch = batch  # לבקש מהשרת לאחד הודעות של אותו רגע למסגרת אחת
+        self.tick = tick  # חדר חדש במצב טיקים - עד tick עדכוני לוח לשנייה
+        self.clock = ClockSync()  # זמן המשחק של החדר בשרת מול השעון של Game
+        # מתי להנפיש מהלכים מהשרת, לפי הג'יטר שנמדד (None - מיד, בשלב שלפי סנכרון השעון)
+        self.jitter: Optional[JitterBuffer] = JitterBuffer() if jitter_buffer else None
+        self.lockstep = lockstep  # חדר חדש במצב lockstep - מהשרת מגיעים רק קלטים
+        self.sim: Optional[LockstepSim] = None  # הסימולציה של חדר lockstep (נבנית מהמצב המלא)
         
-    async def connect_to_server(self, uri: str = "ws://localhost:8765"):
-        """התחברות לשרת המשחק"""
+    def session_uri(self) -> str:
+        """כתובת החיבור - חדר, ואם כבר יש מושב: token ומספר ההודעה האחרונה"""
+        params = {}
+        if self.room:
+            params["room"] = self.room
+        if self.batch:
+            params["batch"] = 1
+        if self.tick is not None:
+            params["tick"] = self.tick
+        if self.lockstep:
+            params["mode"] = "lockstep"
+        if self.spectator:
+            params["role"] = "spectator"
+            if self.max_rate:
+                params["max_rate"] = self.max_rate
+        elif self.resume_token:
+            params["token"] = self.resume_token
+            if self.last_seq is not None:
+                params["last_seq"] = self.last_seq
+        if not params:
+            return self.server_uri
+        return f"{self.server_uri.rstrip('/')}/?{urlencode(params)}"
+        
+    async def connect_to_server(self, uri: str = "ws://localhost:8765", room: Optional[str] = None):
+        """
+        התחברות לשרת המשחק (לחדר מסוים אם צוין).
+        אחרי ניתוק הלקוח מתחבר מחדש עם ה-resume token וממשיך את אותו משחק.
+        """
+        self.server_uri = uri
+        self.room = room
+        self.running = True
+        retry_delay = RECONNECT_MIN_DELAY
+        verify_task = asyncio.create_task(self.verify_loop())
+        clock_task = asyncio.create_task(self.clock_sync_loop())
         try:
-            print(f"🔌 מתחבר לשרת: {uri}")
-            self.websocket = await websockets.connect(uri)
-            self.running = True
-            
-            # קבלת הודעת הקצאת צבע
-            response = await self.websocket.recv()
-            data = json.loads(response)
-            
-            if data.get("type") == "assign_color":
-                self.player_color = data["color"]
-                self.player_id = data.get("player_id", f"player_{self.player_color}")
-                print(f"🎨 קיבלתי צבע: {self.player_color} (ID: {self.player_id})")
+            while self.running:
+                try:
+                    if await self.open_session():
+                        retry_delay = RECONNECT_MIN_DELAY
+                        await self.listen_for_messages()
+                    elif not self.can_reconnect():
+                        break  # השרת דחה אותנו ואין מושב לחזור אליו
+                except (OSError, websockets.exceptions.WebSocketException) as e:
+                    print(f"❌ שגיאה בחיבור לשרת: {e}")
+                    
+                if not self.can_reconnect():
+                    break
+                print(f"🔁 מתחבר מחדש בעוד {retry_delay:.1f} שניות...")
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, RECONNECT_MAX_DELAY)
                 
+        except Exception as e:
+            print(f"❌ שגיאה בחיבור לשרת: {e}")
+        finally:
+            self.running = False
+            verify_task.cancel()
+            clock_task.cancel()
+            if self.websocket:
+                await self.websocket.close()
+
+    def can_reconnect(self) -> bool:
+        """שחקן חוזר רק עם resume token; צופה תמיד יכול להצטרף מחדש"""
+        return self.spectator or bool(self.resume_token)
+
+    async def open_session(self) -> bool:
+        """פתיחת חיבור אחד וקבלת המושב - חדש (assign_color) או קיים (resumed)"""
+        uri = self.session_uri()
+        print(f"🔌 מתחבר לשרת: {uri}")
+        subprotocols = WireProtocol.SUBPROTOCOLS if self.prefer_binary else [WireProtocol.SUBPROTOCOL_JSON]
+        self.websocket = await websockets.connect(uri, subprotocols=subprotocols)
+        self.wire_format = WireProtocol.format_of(self.websocket)
+        print(f"🧬 פורמט תקשורת: {self.wire_format}")
+        
+        # קבלת הודעת הקצאת צבע (או חזרה למושב)
+        response = await self.websocket.recv()
+        data = WireProtocol.decode(response)
+        
+        if data.get("type") == "resumed":
+            self.resume_token = data.get("resume_token", self.resume_token)
+            print(f"🔁 חזרתי למשחק בתור {data.get('color')} - ממשיך מהודעה {self.last_seq}")
+            if self.game:
+                self.game.websocket = self.websocket
+            return True
+            
+        if data.get("type") == "spectator_joined":
+            self.player_color = "spectator"
+            self.player_id = data.get("spectator_id")
+            # תמונת המצב של החדר מגיעה מיד אחרי ההודעה הזאת
+            self.last_seq = None
+            print(f"👀 צופה בחדר {data.get('room')} ({data.get('spectators')} צופים)")
+            if self.game is None:
+                self.game = Game(
+                    board=self.board,
+                    pieces_root=self.pieces_root,
+                    placement_csv=self.placement_csv,
+                    player_color=self.player_color,
+                    websocket=self.websocket
+                )
+                self.game.client = self
+                threading.Thread(target=self.game.run, daemon=True).start()
+            else:
+                self.game.websocket = self.websocket
+            return True
+            
+        if data.get("type") == "assign_color":
+            self.player_color = data["color"]
+            self.player_id = data.get("player_id", f"player_{self.player_color}")
+            self.resume_token = data.get("resume_token")
+            # מושב חדש - המספור מתחיל מהמצב המלא שמגיע מיד, ואולי בחדר עם שעון אחר
+            self.last_seq = None
+            self.clock = ClockSync()
+            if self.jitter is not None:
+                self.jitter.reset()
+            print(f"🎨 קיבלתי צבע: {self.player_color} (ID: {self.player_id})")
+            
+            if self.game is None:
                 # יצירת אובייקט המשחק
                 self.game = Game(
                     board=self.board,
@@ -55,28 +194,26 @@ class GameClient:
                 
                 # הרצת המשחק בחוט נפרד
                 threading.Thread(target=self.game.run, daemon=True).start()
+            else:
+                # ה-token פג והשרת נתן מושב חדש - אותו משחק, אולי צבע אחר
+                self.game.websocket = self.websocket
+                self.game.player_color = self.player_color
                 
+            if self.move_task is None:
                 # התחלת עיבוד מהלכים באופן אסינכרוני
-                move_task = asyncio.create_task(self.process_move_queue())
-                
-                # התחלת האזנה להודעות מהשרת
-                await self.listen_for_messages()
-                
-            elif data.get("type") == "error":
-                print(f"❌ שגיאה מהשרת: {data.get('message')}")
-                
-        except Exception as e:
-            print(f"❌ שגיאה בחיבור לשרת: {e}")
-        finally:
-            self.running = False
-            if self.websocket:
-                await self.websocket.close()
+                self.move_task = asyncio.create_task(self.process_move_queue())
+            return True
+            
+        if data.get("type") == "error":
+            print(f"❌ שגיאה מהשרת: {data.get('message')}")
+        await self.websocket.close()
+        return False
 
     async def listen_for_messages(self):
         """האזנה להודעות מהשרת"""
         try:
             async for message in self.websocket:
-                data = json.loads(message)
+                data = WireProtocol.decode(message)
                 await self.handle_server_message(data)
                 
         except websockets.exceptions.ConnectionClosed:
@@ -93,11 +230,17 @@ class GameClient:
                 if not self.move_queue.empty():
                     move_data = self.move_queue.get_nowait()
                     print(f"🔄 מעבד מהלך מהתור: {move_data}")
-                    await self.send_move_to_server(
-                        move_data["from"], 
-                        move_data["to"], 
-                        move_data["piece"]
-                    )
+                    if move_data.get("premove"):
+                        await self.send_premove_to_server(move_data["from"], move_data["to"], move_data["piece"])
+                    else:
+                        sent = await self.send_move_to_server(
+                            move_data["from"], 
+                            move_data["to"], 
+                            move_data["piece"]
+                        )
+                        if not sent and self.game:
+                            # המהלך לא יצא - הניחוש המקומי שלו מתבטל מיד
+                            self.game.reject_prediction(move_data["from"], move_data["to"])
                 await asyncio.sleep(0.01)  # המתנה קצרה
             except queue.Empty:
                 await asyncio.sleep(0.01)
@@ -106,17 +249,51 @@ class GameClient:
                 await asyncio.sleep(0.1)
 
     async def handle_server_message(self, data: Dict[str, Any]):
-        """טיפול בהודעות מהשרת"""
+        """
+        טיפול בהודעה מהשרת - הודעה בודדת היא אצווה של הודעה אחת, כך שגם היא
+        מיושמת תחת state_lock (מצב מלא, דלתא, ניחוש וביטול משנים את הכלים שהלולאה מציירת).
+        """
+        messages = data.get("messages", []) if data.get("type") == "batch" else [data]
+        await self.apply_batch(messages)
+
+    def apply_server_message(self, data: Dict[str, Any]):
+        """
+        יישום הודעה אחת מהשרת על המשחק המקומי - בלי await, כך שאפשר להריץ אותו
+        כולו תחת state_lock. בקשת מצב מלא רק נרשמת ונשלחת ב-flush_snapshot_request.
+        """
         message_type = data.get("type")
         print(f"🔔 מטפל בהודעה מהשרת: {message_type} - {data}")
         
+        # מספור ההודעות בחדר - הודעה שכבר טופלה (כפולה בהשלמה) מדולגת
+        seq = data.get("seq")
+        if seq is not None:
+            if self.last_seq is not None and seq <= self.last_seq and message_type != "full_state":
+                return
+            self.last_seq = seq
+        
         if message_type == "full_state":
             print("📊 קיבלתי מצב מלא של המשחק")
-            await self.apply_full_state(data)
+            self.apply_full_state(data)
+            self.check_board_hash(data)
             
         elif message_type == "move_executed":
             print(f"♟️ מהלך בוצע: {data.get('from')} -> {data.get('to')}")
-            await self.apply_move_update(data)
+            self.apply_move_update(data)
+            self.check_board_hash(data)
+            
+        elif message_type == "piece_arrived":
+            print(f"🎯 כלי נחת ב-{data.get('to')} (נלכד: {data.get('captured')})")
+            self.apply_arrival(data)
+            self.check_board_hash(data)
+            
+        elif message_type in ("input", "arrive"):
+            # חדר lockstep - את המהלך או הנחיתה המלאים מחשבת הסימולציה המקומית
+            self.apply_lockstep(data)
+            
+        elif message_type == "board_delta":
+            print(f"🧩 עדכון ממוזג: {data.get('moves')} מהלכים עד גרסה {data.get('version')}")
+            self.apply_coalesced_delta(data)
+            self.check_board_hash(data)
             
         elif message_type == "game_started":
             print(f"🎮 {data.get('message')}")
@@ -131,21 +308,65 @@ class GameClient:
                 self.game.game_over = True
                 self.game.winner = winner
                 
+        elif message_type == "pong":
+            if self.game and self.clock.add_sample(data.get("t0", 0), data.get("server_ms", 0), self.game.game_time_ms()):
+                print(f"⏱️ סנכרון שעון: הפרש {self.clock.offset_ms:.0f}ms, rtt {self.clock.rtt_ms:.0f}ms")
+            
         elif message_type == "move_error":
             print(f"❌ שגיאה במהלך: {data.get('message')}")
+            # המהלך כבר זז מקומית (ניחוש) - חוזר אחורה
+            if self.game:
+                self.game.reject_prediction(data.get("from"), data.get("to"))
+            
+        elif message_type == "premove_queued":
+            print(f"⏳ premove נשמר: {data.get('from')} -> {data.get('to')} (יבוצע ב-{data.get('execute_at')})")
+            
+        elif message_type == "premove_cancelled":
+            print(f"🚫 premove בוטל: {data.get('from')} -> {data.get('to')} ({data.get('reason')})")
+            
+        elif message_type == "rate_limited":
+            # השרת עמוס או שביקשנו מהר מדי - מנסים שוב אחרי ההמתנה שהוא ביקש
+            print(f"🐢 השרת דחה {data.get('action')} ({data.get('reason')})")
+            if data.get("action") == "get_state" and self.awaiting_snapshot:
+                asyncio.create_task(self.retry_full_state(data.get("retry_after_ms", 500)))
             
         elif message_type == "player_disconnected":
             disconnected_player = data.get("player")
             print(f"👋 שחקן {disconnected_player} התנתק")
             
+        elif message_type == "player_reconnected":
+            print(f"🔁 שחקן {data.get('player')} חזר למשחק")
+            
+        elif message_type == "player_left":
+            print(f"🚪 שחקן {data.get('player')} עזב את המשחק")
+            
         elif message_type == "info":
             print(f"ℹ️ מידע: {data.get('message')}")
             
         else:
             print(f"📨 הודעה לא מזוהה מהשרת: {data}")
 
-    async def apply_full_state(self, state_data: Dict[str, Any]):
+    async def apply_batch(self, messages: List[Dict[str, Any]]):
+        """
+        הודעה אחת, או כמה שהשרת שלח במסגרת אחת - מיושמות כולן בלי שלולאת המשחק תצייר
+        מצב ביניים (למשל מהלך בלי ה-game_over שבא אחריו). המנעול של Game הוא
+        threading.RLock, ולכן אין בתוכו אף await: מיישמים תחתיו הכל ברצף,
+        ורק אחרי שהשתחרר שולחים לשרת את מה שהיישום ביקש.
+        """
+        messages = [message for message in messages if isinstance(message, dict)]
+        if not self.game:
+            for message in messages:
+                self.apply_server_message(message)
+        else:
+            with self.game.state_lock:
+                for message in messages:
+                    self.apply_server_message(message)
+        await self.flush_snapshot_request()
+
+    def apply_full_state(self, state_data: Dict[str, Any]):
         """יישום מצב מלא של המשחק"""
+        # בחדר lockstep הסימולציה ממשיכה מהמצב הזה (כולל הכלים שבדרך)
+        self.sim = LockstepSim.from_full_state(state_data) if state_data.get("lockstep") else None
         if not self.game:
             return
             
@@ -155,10 +376,92 @@ class GameClient:
         # עדכון הלוח במשחק
         if hasattr(self.game, 'apply_board_state'):
             self.game.apply_board_state(board_state)
+        self.board_version = state_data.get("version")
+        self.awaiting_snapshot = False
             
-        print(f"📋 עדכנתי את מצב הלוח")
+        print(f"📋 עדכנתי את מצב הלוח (גרסה {self.board_version})")
+
+    def accept_version(self, version: Optional[int]) -> bool:
+        """
+        בדיקה אם אפשר ליישם דלתא בגרסה הזו.
+        דלתא ישנה או כפולה מדולגת; פער בגרסאות מוביל לבקשת מצב מלא אחת בלבד.
+        """
+        if version is None or self.board_version is None:
+            return True
+        if self.awaiting_snapshot or version <= self.board_version:
+            return False
+        if version != self.board_version + 1:
+            print(f"⚠️ פער בגרסאות: {self.board_version} -> {version}, מבקש מצב מלא")
+            self.want_full_state()
+            return False
+        return True
+
+    def check_board_hash(self, data: Dict[str, Any]):
+        """
+        הגיבוב שהשרת צירף לעדכון מול הגיבוב של הלוח המקומי (הכלים שעל המסך) אחרי
+        שיישמנו אותו. אי-התאמה אומרת שהלוח שלנו סטה - מבקשים מצב מלא אחד.
+        """
+        expected = data.get("hash")
+        if expected is None or not self.game or self.awaiting_snapshot:
+            return
+        if data.get("version") != self.board_version:
+            return  # העדכון לא יושם (ישן, כפול, או שחיכה למצב מלא)
+        if self.game.board_hash != expected:
+            print(f"⚠️ הגיבוב של הלוח לא תואם בגרסה {self.board_version}, מבקש מצב מלא")
+            self.want_full_state()
+
+    async def verify_loop(self):
+        """
+        שליחת הגרסה והגיבוב של הלוח לשרת מדי פעם. השרת עונה במצב מלא רק אם
+        הלוח שלנו סטה (או שהגרסה שלנו ישנה מדי), אחרת לא שולח כלום.
+        """
+        while self.running:
+            await asyncio.sleep(VERIFY_INTERVAL)
+            if not self.game or self.board_version is None or self.awaiting_snapshot:
+                continue
+            try:
+                await self.send_message({"action": "verify", "version": self.board_version,
+                                         "hash": self.game.board_hash})
+            except Exception as e:
+                print(f"❌ שגיאה בשליחת verify: {e}")
+
+    async def clock_sync_loop(self):
+        """pings לסנכרון השעון - פרץ קצר עד שיש מספיק מדידות, ואחר כך מדי פעם לעקוב אחרי סחיפה"""
+        while self.running:
+            burst = len(self.clock.samples) < SYNC_BURST
+            await asyncio.sleep(SYNC_BURST_INTERVAL if burst else PING_INTERVAL)
+            if not self.game:
+                continue
+            try:
+                await self.send_message({"action": "ping", "t0": self.game.game_time_ms()})
+            except Exception as e:
+                print(f"❌ שגיאה בשליחת ping: {e}")
+
+    async def retry_full_state(self, delay_ms: int):
+        """בקשת מצב מלא חוזרת אחרי שהשרת דחה את הקודמת"""
+        await asyncio.sleep(delay_ms / 1000)
+        if self.awaiting_snapshot:
+            await self.request_full_state()
+
+    def want_full_state(self):
+        """הלוח שלנו לא תקין - מחכים למצב מלא, והבקשה יוצאת אחרי היישום"""
+        self.awaiting_snapshot = True
+        self.snapshot_due = True
+
+    async def flush_snapshot_request(self):
+        """שליחת בקשת המצב המלא שהיישום רשם (לכל היותר אחת, ורק אם עוד לא הגיע מצב מלא)"""
+        due, self.snapshot_due = self.snapshot_due, False
+        if due and self.awaiting_snapshot:
+            await self.request_full_state()
 
-    async def apply_move_update(self, move_data: Dict[str, Any]):
+    async def request_full_state(self):
+        """בקשת מצב מלא מהשרת (רק כשזוהה פער)"""
+        try:
+            await self.send_message({"action": "get_state"})
+        except Exception as e:
+            print(f"❌ שגיאה בבקשת מצב מלא: {e}")
+
+    def apply_move_update(self, move_data: Dict[str, Any]):
         """יישום עדכון מהלך"""
         print(f"🔧 מתחיל יישום מהלך: {move_data}")
         
@@ -166,27 +469,116 @@ class GameClient:
             print("❌ אין אובייקט משחק!")
             return
             
+        version = move_data.get("version")
+        if not self.accept_version(version):
+            return
+            
         from_pos = move_data.get("from")
         to_pos = move_data.get("to")
         piece = move_data.get("piece")
         captured = move_data.get("captured")
         promoted = move_data.get("promoted", False)
+        changes = move_data.get("changes", {})
         
         print(f"📋 פרטי המהלך: {from_pos} -> {to_pos}, כלי: {piece}, נלכד: {captured}, קודם: {promoted}")
         
         # יישום המהלך במשחק המקומי
-        if hasattr(self.game, 'apply_server_move'):
-            print("✅ קורא לפונקציה apply_server_move")
-            self.game.apply_server_move(from_pos, to_pos, piece, captured, promoted)
+        if hasattr(self.game, 'schedule_remote_move'):
+            print("✅ קורא לפונקציה schedule_remote_move")
+            # האנימציה מתחילה לפי זמן היציאה בשרת, לא מרגע הקבלה
+            departed, playout = self.move_start_times(move_data.get("timestamp"))
+            if move_data.get("premove") and piece and self.player_color and piece[-1] == self.player_color[0].upper():
+                # premove שלנו - השחקן כבר מחכה לו, אין סיבה לעכב אותו בבאפר הג'יטר
+                playout = None
+            self.game.schedule_remote_move(from_pos, to_pos, piece, captured, promoted, changes, departed, playout)
+            if version is not None:
+                self.board_version = version
             
             # הקידום יטופל אוטומטית ב-apply_server_move
             if promoted:
                 print(f"👑 השרת דיווח על קידום: {piece}")
         else:
-            print("❌ אין פונקציה apply_server_move!")
+            print("❌ אין פונקציה schedule_remote_move!")
             
         print(f"🔄 סיימתי יישום מהלך: {from_pos} -> {to_pos}")
 
+    def apply_lockstep(self, data: Dict[str, Any]):
+        """
+        קלט או סימון נחיתה מחדר lockstep. הסימולציה מחשבת את ה-move_executed או
+        ה-piece_arrived שהשרת היה שולח, והם מיושמים באותו מסלול כמו בחדר רגיל.
+        קלט שלא מתאים ללוח שלנו - מבקשים מצב מלא אחד, וממנו הסימולציה נבנית מחדש.
+        """
+        if self.awaiting_snapshot:
+            return
+        try:
+            if self.sim is None:
+                raise LockstepDesync("אין עדיין מצב מלא")
+            message = self.sim.apply(data)
+        except LockstepDesync as e:
+            print(f"⚠️ lockstep: {e}, מבקש מצב מלא")
+            self.sim = None
+            self.want_full_state()
+            return
+        if message["type"] == "move_executed":
+            self.apply_move_update(message)
+        else:
+            self.apply_arrival(message)
+        self.check_board_hash(message)
+
+    def move_start_times(self, server_ms: Optional[float]):
+        """
+        (departed, playout) בשעון של Game למהלך שיצא בשרת ב-server_ms:
+        departed - רגע היציאה לפי סנכרון השעון; playout - הרגע שבאפר הג'יטר קבע
+        להתחלת האנימציה, כך שמהלכים שהגיעו בפרץ יתחילו במרווחים המקוריים שלהם.
+        """
+        departed = self.clock.to_local(server_ms)
+        if server_ms is None or self.jitter is None:
+            return departed, None
+        return departed, self.jitter.observe(server_ms, self.game.game_time_ms())
+
+    def apply_arrival(self, arrival_data: Dict[str, Any]):
+        """
+        יישום נחיתה שהשרת הכריע - עדכון מראה הלוח בלבד.
+        האנימציה כבר רצה מאז move_executed, והשרת הוא שקובע מי נאכל.
+        """
+        if not self.game:
+            return
+        version = arrival_data.get("version")
+        if not self.accept_version(version):
+            return
+        if hasattr(self.game, 'apply_board_delta'):
+            self.game.apply_board_delta(arrival_data.get("changes", {}))
+        if version is not None:
+            self.board_version = version
+
+    def apply_coalesced_delta(self, delta_data: Dict[str, Any]):
+        """
+        כמה שינויי לוח שהשרת מיזג להודעה אחת (צופה בקצב מוגבל, או חדר במצב טיקים).
+        changes הם הערכים הסופיים של המשבצות, כך שהדלתא חלה על כל לוח בגרסה
+        שבין base_version ל-version; לוח ישן מ-base_version מבקש מצב מלא.
+        """
+        if not self.game:
+            return
+        base_version = delta_data.get("base_version")
+        version = delta_data.get("version")
+        current = self.board_version
+        overlapping = (base_version is not None and version is not None and current is not None
+                       and not self.awaiting_snapshot and base_version <= current < version)
+        if not overlapping and base_version is not None and not self.accept_version(base_version + 1):
+            return
+        # המהלכים שבדלתא מונפשים כמו move_executed - רק אלה שעוד לא ראינו
+        if hasattr(self.game, 'schedule_remote_move'):
+            for move in delta_data.get("executed", []):
+                if current is not None and move.get("version") is not None and move["version"] <= current:
+                    continue
+                departed, playout = self.move_start_times(move.get("timestamp"))
+                self.game.schedule_remote_move(move["from"], move["to"], move["piece"], move.get("captured"),
+                                               move.get("promoted", False), {move["from"]: None}, departed, playout)
+        if hasattr(self.game, 'apply_board_delta'):
+            self.game.apply_board_delta(delta_data.get("changes", {}))
+        if version is not None:
+            self.board_version = version
+
     async def send_move_to_server(self, from_pos: str, to_pos: str, piece_id: str):
         """שליחת מהלך לשרת"""
         if not self.websocket or not self.running:
@@ -201,27 +593,42 @@ class GameClient:
         }
         
         try:
-            await self.websocket.send(json.dumps(message))
+            await self.send_message(message)
             print(f"📤 שלחתי מהלך לשרת: {from_pos} -> {to_pos}")
             return True
         except Exception as e:
             print(f"❌ שגיאה בשליחת מהלך: {e}")
             return False
 
-    def send_move_from_thread(self, from_pos: str, to_pos: str, piece_id: str):
-        """שליחת מהלך מחוט אחר (לשימוש מGame)"""
+    async def send_premove_to_server(self, from_pos: str, to_pos: str, piece_id: str):
+        """premove לכלי במנוחה - השרת מבצע אותו בעצמו כשהמנוחה נגמרת, בלי ניסיונות חוזרים מכאן"""
+        try:
+            await self.send_message({"action": "premove", "from": from_pos, "to": to_pos, "piece": piece_id})
+            print(f"⏳ שלחתי premove לשרת: {from_pos} -> {to_pos}")
+        except Exception as e:
+            print(f"❌ שגיאה בשליחת premove: {e}")
+
+    async def send_message(self, message: Dict[str, Any]):
+        """שליחת הודעה לשרת בפורמט שסוכם"""
+        await self.websocket.send(WireProtocol.encode(message, self.wire_format))
+
+    def send_move_from_thread(self, from_pos: str, to_pos: str, piece_id: str, premove: bool = False):
+        """שליחת מהלך (או premove לכלי במנוחה) מחוט אחר (לשימוש מGame)"""
         print(f"🌐 קיבלתי בקשה לשלוח מהלך: {from_pos} -> {to_pos}")
         if self.running:
             # הוספת המהלך לתור
             move_data = {
                 "from": from_pos,
                 "to": to_pos,
-                "piece": piece_id
+                "piece": piece_id,
+                "premove": premove
             }
             self.move_queue.put(move_data)
             print(f"📤 הוספתי מהלך לתור: {from_pos} -> {to_pos}")
         else:
             print(f"❌ לא יכול לשלוח - לא רץ")
+            if self.game and not premove:
+                self.game.reject_prediction(from_pos, to_pos)
 
 
 async def main():
@@ -243,8 +650,15 @@ async def main():
     )
 
     # יצירת הלקוח והתחברות
-    client = GameClient(board, pieces_root, placement_csv)
-    await client.connect_to_server()
+    # python client_new.py [room] [--spectate] [--max-rate=N] [--no-batch] [--tick=N] [--no-jitter-buffer] [--lockstep]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    max_rate = next((float(arg.split("=", 1)[1]) for arg in sys.argv[1:] if arg.startswith("--max-rate=")), None)
+    tick = next((float(arg.split("=", 1)[1]) for arg in sys.argv[1:] if arg.startswith("--tick=")), None)
+    client = GameClient(board, pieces_root, placement_csv, spectator="--spectate" in sys.argv[1:], max_rate=max_rate,
+                        batch="--no-batch" not in sys.argv[1:], tick=tick,
+                        jitter_buffer="--no-jitter-buffer" not in sys.argv[1:], lockstep="--lockstep" in sys.argv[1:])
+    room = args[0] if args else None
+    await client.connect_to_server(room=room)
 
 
 if __name__ == "__main__":
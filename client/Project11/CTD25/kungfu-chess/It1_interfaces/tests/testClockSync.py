@@ -0,0 +1,31 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ClockSync import ClockSync
+
+# === טסט 1: מדידה אחת - ההפרש הוא זמן השרת מול אמצע הדרך ===
+def test_single_sample_offset():
+    clock = ClockSync()
+    assert not clock.synced and clock.to_local(500) is None
+    # השעון של השרת מקדים ב-1000, 20ms לכל כיוון
+    assert clock.add_sample(t0=100, server_ms=1120, t3=140)
+    assert clock.synced
+    assert clock.offset_ms == 1000 and clock.rtt_ms == 40
+    assert clock.to_local(1500) == 500
+    assert clock.to_server(500) == 1500
+
+# === טסט 2: מדידה עם rtt גבוה (עיכוב רק בדרך חזרה) לא מזיזה את ההפרש ===
+def test_min_rtt_sample_wins():
+    clock = ClockSync()
+    clock.add_sample(t0=0, server_ms=1010, t3=20)
+    clock.add_sample(t0=100, server_ms=1110, t3=420)  # pong שנתקע בתור 300ms
+    assert clock.offset_ms == 1000 and clock.rtt_ms == 20
+
+# === טסט 3: מדידות ישנות יוצאות מהחלון, ומדידה הפוכה נזרקת ===
+def test_window_and_bad_sample():
+    clock = ClockSync(window=2)
+    clock.add_sample(t0=0, server_ms=1005, t3=10)
+    clock.add_sample(t0=100, server_ms=1130, t3=160)
+    clock.add_sample(t0=200, server_ms=1240, t3=280)
+    assert clock.offset_ms == 1000 and clock.rtt_ms == 60
+    assert not clock.add_sample(t0=300, server_ms=1300, t3=290)
+    assert len(clock.samples) == 2
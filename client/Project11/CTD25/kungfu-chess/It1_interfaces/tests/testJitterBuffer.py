@@ -0,0 +1,46 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from JitterBuffer import JitterBuffer, MIN_DEPTH_MS, MAX_DEPTH_MS
+
+# === טסט 1: רשת יציבה - אין ג'יטר, והמהלך מתחיל זמן מעבר + עומק מינימלי אחרי היציאה ===
+def test_steady_network_minimal_depth():
+    buffer = JitterBuffer()
+    # השעון המקומי מפגר ב-5000 אחרי השרת, והדרך לוקחת 30ms
+    for server_ms in range(0, 1000, 100):
+        playout = buffer.observe(server_ms, server_ms - 5000 + 30)
+    assert buffer.jitter_ms == 0 and buffer.depth_ms == MIN_DEPTH_MS
+    assert playout == 900 - 5000 + 30 + MIN_DEPTH_MS
+    assert buffer.late == 0
+
+# === טסט 2: מהלכים שהגיעו בפרץ אחד מתחילים במרווחים המקוריים שלהם ===
+def test_burst_keeps_original_spacing():
+    buffer = JitterBuffer()
+    buffer.observe(0, 30)
+    playouts = [buffer.observe(server_ms, 400) for server_ms in (100, 200, 300)]
+    # הפרץ מגדיל את הג'יטר, ולכן המרווחים רק נמתחים - אף פעם לא מתכווצים לאפס
+    assert all(later - earlier >= 100 for earlier, later in zip(playouts, playouts[1:]))
+    assert buffer.playout_ms(200) - buffer.playout_ms(100) == 100
+    assert buffer.late == 2  # שני הראשונים איחרו מעבר לבאפר ויתחילו באמצע התנועה
+
+# === טסט 3: העומק עוקב אחרי הג'יטר - גדל ברשת קופצנית, חסום למעלה, ויורד כשהיא נרגעת ===
+def test_depth_tracks_jitter():
+    buffer = JitterBuffer()
+    for i in range(64):
+        buffer.observe(i * 100, i * 100 + (30 if i % 2 else 90))
+    assert 50 < buffer.jitter_ms < 60
+    assert buffer.depth_ms == 3 * buffer.jitter_ms
+    noisy = buffer.depth_ms
+    for i in range(64, 128):
+        buffer.observe(i * 100, i * 100 + 30)
+    assert buffer.depth_ms < noisy / 10
+    buffer.observe(128 * 100, 128 * 100 + 5000)
+    assert buffer.depth_ms <= MAX_DEPTH_MS
+
+# === טסט 4: reset שוכח את הבסיס ואת הג'יטר (שעון חדר חדש) ===
+def test_reset():
+    buffer = JitterBuffer()
+    buffer.observe(0, 10)
+    buffer.observe(100, 300)
+    buffer.reset()
+    assert buffer.jitter_ms == 0 and not buffer.transits
+    assert buffer.observe(0, 1000) == 1000 + MIN_DEPTH_MS
@@ -0,0 +1,53 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from types import SimpleNamespace
+from Board import Board
+from BoardHash import hash_board
+from Command import Command
+from LocalBoard import local_board
+from Physics import IdlePhysics, MovePhysics
+
+BOARD = Board(cell_H_pix=100, cell_W_pix=100, cell_H_m=1, cell_W_m=1, W_cells=8, H_cells=8, img=None)
+
+def resting(piece_id, pos):
+    physics = IdlePhysics(BOARD.algebraic_to_cell(pos), BOARD)
+    return SimpleNamespace(_state=SimpleNamespace(_physics=physics), get_id=lambda: piece_id)
+
+def moving(piece_id, from_pos, to_pos):
+    physics = MovePhysics(BOARD.algebraic_to_cell(from_pos), BOARD, 1.5)
+    physics.reset(Command(0, piece_id, "move", [from_pos, to_pos]))
+    return SimpleNamespace(_state=SimpleNamespace(_physics=physics), get_id=lambda: piece_id)
+
+# === טסט 1: הכלים המקומיים במקום שהשרת אומר - אותו גיבוב ===
+def test_settled_pieces_match_server():
+    server = {"e1": "KW", "e2": "PW", "e8": "KB"}
+    pieces = [resting("KW_1", "e1"), resting("PW_5", "e2"), resting("KB_1", "e8")]
+    assert hash_board(local_board(pieces, BOARD, server, ())) == hash_board(server)
+
+# === טסט 2: כלי שצויר במשבצת אחרת, או שנלכד בשרת ועוד מצויר - הגיבוב לא תואם ===
+def test_local_drift_changes_hash():
+    server = {"e1": "KW", "e4": "PW", "e8": "KB"}
+    drifted = [resting("KW_1", "e1"), resting("PW_5", "e3"), resting("KB_1", "e8")]
+    assert hash_board(local_board(drifted, BOARD, server, ())) != hash_board(server)
+    ghost = [resting("KW_1", "e1"), resting("PW_5", "e4"), resting("KB_1", "e8"), resting("NB_1", "c6")]
+    assert hash_board(local_board(ghost, BOARD, server, ())) != hash_board(server)
+
+# === טסט 3: משבצות שבאמצע מעבר נלקחות מהשרת - תנועה ומהלך בבאפר לא נחשבים סטייה ===
+def test_transit_squares_follow_server():
+    # הצריח באוויר בשרת ובלקוח, החייל ב-a5 עוד לא נלכד; הפרש יוצא ל-c3 רק אחרי הבאפר
+    server = {"a5": "PB", "e1": "KW", "e8": "KB"}
+    pieces = [moving("RW_1", "a1", "a5"), resting("PB_1", "a5"), resting("NW_1", "b1"),
+              resting("KW_1", "e1"), resting("KB_1", "e8")]
+    assert hash_board(local_board(pieces, BOARD, server, {"b1", "c3"})) == hash_board(server)
+    # אותו מצב, אבל המלך השחור מצויר במשבצת אחרת - מחוץ למעבר הסטייה נתפסת
+    pieces[-1] = resting("KB_1", "d8")
+    assert hash_board(local_board(pieces, BOARD, server, {"b1", "c3"})) != hash_board(server)
+
+# === טסט 4: כלי שנחת על כלי שעוד לא הוסר תופס את המשבצת ===
+def test_landed_mover_wins_square():
+    mover = moving("RW_1", "a1", "a5")
+    mover._state._physics.pos = BOARD.cell_to_world((3, 0))
+    mover._state._physics.finished = True
+    victim = resting("PB_1", "a5")
+    assert local_board([victim, mover], BOARD, {}, ()) == {"a5": "RW"}
+    assert local_board([mover, victim], BOARD, {}, ()) == {"a5": "RW"}
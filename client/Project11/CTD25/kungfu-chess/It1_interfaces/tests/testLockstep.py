@@ -0,0 +1,36 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+import WireProtocol
+from BoardHash import hash_board
+from Lockstep import LockstepDesync, LockstepSim, SIM_STEP_MS, MOVE_EXTRA_DELAY_MS, LONG_REST_MS
+
+SPEEDS = {"RW": 150, "PB": 150, "KW": 150, "KB": 150}
+
+# === טסט 1: קלט ונחיתה - אכילה, גרסה וגיבוב מחושבים מקומית ===
+def test_depart_and_arrive_with_capture():
+    sim = LockstepSim({"a1": "RW", "a3": "PB"}, version=4, speeds=SPEEDS)
+    moved = sim.apply({"type": "input", "t": 1000, "from": "a1", "to": "a3"})
+    assert moved["version"] == 5 and moved["changes"] == {"a1": None}
+    assert moved["arrive_at"] == 1000 + 1070  # 1066 מעוגל לצעד שלם
+    arrived = sim.apply({"type": "arrive"})
+    assert arrived["captured"] == "PB" and arrived["changes"] == {"a3": "RW"}
+    assert arrived["rest_until"] == 2070 + MOVE_EXTRA_DELAY_MS + LONG_REST_MS
+    assert sim.version == 6 and sim.hash == hash_board({"a3": "RW"}) == arrived["hash"]
+
+# === טסט 2: נחיתות לפי זמן הנחיתה, ובשוויון - לפי סדר היציאה ===
+def test_arrival_order():
+    sim = LockstepSim({"a1": "RW", "h1": "KW", "e8": "KB"}, speeds=SPEEDS)
+    sim.apply({"type": "input", "t": 0, "from": "a1", "to": "a4"})
+    sim.apply({"type": "input", "t": 0, "from": "h1", "to": "h2"})
+    sim.apply({"type": "input", "t": 0, "from": "e8", "to": "e7"})
+    assert [sim.apply({"type": "arrive"})["to"] for _ in range(3)] == ["h2", "e7", "a4"]
+    with pytest.raises(LockstepDesync):
+        sim.apply({"type": "arrive"})
+
+# === טסט 3: מסגרת קלט בינארית - כמה בתים בלבד, והזמן חוזר בצעדים שלמים ===
+def test_input_frame_is_tiny():
+    message = {"type": "input", "t": 123 * SIM_STEP_MS, "from": "g1", "to": "f3", "seq": 9}
+    frame = WireProtocol.encode_binary(message)
+    assert frame[0] == WireProtocol.FRAME_INPUT and len(frame) <= 8
+    assert WireProtocol.decode_binary(frame) == message
@@ -0,0 +1,39 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from MovePredictions import MovePredictions, Prediction, SNAP_THRESHOLD_MS
+
+# === טסט 1: אישור מוציא את המהלך מההמתנה, ומהלך של היריב לא נחשב שלנו ===
+def test_confirm_own_move_only():
+    predictions = MovePredictions()
+    predictions.add(Prediction("b1", "c3", "NW_1", started_ms=100))
+    assert predictions.confirm("e7", "e5") is None
+    prediction = predictions.confirm("b1", "c3")
+    assert prediction.piece == "NW_1" and len(predictions) == 0
+    assert predictions.confirm("b1", "c3") is None
+    assert predictions.confirmed == 1
+
+# === טסט 2: דחייה לפי from/to, ודחייה בלי from/to שייכת למהלך הוותיק ביותר ===
+def test_reject_by_key_or_oldest():
+    predictions = MovePredictions()
+    first = predictions.add(Prediction("a2", "a3", "PW_1", started_ms=0))
+    second = predictions.add(Prediction("h2", "h3", "PW_8", started_ms=10))
+    assert predictions.reject("h2", "h3") is second
+    assert predictions.reject() is first
+    assert predictions.reject() is None
+    assert predictions.rolled_back == 2
+
+# === טסט 3: תפוגה רק למהלך שעוד מחכה - לא לאחד שנענה או שהוחלף ===
+def test_expire_only_pending():
+    predictions = MovePredictions()
+    old = predictions.add(Prediction("g1", "f3", "NW_2", started_ms=0))
+    new = predictions.add(Prediction("g1", "f3", "NW_2", started_ms=50))
+    assert not predictions.expire(old)
+    assert predictions.expire(new)
+    assert not predictions.expire(new)
+    assert predictions.clear() == []
+
+# === טסט 4: עיגון לזמן היציאה בשרת - רק כשההפרש מורגש ===
+def test_anchor_to_server_departure():
+    assert MovePredictions.anchor(1000, None) == 1000
+    assert MovePredictions.anchor(1000, 1000 + SNAP_THRESHOLD_MS - 1) == 1000
+    assert MovePredictions.anchor(1000, 1120) == 1120
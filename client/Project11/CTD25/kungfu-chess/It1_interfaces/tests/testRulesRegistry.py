@@ -0,0 +1,23 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from RulesRegistry import PIECES_DIR, RulesRegistry, shared_rules
+
+# === טסט 1: הרישום נטען פעם אחת לכל תיקייה וגודל לוח, ומשותף לכל מי שמבקש ===
+def test_shared_once_per_dir():
+    registry = shared_rules()
+    assert shared_rules(PIECES_DIR, (8, 8)) is registry
+    assert shared_rules(PIECES_DIR, (4, 4)) is not registry
+    assert {"PW", "NB", "KW"} <= set(registry.piece_types)
+
+# === טסט 2: החוקים, ההגדרות והמהירויות לקריאה בלבד ===
+def test_read_only():
+    registry = shared_rules()
+    spec = registry.get("NW")
+    assert isinstance(spec.moves.rules, tuple) and "move" in spec.configs
+    assert registry.move_speeds["NW"] == spec.configs["move"]["physics"]["speed_m_per_sec"]
+    with pytest.raises(TypeError):
+        spec.configs["move"]["physics"] = {}
+    with pytest.raises(TypeError):
+        registry.move_speeds["NW"] = 0.0
+    assert registry.get("XX") is None
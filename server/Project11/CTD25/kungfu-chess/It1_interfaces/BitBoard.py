@@ -0,0 +1,207 @@
+"""
+ייצוג לוח בעזרת bitboards של 64 ביט ובדיקת חוקיות מהלכים.
+
+משבצת = אינדקס 0..63 (a1=0, b1=1, ..., h8=63), ביט אחד לכל משבצת.
+לכל סוג כלי וצבע (PW, NB, ...) יש bitboard משלו, ובנוסף תפוסה לכל צבע.
+
+חוקי התזוזה נגזרים מקבצי pieces/*/moves.txt:
+- כלי שהחוקים שלו מכסים כיוון מלא (1..7 צעדים) הוא כלי גולש (צריח, רץ, מלכה) -
+  ההתקפות שלו מחושבות לאורך קרניים שנעצרות בכלי הראשון שחוסם.
+- כל השאר (פרש, מלך) הם קופצים - טבלה מחושבת מראש לכל משבצת.
+- חיילים: צעד ישר רק למשבצת ריקה, צעד אלכסוני רק לאכילה.
+
+הלוח מחזיק גם גיבוב Zobrist (hash) שמתעדכן בכל הצבה והסרה - ראו BoardHash.
+"""
+import pathlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from BoardHash import piece_key
+from Moves import Moves
+
+FILES = "abcdefgh"
+ALL_SQUARES = (1 << 64) - 1
+
+# שמונה הכיוונים (שורה, עמודה) - שורה = rank
+DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+def square_index(pos: str) -> int:
+    """'e4' -> 28"""
+    if len(pos) != 2 or pos[0] not in FILES or not ('1' <= pos[1] <= '8'):
+        raise ValueError(f"מיקום לא תקין: {pos}")
+    return FILES.index(pos[0]) + 8 * (int(pos[1]) - 1)
+
+
+def square_name(square: int) -> str:
+    """28 -> 'e4'"""
+    return f"{FILES[square % 8]}{square // 8 + 1}"
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """מעבר על אינדקסי הביטים הדלוקים"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _offset_square(square: int, d_rank: int, d_file: int) -> Optional[int]:
+    rank, file = divmod(square, 8)
+    rank += d_rank
+    file += d_file
+    if 0 <= rank < 8 and 0 <= file < 8:
+        return rank * 8 + file
+    return None
+
+
+def _build_rays() -> Dict[Tuple[int, int], List[int]]:
+    """לכל כיוון ולכל משבצת - מסכת כל המשבצות עד קצה הלוח"""
+    rays = {}
+    for d_rank, d_file in DIRECTIONS:
+        masks = []
+        for square in range(64):
+            mask = 0
+            target = _offset_square(square, d_rank, d_file)
+            while target is not None:
+                mask |= 1 << target
+                target = _offset_square(target, d_rank, d_file)
+            masks.append(mask)
+        rays[(d_rank, d_file)] = masks
+    return rays
+
+
+RAYS = _build_rays()
+
+
+class PieceRules:
+    """חוקי תזוזה מחושבים מראש לסוג כלי אחד"""
+
+    def __init__(self, piece_type: str, offsets: List[Tuple[int, int]]):
+        self.piece_type = piece_type
+        self.is_pawn = piece_type.startswith('P')
+        offset_set = set(offsets)
+
+        # כיוונים שבהם מופיעים כל הצעדים 1..7 - כלי גולש לאורך הכיוון
+        self.slide_directions = [
+            direction for direction in DIRECTIONS
+            if all((direction[0] * k, direction[1] * k) in offset_set for k in range(1, 8))
+        ]
+        sliding_offsets = {(d[0] * k, d[1] * k) for d in self.slide_directions for k in range(1, 8)}
+        jump_offsets = [offset for offset in offsets if offset not in sliding_offsets]
+
+        if self.is_pawn:
+            # צעד ישר = תזוזה, צעד אלכסוני = אכילה
+            self.push_table = self._leaper_table([o for o in jump_offsets if o[1] == 0])
+            self.capture_table = self._leaper_table([o for o in jump_offsets if o[1] != 0])
+            self.jump_table = [0] * 64
+        else:
+            self.push_table = self.capture_table = None
+            self.jump_table = self._leaper_table(jump_offsets)
+
+    @staticmethod
+    def _leaper_table(offsets: List[Tuple[int, int]]) -> List[int]:
+        table = []
+        for square in range(64):
+            mask = 0
+            for d_rank, d_file in offsets:
+                target = _offset_square(square, d_rank, d_file)
+                if target is not None:
+                    mask |= 1 << target
+            table.append(mask)
+        return table
+
+    def attacks(self, square: int, occupied: int) -> int:
+        """כל המשבצות שהכלי מגיע אליהן ממשבצת נתונה, בהתחשב בחוסמים"""
+        mask = self.jump_table[square]
+        for direction in self.slide_directions:
+            ray = RAYS[direction][square]
+            blockers = ray & occupied
+            if blockers:
+                # החוסם הקרוב: הביט הנמוך בכיוון עולה, הגבוה בכיוון יורד
+                if direction[0] * 8 + direction[1] > 0:
+                    first = (blockers & -blockers).bit_length() - 1
+                else:
+                    first = blockers.bit_length() - 1
+                ray ^= RAYS[direction][first]
+            mask |= ray
+        return mask
+
+    def targets(self, square: int, occupied: int, enemies: int) -> int:
+        """משבצות יעד חוקיות (לפני סינון משבצות של כלים מאותו צבע)"""
+        if self.is_pawn:
+            return (self.push_table[square] & ~occupied) | (self.capture_table[square] & enemies)
+        return self.attacks(square, occupied)
+
+
+class MoveTables:
+    """חוקי התזוזה של כל סוגי הכלים, טעונים מתיקיית pieces"""
+
+    def __init__(self, rules: Dict[str, PieceRules]):
+        self.rules = rules
+
+    @classmethod
+    def load(cls, pieces_dir: pathlib.Path) -> "MoveTables":
+        rules = {}
+        if not pieces_dir.is_dir():
+            raise FileNotFoundError(f"לא נמצאה תיקיית כלים: {pieces_dir}")
+        for piece_dir in sorted(pieces_dir.iterdir()):
+            moves_file = piece_dir / "moves.txt"
+            if not moves_file.exists():
+                continue
+            moves = Moves(moves_file, (8, 8))
+            # moves.txt כתוב בשורות מסך (שורה 0 = שורה 8), לכן הופכים את סימן השורה
+            offsets = [(-d_row, d_col) for d_row, d_col in moves.rules]
+            rules[piece_dir.name] = PieceRules(piece_dir.name, offsets)
+        return cls(rules)
+
+    def get(self, piece_type: str) -> Optional[PieceRules]:
+        return self.rules.get(piece_type)
+
+
+class BitBoard:
+    """מצב הלוח: bitboard לכל סוג כלי וצבע + מערך משבצות לחיפוש ב-O(1)"""
+
+    def __init__(self):
+        self.pieces: Dict[str, int] = {}
+        self.colors: Dict[str, int] = {'W': 0, 'B': 0}
+        self.squares: List[Optional[str]] = [None] * 64
+        self.hash = 0  # גיבוב Zobrist של הכלים שעל הלוח
+
+    @classmethod
+    def from_dict(cls, board_state: Dict[str, Optional[str]]) -> "BitBoard":
+        board = cls()
+        for pos, piece_type in board_state.items():
+            if piece_type:
+                board.place(square_index(pos), piece_type)
+        return board
+
+    @property
+    def occupied(self) -> int:
+        return self.colors['W'] | self.colors['B']
+
+    def piece_at(self, square: int) -> Optional[str]:
+        return self.squares[square]
+
+    def place(self, square: int, piece_type: str):
+        """הצבת כלי במשבצת (מחליף את מה שהיה שם)"""
+        self.remove(square)
+        bit = 1 << square
+        self.pieces[piece_type] = self.pieces.get(piece_type, 0) | bit
+        self.colors[piece_type[-1]] |= bit
+        self.squares[square] = piece_type
+        self.hash ^= piece_key(piece_type, square)
+
+    def remove(self, square: int) -> Optional[str]:
+        """הסרת הכלי מהמשבצת - מחזיר את מה שהיה שם"""
+        piece_type = self.squares[square]
+        if piece_type is not None:
+            bit = 1 << square
+            self.pieces[piece_type] &= ~bit
+            self.colors[piece_type[-1]] &= ~bit
+            self.squares[square] = None
+            self.hash ^= piece_key(piece_type, square)
+        return piece_type
+
+    def to_dict(self) -> Dict[str, str]:
+        """מיקום אלגברי -> סוג כלי, רק משבצות תפוסות"""
+        return {square_name(square): self.squares[square] for square in iter_bits(self.occupied)}
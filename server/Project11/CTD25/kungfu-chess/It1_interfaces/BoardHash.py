@@ -0,0 +1,72 @@
+"""
+גיבוב Zobrist של הלוח - מספר של 64 ביט שמזהה את סידור הכלים.
+
+לכל זוג (סוג כלי, משבצת) יש מפתח אקראי קבוע, והגיבוב של לוח הוא XOR של המפתחות
+של כל הכלים שעליו. הצבה או הסרה של כלי הן XOR אחד, כך שהגיבוב מתעדכן בכל מהלך
+בלי לעבור על הלוח. המפתחות נגזרים מזרע קבוע (splitmix64), כך שהשרת והלקוח
+מחשבים בדיוק את אותם מספרים - הקובץ זהה בשני הצדדים.
+"""
+from typing import Dict, List, Optional
+
+PIECE_TYPES = ["PW", "NW", "BW", "RW", "QW", "KW", "PB", "NB", "BB", "RB", "QB", "KB"]
+
+ZOBRIST_SEED = 0x4B4643_5A4F42  # "KFCZOB"
+MASK_64 = (1 << 64) - 1
+
+
+def _splitmix64(state: int):
+    """צעד אחד של splitmix64 - מחזיר (מצב חדש, מספר אקראי)"""
+    state = (state + 0x9E3779B97F4A7C15) & MASK_64
+    value = state
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return state, value ^ (value >> 31)
+
+
+def _build_keys() -> Dict[str, List[int]]:
+    keys = {}
+    state = ZOBRIST_SEED
+    for piece_type in PIECE_TYPES:
+        row = []
+        for _ in range(64):
+            state, value = _splitmix64(state)
+            row.append(value)
+        keys[piece_type] = row
+    return keys
+
+
+KEYS = _build_keys()
+
+
+def square_index(pos: str) -> int:
+    """'e4' -> 28"""
+    return (ord(pos[0]) - ord('a')) + 8 * (int(pos[1]) - 1)
+
+
+def piece_key(piece_type: str, square: int) -> int:
+    """המפתח של כלי במשבצת (a1=0 ... h8=63)"""
+    return KEYS[piece_type][square]
+
+
+def hash_board(board: Dict[str, Optional[str]]) -> int:
+    """גיבוב של לוח שלם - מיקום אלגברי -> סוג כלי (משבצות ריקות לא משנות)"""
+    value = 0
+    for pos, piece_type in board.items():
+        if piece_type:
+            value ^= KEYS[piece_type][square_index(pos)]
+    return value
+
+
+def apply_changes(value: int, board: Dict[str, Optional[str]], changes: Dict[str, Optional[str]]) -> int:
+    """
+    הגיבוב אחרי דלתא של משבצות, לפי הלוח שלפניה (board לא משתנה כאן).
+    כל משבצת שהשתנתה: XOR של הכלי הישן החוצה ושל החדש פנימה.
+    """
+    for pos, piece_type in changes.items():
+        square = square_index(pos)
+        old = board.get(pos)
+        if old:
+            value ^= KEYS[old][square]
+        if piece_type:
+            value ^= KEYS[piece_type][square]
+    return value
@@ -0,0 +1,182 @@
+"""
+תור שליחה חסום לכל חיבור, עם משימת כתיבה משלו.
+
+השידור לחדר רק מכניס הודעות מקודדות לתורים, כך שלקוח שחלון ה-TCP שלו מלא
+מעכב רק את עצמו ולא את החדר או את ביצוע המהלכים.
+
+- הודעה שמחליפה את קודמותיה (full_state) מבטלת עותקים ישנים שעוד מחכים בתור.
+- לקוח שההודעה הוותיקה בתור שלו מחכה יותר מ-slow_deadline, שליחה בודדת שנתקעת
+  יותר מזה, או תור שמגיע ל-max_depth - מנותק. הוא יכול לחזור עם ה-resume token
+  ולהשלים את מה שפספס.
+- חיבור שביקש אצוות (batch_window לא None) מקבל את כל מה שנכנס לתור באותו סיבוב
+  של הלולאה (או בתוך batch_window שניות) כמסגרת אחת - למשל move_executed ו-game_over
+  של אותה לכידה. פחות מסגרות וקריאות מערכת כשיש פרץ של מהלכים.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from websockets.exceptions import ConnectionClosed
+
+import WireProtocol
+
+# הודעות שכל עותק חדש שלהן הופך את הישנים למיותרים
+COLLAPSIBLE_TYPES = {"full_state"}
+
+DEFAULT_MAX_DEPTH = 256
+DEFAULT_SLOW_DEADLINE = 5.0
+DEFAULT_MAX_BATCH = 64  # כמה הודעות לכל היותר במסגרת אחת
+
+
+class ClientWriter:
+    """תור יוצא של חיבור אחד ומשימה שמרוקנת אותו לפי הסדר"""
+
+    def __init__(self, websocket, max_depth: int = DEFAULT_MAX_DEPTH,
+                 slow_deadline: float = DEFAULT_SLOW_DEADLINE,
+                 on_latency: Optional[Callable[[Any, float], None]] = None,
+                 on_slow: Optional[Callable[[Any, str], None]] = None,
+                 batch_window: Optional[float] = None, max_batch: int = DEFAULT_MAX_BATCH):
+        self.websocket = websocket
+        self.max_depth = max_depth
+        self.slow_deadline = slow_deadline
+        self.on_latency = on_latency
+        self.on_slow = on_slow
+        self.batch_window = batch_window  # None - כל הודעה במסגרת משלה
+        self.max_batch = max_batch
+        self.fmt = WireProtocol.format_of(websocket)
+
+        # (payload, סוג ההודעה, זמן הכניסה לתור)
+        self.queue: Deque[Tuple[Any, Optional[str], float]] = deque()
+        self.closed = False
+        self.disconnect_reason: Optional[str] = None
+        self.max_depth_seen = 0
+        self.sent = 0
+        self.collapsed = 0
+        self.dropped = 0
+        self.frames = 0  # מסגרות שנשלחו בפועל (sent סופר הודעות)
+
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task = asyncio.ensure_future(self._run())
+
+    def enqueue(self, payload, kind: Optional[str] = None) -> bool:
+        """הכנסת הודעה מקודדת לתור - לא מחכה לשליחה. False אם החיבור כבר נסגר"""
+        if self.closed:
+            self.dropped += 1
+            return False
+        now = time.monotonic()
+
+        if kind in COLLAPSIBLE_TYPES and self.queue:
+            # עותק ישן שעוד לא נשלח מיותר - נשארת רק הגרסה החדשה
+            before = len(self.queue)
+            self.queue = deque(item for item in self.queue if item[1] != kind)
+            self.collapsed += before - len(self.queue)
+
+        if self.queue and now - self.queue[0][2] > self.slow_deadline:
+            self.disconnect("slow")
+            self.dropped += 1
+            return False
+        if len(self.queue) >= self.max_depth:
+            self.disconnect("overflow")
+            self.dropped += 1
+            return False
+
+        self.queue.append((payload, kind, now))
+        self.max_depth_seen = max(self.max_depth_seen, len(self.queue))
+        self._idle.clear()
+        self._ready.set()
+        return True
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            if self.batch_window is not None:
+                # נותנים לשאר ההודעות של אותו אירוע להיכנס לתור לפני השליחה
+                await asyncio.sleep(self.batch_window)
+            while self.queue and not self.closed:
+                payload, count = self._next_frame()
+                started = time.perf_counter()
+                try:
+                    if not await self._send(payload):
+                        self.disconnect("slow")
+                        return
+                except ConnectionClosed:
+                    self.closed = True
+                    self._drop_queued()
+                    return
+                self.sent += count
+                self.frames += 1
+                if self.on_latency is not None:
+                    self.on_latency(self.websocket, (time.perf_counter() - started) * 1000)
+            if not self.queue:
+                self._idle.set()
+
+    def _next_frame(self) -> Tuple[Any, int]:
+        """המסגרת הבאה - הודעה אחת, או אצווה של מה שמחכה בתור (מספר ההודעות בה)"""
+        if self.batch_window is None or len(self.queue) == 1:
+            return self.queue.popleft()[0], 1
+        count = min(len(self.queue), self.max_batch)
+        payloads = [self.queue.popleft()[0] for _ in range(count)]
+        return WireProtocol.pack_batch(payloads, self.fmt), count
+
+    async def _send(self, payload) -> bool:
+        """
+        שליחה אחת עם מגבלת זמן - False אם נתקעה יותר מ-slow_deadline.
+        (לא wait_for: הוא בולע ביטול שמגיע בדיוק כשהשליחה מסתיימת, והמשימה לא נעצרת)
+        """
+        send = asyncio.ensure_future(self.websocket.send(payload))
+        try:
+            done, _ = await asyncio.wait((send,), timeout=self.slow_deadline)
+        except asyncio.CancelledError:
+            send.cancel()
+            raise
+        if not done:
+            send.cancel()
+            return False
+        send.result()
+        return True
+
+    def disconnect(self, reason: str):
+        """ניתוק צרכן איטי - מה שבתור נזרק והשרת מקבל הודעה"""
+        if self.closed:
+            return
+        self.closed = True
+        self.disconnect_reason = reason
+        self._drop_queued()
+        print(f"🐌 ניתוק לקוח איטי ({reason})")
+        if self.on_slow is not None:
+            self.on_slow(self.websocket, reason)
+
+    def _drop_queued(self):
+        self.dropped += len(self.queue)
+        self.queue.clear()
+        self._idle.set()
+
+    async def drain(self):
+        """המתנה עד שכל מה שבתור נשלח (או שהחיבור נסגר)"""
+        await self._idle.wait()
+
+    async def close(self):
+        """עצירת משימת הכתיבה"""
+        self.closed = True
+        self._drop_queued()
+        if not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "depth": len(self.queue),
+            "max_depth": self.max_depth_seen,
+            "sent": self.sent,
+            "frames": self.frames,
+            "collapsed": self.collapsed,
+            "dropped": self.dropped,
+            "disconnect_reason": self.disconnect_reason,
+        }
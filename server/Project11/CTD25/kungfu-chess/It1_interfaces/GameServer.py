@@ -1,28 +1,90 @@
+"""
+שרת המשחק - GameState של חדר אחד ו-GameServer שמארח את כל החדרים.
+
+ההגדרות נקראות מהסביבה (PORT, WORKERS, JOURNAL_DIR, SEAT_HOLD_SECONDS, ...), וכל
+ברירת מחדל מוסברת ליד הקבוע שלה. כמה החלטות שחוצות כמה פונקציות:
+- חזרה אחרי ניתוק: assign_color נותן resume_token, וכל שידור בחדר ממוספר ב-seq.
+  המושב נשמר SEAT_HOLD_SECONDS, ושחקן שחוזר עם token ו-last_seq מקבל את אותו צבע
+  ורק את מה שפספס מ-room.replay - full_state אחד רק כשהפער גדול מהמאגר.
+- מצב טיקים: שינויי הלוח מתמזגים ל-board_delta אחד לכל טיק על רשת קבועה, כך שקצב
+  השידור של החדר חסום בלי קשר לכמות המהלכים, במחיר של עד טיק אחד של השהיה.
+  הודעות אחרות (game_over) מרוקנות קודם את מה שנצבר, כדי לשמור על הסדר.
+- premove: השרת מבצע אותו בעצמו באירוע cooldown_end, בזמן המדויק של סוף המנוחה
+  ומול הלוח של אותו רגע, במקום שהלקוח ינסה שוב ושוב עד שהמנוחה נגמרת.
+- טיימרים: ההתעוררויות ותפוגות המושבים של כל החדרים בגלגל טיימרים אחד, ומשימה
+  אחת מקדמת אותו כל TIMER_TICK_MS ומריצה את כל החדרים שהתעוררו כאצווה.
+"""
 import asyncio
 import websockets
 import json
+import math
+import secrets
 import time
 import pathlib
-from typing import Dict, List, Optional, Tuple, Any
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple, Any
 from EventManager import EventManager
 from MoveHistory import MoveHistory
 from VictoryManager import VictoryManager
 from ScoreBoard import ScoreBoard
-from Moves import Moves
+from BitBoard import BitBoard, square_index, square_name
+from BoardHash import PIECE_TYPES
+from Lockstep import CELL_SIZE_PIX, LONG_REST_MS, MOVE_EXTRA_DELAY_MS, SIM_STEP_MS, step_down, step_up, to_wire, travel_time_ms
+from RulesRegistry import DEFAULT_SPEED_M_PER_SEC, PIECES_DIR, RulesRegistry, shared_rules
+from Timeline import Timeline
+from TimerWheel import TimerHandle, TimerWheel
+from RoomManager import Room, RoomManager
+from WorkerPool import WorkerPool
+from MoveJournal import MoveJournal
+from ClientWriter import ClientWriter
+from RoomActor import RoomActor
+from SpectatorRelay import SpectatorRelay, coalesce
+from RateLimiter import ConnectionLimiter, DropCounters, LoopLagMonitor, MAX_FRAME_BYTES, SHEDDABLE_ACTIONS
+import WireProtocol
+from urllib.parse import urlparse, parse_qs
 import os
 
 
+INITIAL_BOARD = {
+    "a8": "RB", "b8": "NB", "c8": "BB", "d8": "KB", "e8": "QB", "f8": "BB", "g8": "NB", "h8": "RB",
+    "a7": "PB", "b7": "PB", "c7": "PB", "d7": "PB", "e7": "PB", "f7": "PB", "g7": "PB", "h7": "PB",
+    "a2": "PW", "b2": "PW", "c2": "PW", "d2": "PW", "e2": "PW", "f2": "PW", "g2": "PW", "h2": "PW",
+    "a1": "RW", "b1": "NW", "c1": "BW", "d1": "KW", "e1": "QW", "f1": "BW", "g1": "NW", "h1": "RW",
+}
+
+# תור השליחה של כל לקוח - עומק מקסימלי, וכמה שניות לקוח יכול לפגר לפני שמנתקים אותו
+SEND_QUEUE_DEPTH = 256
+SLOW_CONSUMER_DEADLINE = float(os.getenv("SLOW_CONSUMER_DEADLINE", 5))
+
+# לקוח שהתחבר עם batch=1 מקבל את כל ההודעות של סיבוב לולאה אחד (או של החלון הזה) במסגרת אחת
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", 0))
+
+# תיבת הבקשות של כל חדר - עומק מקסימלי, ואחרי כמה ms לקוח שנדחה בגלל תיבה מלאה ינסה שוב
+ROOM_INBOX_DEPTH = int(os.getenv("ROOM_INBOX_DEPTH", 1024))
+INBOX_RETRY_MS = 200
+
+# כמה זמן מושב של שחקן שהתנתק נשמר לו לחזרה עם ה-resume token
+SEAT_HOLD_SECONDS = float(os.getenv("SEAT_HOLD_SECONDS", 30))
+
+# כמה גרסאות אחרונות של הלוח נזכרות עם הגיבוב שלהן - לבדיקת verify של לקוח שקצת מאחור
+HASH_HISTORY = 64
+
+# הרזולוציה של גלגל הטיימרים המשותף לכל החדרים (התעוררות חדרים, תפוגת מושבים)
+TIMER_TICK_MS = 10
+
+# מצב טיקים: חדר עם tick_hz > 0 שולח את שינויי הלוח כעדכון ממוזג אחד בכל טיק
+# במקום הודעה לכל מהלך. ROOM_TICK_HZ - ברירת המחדל לחדרים חדשים (0 = מיד),
+# וחדר חדש יכול לבחור אחרת עם ?tick=N
+ROOM_TICK_HZ = float(os.getenv("ROOM_TICK_HZ", 0))
+MAX_TICK_HZ = 100
+
+
 class GameState:
     """מחלקה המנהלת את מצב המשחק המרכזי"""
     
-    def __init__(self):
-        # הלוח הפנימי - מיקום -> piece_id
-        self.board_state = {
-            "a8": "RB", "b8": "NB", "c8": "BB", "d8": "KB", "e8": "QB", "f8": "BB", "g8": "NB", "h8": "RB",
-            "a7": "PB", "b7": "PB", "c7": "PB", "d7": "PB", "e7": "PB", "f7": "PB", "g7": "PB", "h7": "PB",
-            "a2": "PW", "b2": "PW", "c2": "PW", "d2": "PW", "e2": "PW", "f2": "PW", "g2": "PW", "h2": "PW",
-            "a1": "RW", "b1": "NW", "c1": "BW", "d1": "KW", "e1": "QW", "f1": "BW", "g1": "NW", "h1": "RW",
-        }
+    def __init__(self, rules: Optional[RulesRegistry] = None):
+        # הלוח הפנימי - bitboard לכל סוג כלי וצבע
+        self.board = BitBoard.from_dict(INITIAL_BOARD)
         
         # מנהלי אירועים ומשחק
         self.event_manager = EventManager()
@@ -30,27 +92,62 @@ class GameState:
         self.scoreboard = ScoreBoard()
         self.victory_manager = VictoryManager()
         
-        # טעינת חוקי תזוזה בסיסיים - רק עבור הסוס להתחלה
-        self.piece_moves = {}
-        pieces_dir = pathlib.Path("../pieces")
-        
-        # נטען רק את הסוסים כדי לבדוק שזה עובד
-        for piece_type in ["NW", "NB"]:
-            moves_file = pieces_dir / piece_type / "moves.txt"
-            if moves_file.exists():
-                try:
-                    self.piece_moves[piece_type] = Moves(moves_file, (8, 8))
-                except Exception as e:
-                    pass
+        # חוקי התזוזה והמהירויות - רישום משותף לכל החדרים, בלי קריאת קבצים
+        self.rules = rules or shared_rules()
+        self.move_tables = self.rules.move_tables
+        self.move_speeds = self.rules.move_speeds
         
+        # ציר הזמן של החדר - הגעות של כלים וסיום מנוחות
+        self.timeline = Timeline()
+        self.flights: Dict[int, Dict[str, Any]] = {}          # מזהה טיסה -> כלי בדרך
+        self.reserved: Dict[Tuple[int, str], int] = {}        # (משבצת יעד, צבע) -> מזהה טיסה
+        self.cooldowns: Dict[int, int] = {}                   # משבצת -> זמן סיום המנוחה (ms)
+        self.premoves: Dict[int, Dict[str, Any]] = {}         # משבצת של כלי במנוחה -> המהלך שיבוצע בסופה
+        self._next_flight_id = 1
     
         self.event_manager.subscribe("move_made", self.move_history.on_move_made)
         self.event_manager.subscribe("piece_captured", self.scoreboard.on_piece_captured)
         self.event_manager.subscribe("piece_captured", self.victory_manager.on_king_captured)
         
+        # מונה גרסאות הלוח - עולה בכל שינוי, מאפשר ללקוח לזהות פערים
+        self.version = 0
+        # (גרסה, גיבוב הלוח) של הגרסאות האחרונות
+        self.hash_history: Deque[Tuple[int, int]] = deque([(0, self.board.hash)], maxlen=HASH_HISTORY)
+        
         # KungFu Chess - אין תורות!
         self.game_started = False
-        self.start_time = time.time()
+        self.start_time = time.monotonic()
+        
+        # חדר lockstep: כל הזמנים בצעדים של step_ms (0 = שעון רגיל)
+        self.step_ms = 0
+
+    @property
+    def lockstep(self) -> bool:
+        return self.step_ms > 0
+
+    def enable_lockstep(self, step_ms: int = SIM_STEP_MS):
+        """מעבר למצב lockstep - הלקוחות מריצים את אותה סימולציה מהקלטים בלבד"""
+        self.step_ms = step_ms
+
+    def now_ms(self) -> int:
+        """זמן המשחק במילישניות מאז ההתחלה (שעון מונוטוני), בחדר lockstep - בתחילת הצעד"""
+        now_ms = int((time.monotonic() - self.start_time) * 1000)
+        return step_down(now_ms, self.step_ms) if self.step_ms else now_ms
+
+    def speed_pix_per_sec(self, piece_type: str) -> int:
+        return round(self.move_speeds.get(piece_type, DEFAULT_SPEED_M_PER_SEC) * 100)
+
+    def travel_time_ms(self, piece_type: str, from_square: int, to_square: int) -> int:
+        """משך התנועה - מרחק אוקלידי בפיקסלים חלקי המהירות, כמו MovePhysics (במספרים שלמים)"""
+        dx = (to_square % 8 - from_square % 8) * CELL_SIZE_PIX
+        dy = (to_square // 8 - from_square // 8) * CELL_SIZE_PIX
+        duration = travel_time_ms(dx, dy, self.speed_pix_per_sec(piece_type))
+        return step_up(duration, self.step_ms) if self.step_ms else duration
+
+    @property
+    def board_state(self) -> Dict[str, str]:
+        """הלוח כמילון - מיקום -> סוג כלי (רק משבצות תפוסות)"""
+        return self.board.to_dict()
 
     def should_promote_pawn(self, piece_type: str, to_pos: str) -> bool:
         """בדיקה אם חייל צריך להיות מקודם למלכה"""
@@ -76,89 +173,111 @@ class GameState:
         else:
             return piece_type.replace('PB', 'QB')
 
-    def is_valid_move(self, from_pos: str, to_pos: str, piece_id: str, player_color: str) -> Tuple[bool, str]:
+    def is_valid_move(self, from_pos: str, to_pos: str, piece_id: str, player_color: str,
+                      now_ms: Optional[int] = None) -> Tuple[bool, str]:
         """בדיקת תקינות מהלך"""
         
         # בדיקות בסיסיות
         if not self.game_started:
             return False, "המשחק עדיין לא התחיל"
             
-        if from_pos not in self.board_state or self.board_state[from_pos] is None:
+        try:
+            from_square = square_index(from_pos)
+            to_square = square_index(to_pos)
+        except (TypeError, ValueError):
+            return False, f"מיקום לא תקין: {from_pos} -> {to_pos}"
+            
+        piece_at_source = self.board.piece_at(from_square)
+        if piece_at_source is None:
             return False, f"אין כלי במיקום {from_pos}"
             
-        piece_at_source = self.board_state[from_pos]
         piece_color = "white" if piece_at_source.endswith("W") else "black"
         
         if piece_color != player_color:
             return False, "לא ניתן להזיז כלי של השחקן השני"
             
+        # כלי שעדיין במנוחה אחרי תזוזה לא יכול לזוז
+        now_ms = self.now_ms() if now_ms is None else now_ms
+        rest_until = self.cooldowns.get(from_square, 0)
+        if rest_until > now_ms:
+            return False, f"הכלי במנוחה עוד {rest_until - now_ms}ms"
+            
+        # כלי אחר שלנו כבר בדרך לאותה משבצת
+        if (to_square, piece_at_source[-1]) in self.reserved:
+            return False, f"כלי אחר כבר בדרך אל {to_pos}"
+            
         # מניעת מהלכים למקום עצמו - אסור לגמרי
         if from_pos == to_pos:
             return False, "לא ניתן להזיז כלי למקום עצמו"
             
-        # בדיקת חוקי תזוזה - רק עבור סוסים כרגע (לשאר הכלים אפשר הכל)
-        if piece_at_source in ["NW", "NB"]:  # סוס
-            if not self.is_piece_move_valid(from_pos, to_pos, piece_at_source):
-                return False, f"קפיצה לא חוקית עבור סוס {piece_at_source}"
+        target = self.board.piece_at(to_square)
+        if target is not None and target[-1] == piece_at_source[-1]:
+            return False, "לא ניתן לאכול כלי של אותו שחקן"
+            
+        # בדיקת חוקי תזוזה לכל הכלים, כולל חסימות בדרך
+        if not self.is_piece_move_valid(from_pos, to_pos, piece_at_source):
+            return False, f"מהלך לא חוקי עבור {piece_at_source}"
         
         return True, "מהלך תקין"
 
-    def convert_position_to_coords(self, pos: str) -> Tuple[int, int]:
-        """המרת מיקום שחמט (a1, b2 וכו') לקואורדינטות מערך (0-7, 0-7)"""
-        if len(pos) != 2:
-            raise ValueError(f"מיקום לא תקין: {pos}")
-        col = ord(pos[0]) - ord('a')  # a=0, b=1, ..., h=7
-        row = int(pos[1]) - 1        # 1=0, 2=1, ..., 8=7
-        return row, col
-
     def is_piece_move_valid(self, from_pos: str, to_pos: str, piece_type: str) -> bool:
-        """בדיקה אם המהלך תקין עבור סוג הכלי הספציפי"""
+        """בדיקה אם המהלך תקין עבור סוג הכלי הספציפי - O(1) בעזרת טבלאות וקרניים"""
         try:
-            from_row, from_col = self.convert_position_to_coords(from_pos)
-            to_row, to_col = self.convert_position_to_coords(to_pos)
-            
-            delta_row = to_row - from_row
-            delta_col = to_col - from_col
+            rules = self.move_tables.get(piece_type)
             
-            # אם אין כללים לכלי הזה, אפשר הכל
-            if piece_type not in self.piece_moves:
-                return True
+            # סוג כלי שאין לו חוקים לא זז
+            if rules is None:
+                return False
                 
-            moves = self.piece_moves[piece_type]
-            
-            # בדיקה אם התזוזה תקינה עבור הכלי
-            for allowed_delta in moves.rules:
-                if (delta_row, delta_col) == allowed_delta:
-                    return True
-                    
-            return False
+            from_square = square_index(from_pos)
+            own = self.board.colors[piece_type[-1]]
+            enemies = self.board.occupied & ~own
+            targets = rules.targets(from_square, self.board.occupied, enemies)
+            return bool(targets & (1 << square_index(to_pos)))
             
         except Exception as e:
             # במקרה של שגיאה, לא לאפשר את המהלך
             return False
 
-    def execute_move(self, from_pos: str, to_pos: str, piece_id: str, player_color: str) -> Tuple[bool, Dict[str, Any]]:
-        """ביצוע מהלך ועדכון מצב המשחק"""
+    def execute_move(self, from_pos: str, to_pos: str, piece_id: str, player_color: str,
+                     now_ms: Optional[int] = None) -> Tuple[bool, Dict[str, Any]]:
+        """
+        יציאת כלי לדרך.
+        הכלי עוזב את משבצת המקור מיד, והגעתו (כולל אכילה וקידום) נקבעת
+        על ציר הזמן - היא תתבצע ב-advance כשזמן ההגעה יגיע.
+        הקורא אחראי להריץ advance עד now_ms לפני כן, כדי שהבדיקה תהיה מול לוח עדכני.
+        """
+        now_ms = self.now_ms() if now_ms is None else now_ms
         
-        is_valid, reason = self.is_valid_move(from_pos, to_pos, piece_id, player_color)
+        is_valid, reason = self.is_valid_move(from_pos, to_pos, piece_id, player_color, now_ms)
         
         if not is_valid:
             return False, {"error": reason}
             
-        # שמירת הכלי שנלכד (אם יש)
-        captured_piece = self.board_state.get(to_pos)
+        from_square = square_index(from_pos)
+        to_square = square_index(to_pos)
         
-        # ביצוע המהלך
-        piece = self.board_state[from_pos]
-        self.board_state[from_pos] = None
+        # הכלי עוזב את המשבצת - בזמן הטיסה הוא לא על הלוח
+        piece = self.board.remove(from_square)
+        self.cooldowns.pop(from_square, None)
+        self.bump_version()
         
-        # בדיקה אם צריך לקדם חייל למלכה
-        promoted = False
-        if self.should_promote_pawn(piece, to_pos):
-            piece = self.promote_pawn_to_queen(piece)
-            promoted = True
-            
-        self.board_state[to_pos] = piece
+        promoted = self.should_promote_pawn(piece, to_pos)
+        arrive_at = now_ms + self.travel_time_ms(piece, from_square, to_square)
+        
+        flight_id = self._next_flight_id
+        self._next_flight_id += 1
+        self.flights[flight_id] = {
+            'piece_id': piece_id,
+            'piece_type': piece,
+            'from': from_square,
+            'to': to_square,
+            'player': player_color,
+            'depart_at': now_ms,
+            'arrive_at': arrive_at,
+        }
+        self.reserved[(to_square, piece[-1])] = flight_id
+        self.timeline.schedule(arrive_at, "arrival", flight_id)
         
         # יצירת מידע על המהלך
         move_data = {
@@ -166,51 +285,285 @@ class GameState:
             'piece_type': piece,
             'from': from_pos,
             'to': to_pos,
-            'timestamp': int((time.time() - self.start_time) * 1000),
+            'timestamp': now_ms,
             'player': player_color,
             'promoted': promoted
         }
         
         # פרסום אירוע מהלך
         self.event_manager.publish("move_made", move_data)
+            
+        # הכנת תגובה ללקוחות - רק המשבצות שהשתנו (דלתא) ולא כל הלוח.
+        # האכילה עצמה תוכרע רק בהגעה (piece_arrived)
+        response = {
+            "type": "move_executed",
+            "version": self.version,
+            "from": from_pos,
+            "to": to_pos,
+            "piece": piece,
+            "captured": None,
+            "promoted": promoted,
+            "timestamp": now_ms,
+            "arrive_at": arrive_at,
+            "changes": {from_pos: None},
+            "hash": self.board.hash
+        }
+        
+        return True, response
+
+    def advance(self, now_ms: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        הרצת ציר הזמן עד now_ms: הגעות ואכילות לפי סדר הזמן.
+        מחזיר את הודעות ההגעה (וסיום המשחק) שצריך לשדר.
+        """
+        now_ms = self.now_ms() if now_ms is None else now_ms
+        messages = []
+        # אירוע אחד בכל פעם - premove שיוצא לדרך מתזמן הגעה שאולי קודמת לאירועים הבאים
+        event = self.timeline.pop_next(now_ms)
+        while event is not None:
+            if event.kind == "arrival":
+                messages.extend(self._resolve_arrival(event.payload, event.due_ms))
+            elif event.kind == "cooldown_end":
+                square = event.payload
+                if self.cooldowns.get(square) == event.due_ms:
+                    del self.cooldowns[square]
+                    premove = self.premoves.pop(square, None)
+                    if premove is not None:
+                        messages.append(self._run_premove(premove, event.due_ms))
+            event = self.timeline.pop_next(now_ms)
+        return messages
+
+    def is_resting(self, pos: str, now_ms: Optional[int] = None) -> bool:
+        """האם הכלי שבמשבצת עדיין במנוחה אחרי תזוזה"""
+        now_ms = self.now_ms() if now_ms is None else now_ms
+        try:
+            return self.cooldowns.get(square_index(pos), 0) > now_ms
+        except (TypeError, ValueError):
+            return False
+
+    def queue_premove(self, from_pos: str, to_pos: Optional[str], piece_id: str, player_color: str,
+                      now_ms: Optional[int] = None) -> Tuple[bool, Dict[str, Any]]:
+        """
+        premove לכלי במנוחה: מקום אחד לכל כלי (חדש מחליף ישן, to_pos=None מבטל).
+        המהלך יוצא בדיוק ברגע שהמנוחה נגמרת, והחוקיות נבדקת רק אז - מול הלוח של אותו רגע.
+        """
+        now_ms = self.now_ms() if now_ms is None else now_ms
+        if not self.game_started:
+            return False, {"error": "המשחק עדיין לא התחיל"}
+        try:
+            from_square = square_index(from_pos)
+            if to_pos is not None:
+                square_index(to_pos)
+        except (TypeError, ValueError):
+            return False, {"error": f"מיקום לא תקין: {from_pos} -> {to_pos}"}
+            
+        piece = self.board.piece_at(from_square)
+        if piece is None:
+            return False, {"error": f"אין כלי במיקום {from_pos}"}
+        if ("white" if piece.endswith("W") else "black") != player_color:
+            return False, {"error": "לא ניתן להזיז כלי של השחקן השני"}
+        rest_until = self.cooldowns.get(from_square, 0)
+        if rest_until <= now_ms:
+            return False, {"error": "הכלי לא במנוחה"}
+            
+        if to_pos is None:
+            self.premoves.pop(from_square, None)
+            return True, {"type": "premove_cancelled", "from": from_pos, "to": None, "reason": "cancelled"}
+        self.premoves[from_square] = {
+            "from": from_pos,
+            "to": to_pos,
+            "piece_id": piece_id,
+            "player": player_color,
+        }
+        return True, {"type": "premove_queued", "from": from_pos, "to": to_pos, "execute_at": rest_until}
+
+    def _run_premove(self, premove: Dict[str, Any], now_ms: int) -> Dict[str, Any]:
+        """ביצוע premove בסוף המנוחה - move_executed רגיל, או ביטול פרטי לשחקן אם המהלך כבר לא חוקי"""
+        success, result = self.execute_move(premove["from"], premove["to"], premove["piece_id"], premove["player"], now_ms)
+        if success:
+            result["premove"] = True
+            return result
+        return self._premove_cancelled(premove, result["error"])
+
+    @staticmethod
+    def _premove_cancelled(premove: Dict[str, Any], reason: str) -> Dict[str, Any]:
+        return {
+            "type": "premove_cancelled",
+            "from": premove["from"],
+            "to": premove["to"],
+            "player": premove["player"],
+            "reason": reason,
+        }
+
+    def _resolve_arrival(self, flight_id: int, arrive_at: int) -> List[Dict[str, Any]]:
+        """הכלי נוחת: אוכל את מי שנמצא ביעד באותו רגע, מקודם אם צריך ונכנס למנוחה"""
+        flight = self.flights.pop(flight_id)
+        piece = flight['piece_type']
+        to_square = flight['to']
+        to_pos = square_name(to_square)
+        self.reserved.pop((to_square, piece[-1]), None)
+        
+        # מי שיושב ביעד ברגע ההגעה נאכל (אם ברח בזמן - אין אכילה), וה-premove שלו בטל
+        captured_piece = self.board.remove(to_square)
+        captured_premove = self.premoves.pop(to_square, None)
+        
+        promoted = False
+        if self.should_promote_pawn(piece, to_pos):
+            piece = self.promote_pawn_to_queen(piece)
+            promoted = True
+            
+        self.board.place(to_square, piece)
+        self.bump_version()
+        
+        rest_until = arrive_at + MOVE_EXTRA_DELAY_MS + LONG_REST_MS
+        self.cooldowns[to_square] = rest_until
+        self.timeline.schedule(rest_until, "cooldown_end", to_square)
+        
+        messages = [{
+            "type": "piece_arrived",
+            "version": self.version,
+            "from": square_name(flight['from']),
+            "to": to_pos,
+            "piece": piece,
+            "captured": captured_piece,
+            "promoted": promoted,
+            "timestamp": arrive_at,
+            "rest_until": rest_until,
+            "changes": {to_pos: piece},
+            "hash": self.board.hash
+        }]
+        if captured_premove is not None:
+            messages.append(self._premove_cancelled(captured_premove, "captured"))
         
         # אם הייתה לכידה
         if captured_piece:
             capture_data = {
+                'captured_piece_id': captured_piece,
+                'captured_by': piece,
                 'captured_piece': captured_piece,
                 'by_piece': piece,
                 'position': to_pos,
-                'timestamp': move_data['timestamp']
+                'timestamp': arrive_at
             }
             self.event_manager.publish("piece_captured", capture_data)
             
-        # הכנת תגובה ללקוחות
-        response = {
-            "type": "move_executed",
-            "from": from_pos,
-            "to": to_pos,
-            "piece": piece,
-            "captured": captured_piece,
-            "promoted": promoted,
-            "board_state": {k: v for k, v in self.board_state.items() if v is not None}
+            if captured_piece.startswith('K') and self.victory_manager.is_victory():
+                messages.append({
+                    "type": "game_over",
+                    "winner": flight['player'],
+                    "reason": "victory"
+                })
+        return messages
+
+    def bump_version(self):
+        """הלוח השתנה - גרסה חדשה, והגיבוב שלה נזכר לבדיקות verify"""
+        self.version += 1
+        self.hash_history.append((self.version, self.board.hash))
+
+    def hash_at(self, version: int) -> Optional[int]:
+        """גיבוב הלוח בגרסה - None אם היא ישנה מדי (או עוד לא קרתה)"""
+        for known_version, board_hash in reversed(self.hash_history):
+            if known_version == version:
+                return board_hash
+        return None
+
+    def next_event_ms(self) -> Optional[int]:
+        """הזמן של האירוע הבא בציר הזמן (None אם אין)"""
+        return self.timeline.next_due()
+
+    def to_snapshot(self) -> Dict[str, Any]:
+        """תמונת מצב דחוסה של החדר לכתיבה ליומן - כל מה שצריך כדי להמשיך את המשחק"""
+        return {
+            "version": self.version,
+            "elapsed_ms": self.now_ms(),
+            "game_started": self.game_started,
+            "board": self.board_state,
+            "flights": [dict(flight, id=flight_id) for flight_id, flight in self.flights.items()],
+            "cooldowns": {square_name(square): until for square, until in self.cooldowns.items()},
+            "premoves": {square_name(square): premove for square, premove in self.premoves.items()},
+            "next_flight_id": self._next_flight_id,
+            "step_ms": self.step_ms,
+            "history": self.move_history.get_moves(),
+            "score": {
+                "scores": dict(self.scoreboard.scores),
+                "captured": {color: list(pieces) for color, pieces in self.scoreboard.captured_pieces.items()},
+            },
+            "winner": self.victory_manager.winner if self.victory_manager.is_victory() else None,
         }
-        
-        return True, response
+
+    def restore_snapshot(self, snapshot: Dict[str, Any]):
+        """טעינת תמונת מצב ובניית ציר הזמן מחדש"""
+        self.version = snapshot["version"]
+        self.game_started = snapshot["game_started"]
+        self.board = BitBoard.from_dict(snapshot["board"])
+        self.hash_history = deque([(self.version, self.board.hash)], maxlen=HASH_HISTORY)
+        self.timeline = Timeline()
+        self.flights = {}
+        self.reserved = {}
+        for flight in snapshot["flights"]:
+            flight = dict(flight)
+            flight_id = flight.pop("id")
+            self.flights[flight_id] = flight
+            self.reserved[(flight['to'], flight['piece_type'][-1])] = flight_id
+            self.timeline.schedule(flight['arrive_at'], "arrival", flight_id)
+        self.cooldowns = {}
+        for pos, until in snapshot["cooldowns"].items():
+            self.cooldowns[square_index(pos)] = until
+            self.timeline.schedule(until, "cooldown_end", square_index(pos))
+        self.premoves = {square_index(pos): dict(premove) for pos, premove in snapshot.get("premoves", {}).items()}
+        self._next_flight_id = snapshot["next_flight_id"]
+        self.step_ms = snapshot.get("step_ms", 0)
+        self.move_history.moves = list(snapshot["history"])
+        self.scoreboard.scores = dict(snapshot["score"]["scores"])
+        self.scoreboard.captured_pieces = {color: list(pieces) for color, pieces in snapshot["score"]["captured"].items()}
+        if snapshot.get("winner"):
+            self.victory_manager.winner = snapshot["winner"]
+            self.victory_manager.victory_message = f"{snapshot['winner']} WINS!"
+            self.victory_manager.victory_announced = True
+        self.resume_clock(snapshot["elapsed_ms"])
+
+    def replay_move(self, record: Dict[str, Any]) -> bool:
+        """הרצה מחדש של מהלך מהיומן, בזמן המשחק שבו הוא התקבל - False אם לא התבצע"""
+        now_ms = record["timestamp"]
+        # מהלך ביומן אומר שהמשחק כבר התחיל (גם אם אין תמונת מצב)
+        self.game_started = True
+        self.advance(now_ms)
+        success, result = self.execute_move(record["from"], record["to"], record["piece_id"], record["player"], now_ms)
+        if not success:
+            print(f"⚠️ מהלך {record['from']} -> {record['to']} מהיומן (seq {record.get('seq')}) נכשל: {result['error']}")
+        return success
+
+    def resume_clock(self, elapsed_ms: int):
+        """שעון המשחק ממשיך מ-elapsed_ms - זמן ההשבתה לא נספר, כלים בדרך ינחתו כרגיל"""
+        self.game_started = True
+        self.start_time = time.monotonic() - elapsed_ms / 1000
 
     def get_full_state(self) -> Dict[str, Any]:
         """החזרת מצב מלא של המשחק"""
-        return {
+        state = {
             "type": "full_state",
-            "board": {k: v for k, v in self.board_state.items() if v is not None},
+            "version": self.version,
+            "hash": self.board.hash,
+            "board": self.board_state,
             "game_started": self.game_started,
             "move_history": self.move_history.get_last_moves(10),
             "score": self.scoreboard.get_scores() if hasattr(self.scoreboard, 'get_scores') else {}
         }
+        if self.lockstep:
+            # כל מה שהסימולציה של הלקוח צריכה כדי להמשיך מכאן לבד (LockstepSim.from_full_state)
+            state.update({
+                "lockstep": True,
+                "step_ms": self.step_ms,
+                "flights": [[square_name(flight['from']), square_name(flight['to']), flight['piece_type'], flight['arrive_at']]
+                            for flight in self.flights.values()],
+                "speeds": {piece_type: self.speed_pix_per_sec(piece_type) for piece_type in PIECE_TYPES},
+            })
+        return state
 
     def start_game(self):
         """התחלת המשחק"""
         self.game_started = True
-        self.start_time = time.time()
+        self.start_time = time.monotonic()
         start_data = {
             'timestamp': 0,
             'message': 'Game Started!'
@@ -219,150 +572,783 @@ class GameState:
 
 
 class GameServer:
-    """שרת המשחק המרכזי"""
+    """שרת המשחק המרכזי - מארח חדרי משחק רבים במקביל"""
     
-    def __init__(self):
-        self.clients = {}  # websocket -> {"color": str, "player_id": str}
-        self.game_state = GameState()
-        self.max_players = 2
-        
-    async def register_client(self, websocket) -> Optional[str]:
-        """רישום לקוח חדש"""
-        if len(self.clients) >= self.max_players:
-            await websocket.send(json.dumps({
+    def __init__(self, journal: Optional[MoveJournal] = None):
+        self.rooms = RoomManager(GameState, max_players=2, tick_hz=ROOM_TICK_HZ)
+        self.journal = journal
+        self.shutting_down = False
+        self.client_rooms = {}  # websocket -> Room
+        # גלגל טיימרים אחד לכל החדרים, ומשימה אחת שמקדמת אותו כל טיק
+        self.timers = TimerWheel(tick_ms=TIMER_TICK_MS, now_ms=self.clock_ms())
+        self._ticker: Optional[asyncio.Task] = None
+        self.room_timers: Dict[str, TimerHandle] = {}  # room_id -> התעוררות לאירוע הבא
+        self.tick_timers: Dict[str, TimerHandle] = {}  # room_id -> הטיק הבא של חדר במצב טיקים
+        self.room_tasks = set()
+        self.seat_timers: Dict[str, TimerHandle] = {}  # resume token -> תפוגת המושב
+        self.writers: Dict[Any, ClientWriter] = {}  # websocket -> תור שליחה משלו
+        self.spectator_rooms: Dict[Any, Room] = {}  # websocket של צופה -> Room
+        self.relays: Dict[str, SpectatorRelay] = {}  # room_id -> ממסר הצופים
+        self.actors: Dict[str, RoomActor] = {}  # room_id -> התיבה והמשימה שמבצעת את בקשות החדר
+        
+        # הגנה מהצפה - פיגור הלולאה ומוני ההודעות שנזרקו
+        self.lag_monitor = LoopLagMonitor()
+        self.drops = DropCounters()
+        self.hash_mismatches = 0  # בקשות verify שנענו במצב מלא
+
+    async def start(self, owns=None):
+        """הפעלת משימות הרקע ושחזור החדרים מהיומן"""
+        # חוקי הכלים נטענים כבר כאן - תיקייה חסרה או חוקים פגומים עוצרים את העלייה
+        shared_rules()
+        self.lag_monitor.start()
+        if self.journal is None:
+            return
+        started = time.perf_counter()
+        for room_id, game_state in self.journal.recover(GameState, owns).items():
+            room = self.rooms.restore(room_id, game_state, self.journal.room_mode(room_id).get("tick_hz"))
+            self.schedule_room_wakeup(room)
+        if len(self.rooms):
+            print(f"♻️ שוחזרו {len(self.rooms)} חדרים מהיומן ב-{(time.perf_counter() - started) * 1000:.0f}ms")
+        await self.journal.start()
+
+    async def close(self):
+        """כיבוי מסודר - היומן נשמר כדי שהמשחקים יחזרו בהפעלה הבאה"""
+        self.shutting_down = True
+        await self.lag_monitor.stop()
+        for room_id in list(self.room_timers):
+            self.timers.cancel(self.room_timers.pop(room_id))
+        for room_id in list(self.tick_timers):
+            self.timers.cancel(self.tick_timers.pop(room_id))
+        for token in list(self.seat_timers):
+            self.timers.cancel(self.seat_timers.pop(token))
+        for room_id in list(self.actors):
+            self.actors.pop(room_id).close()
+        if self._ticker is not None:
+            self._ticker.cancel()
+            try:
+                await self._ticker
+            except asyncio.CancelledError:
+                pass
+            self._ticker = None
+        if self.journal is not None:
+            await self.journal.close()
+
+    @staticmethod
+    def get_connection_params(websocket) -> Dict[str, str]:
+        """פרמטרים מכתובת החיבור (למשל ws://host:8765/?room=abc)"""
+        request = getattr(websocket, "request", None)
+        path = request.path if request is not None else getattr(websocket, "path", "")
+        query = parse_qs(urlparse(path or "").query)
+        return {key: values[-1] for key, values in query.items() if values}
+        
+    async def register_client(self, websocket, room: Room) -> Optional[str]:
+        """
+        רישום לקוח חדש בחדר - במשימה של החדר, אחרי הבקשות שכבר בתיבה.
+        הודעת "המשחק מלא" נשלחת מכאן, מהקורא: לחיבור שלא נכנס אין תור, והשליחה
+        הישירה אליו לא מעכבת את התיבה של החדר.
+        """
+        color = await self.actor_for(room).call("join", lambda: self._seat_client(websocket, room))
+        if color is None:
+            await self.send_to(websocket, {
                 "type": "error", 
                 "message": "המשחק מלא - יש כבר 2 שחקנים"
-            }))
+            })
+        return color
+
+    async def _seat_client(self, websocket, room: Room) -> Optional[str]:
+        """הושבה בחדר - None אם אין מושב פנוי"""
+        if room.is_full():
             return None
             
         # הקצאת צבע
-        if "white" not in [client["color"] for client in self.clients.values()]:
+        taken_colors = room.taken_colors()
+        if "white" not in taken_colors:
             color = "white"
-        elif "black" not in [client["color"] for client in self.clients.values()]:
+        elif "black" not in taken_colors:
             color = "black"
         else:
             return None
             
-        # רישום הלקוח
-        player_id = f"player_{len(self.clients) + 1}"
-        self.clients[websocket] = {"color": color, "player_id": player_id}
+        # רישום הלקוח - עם token שמאפשר לחזור לאותו מושב אחרי ניתוק
+        player_id = room.next_player_id()
+        resume_token = secrets.token_urlsafe(16)
+        room.clients[websocket] = {"color": color, "player_id": player_id, "resume_token": resume_token}
+        self.client_rooms[websocket] = room
         
         # שליחת הודעת הקצאת צבע
-        await websocket.send(json.dumps({
+        await self.send_to(websocket, {
             "type": "assign_color", 
             "color": color,
-            "player_id": player_id
-        }))
+            "player_id": player_id,
+            "room": room.room_id,
+            "resume_token": resume_token
+        })
         
         # שליחת מצב מלא של המשחק
-        await websocket.send(json.dumps(self.game_state.get_full_state()))
+        await self.send_full_state(websocket, room)
         
         # התחלת המשחק מיד (אפילו עם שחקן אחד - לבדיקה)
-        if not self.game_state.game_started:
-            self.game_state.start_game()
-            await self.broadcast_to_all({
+        if not room.game_state.game_started:
+            room.game_state.start_game()
+            await self.broadcast_to_all(room, {
                 "type": "game_started",
                 "message": "המשחק התחיל! אין תורות - כל שחקן יכול להזיז מתי שהוא רוצה!"
             })
         
         # הודעה נוספת אם יש 2 שחקנים
-        if len(self.clients) == 2:
-            await self.broadcast_to_all({
+        if len(room.clients) == 2:
+            await self.broadcast_to_all(room, {
                 "type": "info",
                 "message": "שני שחקנים מחוברים - המשחק יכול להתחיל ברצינות!"
             })            
         return color
 
+    async def resume_client(self, websocket, room: Room, token: str, last_seq: Optional[int]) -> Optional[str]:
+        """
+        שחקן שחוזר עם resume token מקבל את אותו מושב (צבע ומזהה),
+        ורק את ההודעות שפספס מאז last_seq. אם הפער גדול מהמאגר - מצב מלא אחד.
+        """
+        return await self.actor_for(room).call("resume", lambda: self._resume_seat(websocket, room, token, last_seq))
+
+    async def _resume_seat(self, websocket, room: Room, token: str, last_seq: Optional[int]) -> Optional[str]:
+        seat = room.take_seat(token)
+        if seat is None:
+            return None
+        timer = self.seat_timers.pop(token, None)
+        if timer is not None:
+            self.timers.cancel(timer)
+            
+        room.clients[websocket] = dict(seat, resume_token=token)
+        self.client_rooms[websocket] = room
+        print(f"🔁 שחקן {seat['player_id']} ({seat['color']}) חזר לחדר {room.room_id} (seq {last_seq} -> {room.seq})")
+        
+        await self.send_to(websocket, {
+            "type": "resumed",
+            "color": seat["color"],
+            "player_id": seat["player_id"],
+            "room": room.room_id,
+            "resume_token": token
+        })
+        missed = room.messages_since(last_seq)
+        if missed is None:
+            await self.send_full_state(websocket, room)
+        else:
+            for message in missed:
+                await self.send_to(websocket, message)
+                
+        await self.broadcast_to_all(room, {
+            "type": "player_reconnected",
+            "player": seat["player_id"],
+            "color": seat["color"]
+        })
+        return seat["color"]
+
+    async def send_full_state(self, websocket, room: Room):
+        """שליחת המצב המלא מהמטמון של החדר - בלי לבנות ולקודד מחדש"""
+        payload = room.encoded_full_state(WireProtocol.format_of(websocket))
+        if websocket in self.client_rooms or websocket in self.spectator_rooms:
+            self.writer_for(websocket, room).enqueue(payload, "full_state")
+        else:
+            await websocket.send(payload)
+
     async def handle_move_request(self, websocket, data: Dict[str, Any]):
         """טיפול בבקשת מהלך מלקוח"""
-        if websocket not in self.clients:
+        room = self.client_rooms.get(websocket)
+        if room is None or websocket not in room.clients:
             return
             
-        client = self.clients[websocket]
+        client = room.clients[websocket]
         player_color = client["color"]
         
         from_pos = data.get("from")
         to_pos = data.get("to")
         piece_id = data.get("piece", "")
         
-        # ביצוע המהלך בלוגיקה המרכזית
-        success, result = self.game_state.execute_move(from_pos, to_pos, piece_id, player_color)
+        # קודם מריצים את ציר הזמן עד עכשיו (הגעות שכבר היו אמורות לקרות),
+        # ורק אז מבצעים את המהלך בלוגיקה של החדר בלבד - בלי await באמצע
+        game_state = room.game_state
+        now_ms = game_state.now_ms()
+        arrivals = game_state.advance(now_ms)
+        success, result = game_state.execute_move(from_pos, to_pos, piece_id, player_color, now_ms)
+        
+        await self.publish_events(room, arrivals)
         
         if success:
-            # שליחת עדכון לכל הלקוחות
-            await self.broadcast_to_all(result)
-            
-            # בדיקת ניצחון
-            if self.game_state.victory_manager.is_victory():
-                await self.broadcast_to_all({
-                    "type": "game_over",
-                    "winner": "black" if player_color == "white" else "white",
-                    "reason": "victory"
+            if self.journal is not None:
+                self.journal_move(room, {
+                    "from": from_pos,
+                    "to": to_pos,
+                    "piece_id": piece_id,
+                    "player": player_color,
+                    "timestamp": now_ms,
                 })
+            # שליחת עדכון לכל הלקוחות בחדר
+            await self.broadcast_to_all(room, result)
+            self.schedule_room_wakeup(room)
         else:
             # שליחת שגיאה רק לשחקן שניסה לבצע את המהלך
-            await websocket.send(json.dumps({
+            # from/to חוזרים ללקוח כדי שיבטל בדיוק את המהלך שכבר הזיז מקומית
+            await self.send_to(websocket, {
                 "type": "move_error",
-                "message": result["error"]
-            }))
-
-    async def broadcast_to_all(self, message: Dict[str, Any]):
-        """שליחת הודעה לכל הלקוחות"""
-        if self.clients:
-            disconnected = []
-            # יצירת רשימה קבועה של הלקוחות כדי למנוע שינוי במהלך הלולאה
-            clients_list = list(self.clients.keys())
-            for websocket in clients_list:
-                try:
-                    await websocket.send(json.dumps(message))
-                except websockets.exceptions.ConnectionClosed:
-                    disconnected.append(websocket)
-                    
-            # הסרת לקוחות מנותקים
-            for ws in disconnected:
-                await self.remove_client(ws)
+                "message": result["error"],
+                "from": from_pos,
+                "to": to_pos
+            })
+
+    async def handle_premove_request(self, websocket, data: Dict[str, Any]):
+        """
+        premove לכלי במנוחה - השרת שומר אותו ומבצע אותו בעצמו ברגע שהמנוחה נגמרת,
+        כך שהלקוח לא מציף בניסיונות חוזרים. התשובה (נשמר / נדחה) רק לשחקן עצמו.
+        """
+        room = self.client_rooms.get(websocket)
+        if room is None or websocket not in room.clients:
+            return
+        player_color = room.clients[websocket]["color"]
+        from_pos = data.get("from")
+        to_pos = data.get("to")
+        
+        game_state = room.game_state
+        now_ms = game_state.now_ms()
+        await self.publish_events(room, game_state.advance(now_ms))
+        if to_pos is not None and not game_state.is_resting(from_pos, now_ms):
+            # המנוחה כבר נגמרה (הלקוח עוד מציג אותה) - זה פשוט מהלך רגיל
+            await self.handle_move_request(websocket, data)
+            return
+        success, result = game_state.queue_premove(from_pos, to_pos, data.get("piece", ""), player_color, now_ms)
+        if not success:
+            result = {"type": "premove_cancelled", "from": from_pos, "to": to_pos, "reason": result["error"]}
+        await self.send_to(websocket, result)
+        self.schedule_room_wakeup(room)
+
+    async def publish_events(self, room: Room, messages: List[Dict[str, Any]]):
+        """
+        הודעות מציר הזמן של החדר: משודרות לכולם, חוץ מביטול premove שהולך רק לבעליו.
+        מהלך שיצא מ-premove נרשם ביומן כמו כל מהלך, בזמן שבו יצא.
+        """
+        for message in messages:
+            if message["type"] == "premove_cancelled":
+                for websocket, client in list(room.clients.items()):
+                    if client["color"] == message["player"]:
+                        await self.send_to(websocket, message)
+                continue
+            if message.get("premove") and self.journal is not None:
+                self.journal_move(room, {
+                    "from": message["from"],
+                    "to": message["to"],
+                    "piece_id": message["piece"],
+                    "player": "white" if message["piece"].endswith("W") else "black",
+                    "timestamp": message["timestamp"],
+                })
+            await self.broadcast_to_all(room, message)
+
+    def journal_move(self, room: Room, move: Dict[str, Any]):
+        """מהלך ליומן, עם מצב החדר לכותרת שלו - כך שהחדר חוזר באותו מצב גם בלי תמונת מצב"""
+        self.journal.record_move(room.room_id, room.game_state, move,
+                                 mode={"tick_hz": room.tick_hz, "step_ms": room.game_state.step_ms})
+
+    def schedule_room_wakeup(self, room: Room):
+        """
+        תזמון התעוררות אחת לאירוע הקרוב בציר הזמן של החדר.
+        אין לולאת פריימים - החדר ישן עד ההגעה או סיום המנוחה הבאים.
+        """
+        self.cancel_room_wakeup(room)
+        due_ms = room.game_state.next_event_ms()
+        if due_ms is None:
+            return
+        # השעון של החדר (מתחילת המשחק) מתורגם לשעון של הגלגל
+        delay_ms = max(0, due_ms - room.game_state.now_ms())
+        self.room_timers[room.room_id] = self.schedule_timer(delay_ms, "room", room)
+
+    def clock_ms(self) -> int:
+        return int(time.monotonic() * 1000)
+
+    def schedule_timer(self, delay_ms: float, kind: str, payload: Any) -> TimerHandle:
+        """טיימר בגלגל המשותף - ומשימת הטיקים מתעוררת אם היא ישנה"""
+        now = self.clock_ms()
+        handle = self.timers.schedule(now + int(math.ceil(delay_ms)), kind, payload, now_ms=now)
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.ensure_future(self._tick_loop())
+        return handle
+
+    async def _tick_loop(self):
+        """מקדם את הגלגל כל טיק כל עוד יש בו טיימרים"""
+        while len(self.timers):
+            await asyncio.sleep(TIMER_TICK_MS / 1000)
+            self.fire_timers()
+
+    def fire_timers(self, now_ms: Optional[int] = None) -> int:
+        """הפעלת כל הטיימרים שזמנם הגיע - חדר שהתעורר מריץ את ציר הזמן במשימה של החדר"""
+        fired = self.timers.advance(self.clock_ms() if now_ms is None else now_ms)
+        for handle in fired:
+            if handle.kind == "room":
+                room = handle.payload
+                if self.room_timers.get(room.room_id) is handle:
+                    del self.room_timers[room.room_id]
+                    # בתור של החדר, אחרי הבקשות שכבר הגיעו - לא במקביל להן.
+                    # ההתעוררות כבר לא בגלגל, ולכן אם לא נכנסה לתיבה מתזמנים אותה שוב
+                    if not self.actor_for(room).submit("events", lambda room=room: self.run_room_events(room), internal=True):
+                        if self.rooms.get(room.room_id) is room:
+                            self.room_timers[room.room_id] = self.schedule_timer(INBOX_RETRY_MS, "room", room)
+            elif handle.kind == "seat":
+                room, token = handle.payload
+                if self.seat_timers.get(token) is handle:
+                    self.actor_for(room).submit(
+                        "seat", lambda room=room, token=token, handle=handle: self._expire_seat(room, token, handle),
+                        internal=True)
+            elif handle.kind == "tick":
+                room = handle.payload
+                if self.tick_timers.get(room.room_id) is handle:
+                    self.actor_for(room).submit("tick", lambda room=room: self.run_room_tick(room), internal=True)
+        return len(fired)
+
+    async def run_room_events(self, room: Room):
+        """הרצת ציר הזמן של החדר עד עכשיו ושידור ההגעות והאכילות"""
+        await self.publish_events(room, room.game_state.advance())
+        if self.rooms.get(room.room_id) is room:
+            self.schedule_room_wakeup(room)
+
+    async def run_room_tick(self, room: Room):
+        """הטיק של החדר - במשימה של החדר, כדי שלא ישדר באמצע מהלך"""
+        self.flush_room_tick(room)
+
+    def cancel_room_wakeup(self, room: Room):
+        handle = self.room_timers.pop(room.room_id, None)
+        if handle is not None:
+            self.timers.cancel(handle)
+
+    async def broadcast_to_all(self, room: Room, message: Dict[str, Any]) -> int:
+        """
+        שליחת הודעה לכל הלקוחות בחדר.
+        ההודעה מקודדת פעם אחת לכל פורמט ונכנסת לתור היוצא של כל לקוח -
+        השידור לא מחכה לאף חיבור, כך שלקוח איטי מעכב רק את עצמו.
+        מחזיר לכמה לקוחות ההודעה נכנסה לתור (0 לשינוי לוח שמחכה לטיק של החדר).
+        """
+        if room.game_state.lockstep:
+            # חדר lockstep - רק הקלט וסימון הנחיתה יוצאים, את השאר הלקוח מחשב בעצמו
+            message = to_wire(message)
+        if room.tick_hz and "changes" in message and "version" in message:
+            # מצב טיקים - שינויי הלוח מחכים לטיק הבא ויוצאים בו כעדכון אחד
+            room.pending_updates.append(message)
+            self.schedule_room_tick(room)
+            return 0
+        if room.pending_updates:
+            # הודעה אחרת (למשל game_over) לא עוקפת את שינויי הלוח שלפניה
+            self.flush_room_tick(room)
+        return self.deliver(room, message)
+
+    def schedule_room_tick(self, room: Room):
+        """הטיק הבא של החדר - על רשת קבועה של 1/tick_hz, רק כשיש מה לשלוח"""
+        if room.room_id in self.tick_timers:
+            return
+        period_ms = 1000 / room.tick_hz
+        delay_ms = period_ms - self.clock_ms() % period_ms
+        self.tick_timers[room.room_id] = self.schedule_timer(delay_ms, "tick", room)
+
+    def flush_room_tick(self, room: Room) -> int:
+        """שידור כל שינויי הלוח שהצטברו כעדכון אחד - מחזיר כמה הודעות מוזגו"""
+        handle = self.tick_timers.pop(room.room_id, None)
+        if handle is not None:
+            self.timers.cancel(handle)
+        pending, room.pending_updates = room.pending_updates, []
+        for message in coalesce(pending):
+            self.deliver(room, message)
+        return len(pending)
+
+    def deliver(self, room: Room, message: Dict[str, Any]) -> int:
+        """מספור ההודעה והכנסתה לתורים של השחקנים - בלי מצב הטיקים"""
+        # כל הודעה משודרת מקבלת מספר רץ בחדר ונשמרת ביומן השידור -
+        # ממנו משלימים פערים אחרי ניתוק וממנו הממסר מזין את הצופים
+        message = room.stamp(message)
+        if room.spectators:
+            self.relay_for(room).notify()
+        if not room.clients:
+            return 0
+        payloads = {}
+        kind = message.get("type")
+        
+        queued = 0
+        # רשימה קבועה של הלקוחות - ניתוק צרכן איטי משנה את החדר תוך כדי
+        for websocket in list(room.clients.keys()):
+            fmt = WireProtocol.format_of(websocket)
+            if fmt not in payloads:
+                payloads[fmt] = WireProtocol.encode(message, fmt)
+            if self.writer_for(websocket, room).enqueue(payloads[fmt], kind):
+                queued += 1
+        return queued
+
+    async def send_to(self, websocket, message: Dict[str, Any]):
+        """שליחת הודעה ללקוח בודד בפורמט שסוכם איתו (דרך התור שלו, אם הוא בחדר)"""
+        payload = WireProtocol.encode(message, WireProtocol.format_of(websocket))
+        room = self.client_rooms.get(websocket) or self.spectator_rooms.get(websocket)
+        if room is None:
+            # לקוח שלא נכנס לחדר (למשל חדר מלא) - שליחה ישירה
+            await websocket.send(payload)
+            return
+        self.writer_for(websocket, room).enqueue(payload, message.get("type"))
+
+    def writer_for(self, websocket, room: Room) -> ClientWriter:
+        """התור היוצא של החיבור - נוצר בשליחה הראשונה"""
+        writer = self.writers.get(websocket)
+        if writer is None:
+            batching = self.get_connection_params(websocket).get("batch") == "1"
+            writer = ClientWriter(
+                websocket,
+                max_depth=SEND_QUEUE_DEPTH,
+                slow_deadline=SLOW_CONSUMER_DEADLINE,
+                on_latency=room.record_send_latency,
+                on_slow=self._on_slow_consumer,
+                batch_window=BATCH_WINDOW_MS / 1000 if batching else None,
+            )
+            self.writers[websocket] = writer
+        return writer
+
+    def actor_for(self, room: Room) -> RoomActor:
+        """התיבה של החדר - נוצרת עם הבקשה הראשונה"""
+        actor = self.actors.get(room.room_id)
+        if actor is None:
+            actor = self.actors[room.room_id] = RoomActor(room.room_id, max_depth=ROOM_INBOX_DEPTH)
+        return actor
+
+    def relay_for(self, room: Room) -> SpectatorRelay:
+        """ממסר הצופים של החדר - נוצר עם הצופה הראשון"""
+        relay = self.relays.get(room.room_id)
+        if relay is None:
+            relay = SpectatorRelay(room, writer_for=lambda websocket: self.writer_for(websocket, room))
+            self.relays[room.room_id] = relay
+        return relay
+
+    async def register_spectator(self, websocket, room: Room, max_rate: Optional[float] = None) -> str:
+        """
+        צופה - לא תופס מקום של שחקן ומקבל את החדר רק דרך הממסר.
+        max_rate - עד כמה עדכונים לשנייה הצופה רוצה (None - כל הודעה מיד).
+        """
+        spectator_id = room.next_spectator_id()
+        room.spectators[websocket] = {"spectator_id": spectator_id, "max_rate": max_rate}
+        self.spectator_rooms[websocket] = room
+        await self.send_to(websocket, {
+            "type": "spectator_joined",
+            "spectator_id": spectator_id,
+            "room": room.room_id,
+            "spectators": len(room.spectators),
+            "max_rate": max_rate
+        })
+        self.relay_for(room).add(websocket, max_rate)
+        print(f"👀 צופה {spectator_id} הצטרף לחדר {room.room_id} ({len(room.spectators)} צופים)")
+        return spectator_id
+
+    async def handle_spectator_message(self, websocket, room: Room, limiter: ConnectionLimiter, message):
+        """צופה יכול רק לבקש מצב מלא או לאמת את הלוח שלו - כל השאר נזרק ולא מגיע ללוגיקת המשחק"""
+        if len(message) > MAX_FRAME_BYTES:
+            self.drops.record("frame_too_large")
+            return
+        try:
+            data = WireProtocol.decode(message)
+        except (ValueError, IndexError):
+            self.drops.record("bad_frame")
+            return
+        action = data.get("action") if isinstance(data, dict) else None
+        if action not in ("get_state", "verify", "ping"):
+            self.drops.record("spectator_input", action if isinstance(action, str) else "unknown")
+            return
+        if not await self.admit(websocket, limiter, action):
+            return
+        if action == "ping":
+            await self.send_pong(websocket, room, data)
+        elif action == "get_state" or not self.board_matches(room, data):
+            self.relay_for(room).resync(websocket)
+
+    async def send_pong(self, websocket, room: Room, data: Dict[str, Any]):
+        """
+        תשובה ל-ping של סנכרון השעון: t0 של הלקוח חוזר כמו שהוא, יחד עם זמן המשחק
+        של החדר - אותו שעון שממנו timestamp ו-arrive_at של המהלכים.
+        """
+        t0 = data.get("t0")
+        if not isinstance(t0, (int, float)) or isinstance(t0, bool):
+            self.drops.record("bad_frame")
+            return
+        await self.send_to(websocket, {"type": "pong", "t0": t0, "server_ms": room.game_state.now_ms()})
+
+    def board_matches(self, room: Room, data: Dict[str, Any]) -> bool:
+        """
+        בדיקת verify: האם הגיבוב שהלקוח שלח תואם ללוח בשרת באותה גרסה.
+        גרסה שכבר לא זוכרים (הלקוח מאחור מדי) נחשבת אי-התאמה - הוא צריך מצב מלא.
+        בקשה פגומה נספרת ונזרקת (מחזיר True - לא שולחים עליה מצב מלא).
+        """
+        version, client_hash = data.get("version"), data.get("hash")
+        if not isinstance(version, int) or not isinstance(client_hash, int):
+            self.drops.record("bad_frame")
+            return True
+        if room.game_state.hash_at(version) == client_hash:
+            return True
+        self.hash_mismatches += 1
+        print(f"🧮 הלוח של לקוח בחדר {room.room_id} לא תואם בגרסה {version} - שולח מצב מלא")
+        return False
+
+    def _on_slow_consumer(self, websocket, reason: str):
+        self.drops.record("slow_consumer", reason)
+        task = asyncio.ensure_future(self.drop_slow_client(websocket))
+        self.room_tasks.add(task)
+        task.add_done_callback(self.room_tasks.discard)
+
+    async def drop_slow_client(self, websocket):
+        """ניתוק לקוח שלא עומד בקצב - המושב נשמר לו, והוא ישלים פערים כשיחזור"""
+        await self.remove_client(websocket)
+        try:
+            await asyncio.wait_for(websocket.close(), 1.0)
+        except Exception:
+            # חלון ה-TCP מלא גם ללחיצת הסגירה - סוגרים את החיבור בכוח
+            transport = getattr(websocket, "transport", None)
+            if transport is not None:
+                transport.abort()
+
+    def queue_report(self, room: Room) -> Dict[str, Dict[str, Any]]:
+        """עומק התור ומוני השליחה/זריקה של כל לקוח בחדר, לפי מזהה שחקן"""
+        return {client["player_id"]: self.writers[websocket].metrics()
+                for websocket, client in room.clients.items() if websocket in self.writers}
+
+    def inbox_report(self) -> Dict[str, Dict[str, Any]]:
+        """עומק התיבה, זמני ההמתנה והביצוע וכמה בקשות נזרקו - לכל חדר"""
+        return {room_id: actor.metrics() for room_id, actor in self.actors.items()}
+
+    async def drain(self):
+        """המתנה עד שהחדרים ביצעו את כל הבקשות שבתיבות, ואז עד שכל התורים היוצאים התרוקנו"""
+        await asyncio.gather(*(actor.join() for actor in list(self.actors.values())))
+        await asyncio.gather(*(writer.drain() for writer in list(self.writers.values())))
 
     async def remove_client(self, websocket):
-        """הסרת לקוח מנותק"""
-        if websocket in self.clients:
-            client = self.clients[websocket]
-            print(f"❌ שחקן {client['player_id']} ({client['color']}) התנתק")
-            del self.clients[websocket]
+        """
+        הסרת לקוח מנותק - המושב שלו נשמר לזמן מה כדי שיוכל לחזור.
+        השינוי בחדר (מושב שמור, הודעה לנותרים, סגירת חדר ריק) במשימה של החדר,
+        והתור היוצא נסגר רק אחריו - כשכבר אף שידור לא יכול להגיע אליו.
+        """
+        room = self.spectator_rooms.get(websocket) or self.client_rooms.get(websocket)
+        if room is not None:
+            await self.actor_for(room).call("leave", lambda: self._leave_room(websocket))
+            # החדר נסגר לפני שהגיע התור - מנקים בכל זאת
+            self.spectator_rooms.pop(websocket, None)
+            self.client_rooms.pop(websocket, None)
+        writer = self.writers.pop(websocket, None)
+        if writer is not None:
+            await writer.close()
+
+    async def _leave_room(self, websocket):
+        spectator_room = self.spectator_rooms.pop(websocket, None)
+        if spectator_room is not None:
+            spectator_room.spectators.pop(websocket, None)
+            relay = self.relays.get(spectator_room.room_id)
+            if relay is not None:
+                relay.remove(websocket)
+            self.close_room_if_empty(spectator_room)
+            return
+        room = self.client_rooms.pop(websocket, None)
+        if room is not None and websocket in room.clients:
+            client = room.clients[websocket]
+            print(f"❌ שחקן {client['player_id']} ({client['color']}) התנתק מחדר {room.room_id}")
+            del room.clients[websocket]
+            
+            token = client.get("resume_token")
+            resumable = token is not None and not self.shutting_down
+            if resumable:
+                room.hold_seat(token, client)
+                self.seat_timers[token] = self.schedule_timer(SEAT_HOLD_SECONDS * 1000, "seat", (room, token))
             
             # הודעה ללקוחות הנותרים
-            if self.clients:
-                await self.broadcast_to_all({
+            if room.clients:
+                await self.broadcast_to_all(room, {
                     "type": "player_disconnected",
                     "player": client["player_id"],
-                    "color": client["color"]
+                    "color": client["color"],
+                    "resumable": resumable
                 })
+            else:
+                self.close_room_if_empty(room)
+
+    async def _expire_seat(self, room: Room, token: str, handle: TimerHandle):
+        """השחקן לא חזר בזמן - המושב מתפנה (במשימה של החדר)"""
+        if self.seat_timers.get(token) is not handle:
+            return  # השחקן חזר בזמן שהתפוגה חיכתה בתיבה
+        del self.seat_timers[token]
+        seat = room.take_seat(token)
+        if seat is None:
+            return
+        print(f"⌛ המושב של {seat['player_id']} בחדר {room.room_id} פג")
+        if room.clients:
+            await self.broadcast_to_all(room, {
+                "type": "player_left",
+                "player": seat["player_id"],
+                "color": seat["color"]
+            })
+        else:
+            self.close_room_if_empty(room)
+
+    def close_room_if_empty(self, room: Room):
+        """סגירת חדר שאין בו אף אחד ואף אחד לא צפוי לחזור"""
+        if self.rooms.remove_if_empty(room):
+            self.cancel_room_wakeup(room)
+            handle = self.tick_timers.pop(room.room_id, None)
+            if handle is not None:
+                self.timers.cancel(handle)
+            relay = self.relays.pop(room.room_id, None)
+            if relay is not None:
+                relay.close()
+            actor = self.actors.pop(room.room_id, None)
+            if actor is not None:
+                actor.close()
+            # בכיבוי מסודר החיבורים נסגרים אבל המשחקים צריכים לשרוד
+            if self.journal is not None and not self.shutting_down:
+                self.journal.discard(room.room_id)
+
+    async def handle_message(self, websocket, room: Room, limiter: ConnectionLimiter, message):
+        """
+        הקורא של החיבור: פענוח ובדיקות הגודל והקצב, והבקשה נכנסת לתיבה של החדר.
+        הקורא לא מחכה לביצוע או לשידור - הוא חוזר מיד לקרוא את ההודעה הבאה.
+        """
+        # בדיקה זולה לפני כל פענוח - מסגרת ענקית לא מגיעה ל-JSON
+        if len(message) > MAX_FRAME_BYTES:
+            self.drops.record("frame_too_large")
+            return
+        try:
+            data = WireProtocol.decode(message)
+        except (ValueError, IndexError):
+            self.drops.record("bad_frame")
+            print(f"❌ שגיאה בפענוח הודעה: {message!r}")
+            return
+        if not isinstance(data, dict):
+            self.drops.record("bad_frame")
+            return
+            
+        action = data.get("action")
+        if not await self.admit(websocket, limiter, action, data):
+            return
+        if action == "ping":
+            # קריאה בלבד מהשעון של החדר - עונים מיד, כי זמן בתיבה היה מעוות את מדידת ה-rtt
+            await self.send_pong(websocket, room, data)
+            return
+        if not self.actor_for(room).submit(str(action), lambda: self.dispatch(websocket, room, data)):
+            # החדר לא עומד בקצב - הלקוח מקבל תשובה כמו בעומס ולא נתקע בהמתנה
+            self.drops.record("inbox_full", action if isinstance(action, str) else "unknown")
+            await self.reject(websocket, action, "inbox_full", INBOX_RETRY_MS, data)
+
+    async def dispatch(self, websocket, room: Room, data: Dict[str, Any]):
+        """ביצוע בקשה אחת של לקוח - רק מהמשימה של החדר, לפי סדר ההגעה לתיבה"""
+        if websocket not in room.clients:
+            return  # הלקוח התנתק בזמן שהבקשה חיכתה בתיבה
+        action = data.get("action")
+        try:
+            print(f"📨 קיבלתי מ-{room.clients[websocket]['player_id']} בחדר {room.room_id}: {data}")
+            
+            if action == "move":
+                await self.handle_move_request(websocket, data)
+            elif action == "premove":
+                await self.handle_premove_request(websocket, data)
+            elif action == "get_state":
+                await self.send_full_state(websocket, room)
+            elif action == "verify":
+                if not self.board_matches(room, data):
+                    await self.send_full_state(websocket, room)
+            else:
+                print(f"⚠️ פעולה לא מוכרת: {action}")
+                
+        except Exception as e:
+            print(f"❌ שגיאה בטיפול בהודעה: {e}")
+
+    async def admit(self, websocket, limiter: ConnectionLimiter, action: Optional[str],
+                    request: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        האם לבצע את הפעולה: בעומס זורקים פעולות שאפשר לוותר עליהן,
+        ומעבר לקצב של החיבור זורקים הכל. הלקוח מקבל תשובה כדי לא להיתקע בהמתנה
+        (מהלך שנזרק חוזר עם ה-from/to שלו, כדי שהלקוח יבטל את הניחוש המקומי).
+        """
+        action = action if isinstance(action, str) else "unknown"
+        now = time.monotonic()
+        if self.lag_monitor.overloaded and action in SHEDDABLE_ACTIONS:
+            reason = "overload"
+            retry_after_ms = int(self.lag_monitor.lag_ms) * 2
+        elif not limiter.allow(action, now):
+            reason = "rate_limited"
+            retry_after_ms = limiter.retry_after_ms(action, now)
+        else:
+            return True
+            
+        self.drops.record(reason, action)
+        await self.reject(websocket, action, reason, retry_after_ms, request)
+        return False
+
+    async def reject(self, websocket, action: Optional[str], reason: str, retry_after_ms: int,
+                     request: Optional[Dict[str, Any]] = None):
+        """תשובה לבקשה שנזרקה - מהלך חוזר כ-move_error, בקשת מצב כ-rate_limited"""
+        if action == "move":
+            error = {
+                "type": "move_error",
+                "message": "יותר מדי מהלכים - נסה שוב בעוד רגע",
+                "reason": reason,
+                "retry_after_ms": retry_after_ms
+            }
+            if request is not None:
+                error.update({key: request[key] for key in ("from", "to") if isinstance(request.get(key), str)})
+            await self.send_to(websocket, error)
+        elif action == "get_state":
+            await self.send_to(websocket, {
+                "type": "rate_limited",
+                "action": action,
+                "reason": reason,
+                "retry_after_ms": retry_after_ms
+            })
+
+    def drop_report(self) -> Dict[str, Any]:
+        """מה נזרק ולמה, ומצב העומס של הלולאה"""
+        return {
+            "drops": self.drops.report(),
+            "loop_lag_ms": round(self.lag_monitor.lag_ms, 1),
+            "max_loop_lag_ms": round(self.lag_monitor.max_lag_ms, 1),
+        }
 
     async def handle_client(self, websocket):
         """טיפול בלקוח בודד"""
         try:
-            # רישום הלקוח
-            color = await self.register_client(websocket)
+            # רישום הלקוח בחדר שביקש (ברירת מחדל - החדר הראשי)
+            params = self.get_connection_params(websocket)
+            # tick=N - חדר חדש במצב טיקים (N עדכונים לשנייה), tick=0 - שידור מיד
+            try:
+                tick_hz = float(params["tick"]) if "tick" in params else None
+            except ValueError:
+                tick_hz = None
+            if tick_hz is not None and not (math.isfinite(tick_hz) and 0 <= tick_hz <= MAX_TICK_HZ):
+                tick_hz = None
+            # mode=lockstep - חדר חדש שבו עוברים רק הקלטים (Lockstep.py)
+            lockstep = params.get("mode") == "lockstep"
+            room = self.rooms.get_or_create(params.get("room", RoomManager.DEFAULT_ROOM), tick_hz, lockstep)
+            limiter = ConnectionLimiter()
+            
+            if params.get("role") == "spectator":
+                # צופה - קריאה בלבד, ההודעות שלו לא מגיעות ל-handle_move_request
+                try:
+                    max_rate = float(params["max_rate"]) if "max_rate" in params else None
+                except ValueError:
+                    max_rate = None
+                await self.register_spectator(websocket, room, max_rate)
+                async for message in websocket:
+                    await self.handle_spectator_message(websocket, room, limiter, message)
+                return
+                
+            color = None
+            if "token" in params:
+                # חזרה אחרי ניתוק - token פג או לא מוכר נרשם כשחקן חדש
+                try:
+                    last_seq = int(params["last_seq"]) if "last_seq" in params else None
+                except ValueError:
+                    last_seq = None
+                color = await self.resume_client(websocket, room, params["token"], last_seq)
             if color is None:
+                color = await self.register_client(websocket, room)
+            if color is None:
+                self.close_room_if_empty(room)
                 await websocket.close()
                 return
                 
             # האזנה להודעות מהלקוח
             async for message in websocket:
-                try:
-                    data = json.loads(message)
-                    print(f"📨 קיבלתי מ-{self.clients[websocket]['player_id']}: {data}")
-                    
-                    if data.get("action") == "move":
-                        await self.handle_move_request(websocket, data)
-                    elif data.get("action") == "get_state":
-                        await websocket.send(json.dumps(self.game_state.get_full_state()))
-                    else:
-                        print(f"⚠️ פעולה לא מוכרת: {data.get('action')}")
-                        
-                except json.JSONDecodeError:
-                    print(f"❌ שגיאה בפענוח JSON: {message}")
-                except Exception as e:
-                    print(f"❌ שגיאה בטיפול בהודעה: {e}")
+                await self.handle_message(websocket, room, limiter, message)
                     
         except websockets.exceptions.ConnectionClosed:
             print("🔌 חיבור נסגר")
@@ -373,17 +1359,34 @@ class GameServer:
 
 async def main():
     """פונקציה ראשית לשרת"""
-    game_server = GameServer()
     port = int(os.getenv("PORT", 8765))
-    print("🚀 מתחיל שרת משחק KungFu Chess על localhost:8765")
-
-    async with websockets.serve(game_server.handle_client, "0.0.0.0", port):
+    workers = int(os.getenv("WORKERS", 1))
+    print(f"🚀 מתחיל שרת משחק KungFu Chess על 0.0.0.0:{port}")
 
+    if workers > 1:
+        # מצב ריבוי תהליכים - כל חדר מוצמד לעובד אחד
+        pool = WorkerPool(workers, "0.0.0.0", port, public_host=os.getenv("PUBLIC_HOST"),
+                          journal_dir=os.getenv("JOURNAL_DIR"))
+        pool.start_workers()
+        try:
+            await pool.serve_front()
+        finally:
+            pool.stop_workers()
+        return
 
-    
-    # async with websockets.serve(game_server.handle_client, "localhost", 8765):
-        print("✅ השרת רץ ומחכה לחיבורים...")
-        await asyncio.Future()  # רץ לנצח
+    journal_dir = os.getenv("JOURNAL_DIR")
+    game_server = GameServer(MoveJournal(pathlib.Path(journal_dir)) if journal_dir else None)
+    await game_server.start()
+    try:
+        async with websockets.serve(game_server.handle_client, "0.0.0.0", port,
+                                    select_subprotocol=WireProtocol.select_subprotocol):
+            try:
+                print("✅ השרת רץ ומחכה לחיבורים...")
+                await asyncio.Future()  # רץ לנצח
+            finally:
+                game_server.shutting_down = True
+    finally:
+        await game_server.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+"""
+מצב lockstep - סימולציה דטרמיניסטית של הלוח שרצה זהה בשרת ובלקוח.
+
+בחדר lockstep עוברים ברשת רק הקלטים: מהלך שהשרת קיבל (input: זמן, מ-, אל-)
+וסימון נחיתה (arrive) שקובע את הסדר של הנחיתה הבאה מול הקלטים. כל השאר -
+זמני התנועה, אכילות, קידום, גרסאות וגיבוב הלוח - כל צד מחשב בעצמו מאותם
+מספרים שלמים: הזמנים מעוגלים לצעד קבוע של SIM_STEP_MS, ומשך התנועה הוא
+שורש שלם (math.isqrt) ולא חישוב בנקודה צפה, כך ששני הצדדים מגיעים לאותו ms.
+השרת עדיין מריץ את GameState כדי לבדוק ולסדר את הקלטים ולבדוק את הגיבוב
+שהלקוחות שולחים ב-verify; הקובץ זהה בשני הצדדים.
+"""
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+from BoardHash import hash_board, piece_key, square_index
+
+SIM_STEP_MS = 10              # צעד הסימולציה - כל זמני המשחק בחדר lockstep הם כפולות שלו
+
+# זמני התנועה והמנוחה - אותם ערכים שהלקוח משתמש בהם ב-Physics
+CELL_SIZE_PIX = 80            # גודל משבצת בלקוח
+MOVE_EXTRA_DELAY_MS = 300     # השהיה אחרי ההגעה (MovePhysics)
+LONG_REST_MS = 1500           # מנוחה ארוכה אחרי תזוזה (LongRestPhysics)
+
+
+class LockstepDesync(Exception):
+    """הקלט לא מתאים ללוח המקומי - צריך מצב מלא מהשרת"""
+
+
+def travel_time_ms(dx_pix: int, dy_pix: int, speed_pix_per_sec: int) -> int:
+    """משך התנועה במספרים שלמים בלבד - מרחק (שורש שלם) חלקי המהירות, מעוגל למטה"""
+    distance_um = math.isqrt((dx_pix * dx_pix + dy_pix * dy_pix) * 1_000_000)
+    return max(1, distance_um // max(1, speed_pix_per_sec))
+
+
+def step_down(time_ms: int, step_ms: int = SIM_STEP_MS) -> int:
+    """הצעד שבו (או אחריו) רגע נתון נופל - קלט שהגיע באמצע צעד שייך לתחילתו"""
+    return time_ms - time_ms % step_ms
+
+
+def step_up(duration_ms: int, step_ms: int = SIM_STEP_MS) -> int:
+    """משך מעוגל למעלה לצעדים שלמים - נחיתה תמיד על גבול של צעד"""
+    return -(-duration_ms // step_ms) * step_ms
+
+
+def to_wire(message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ההודעה שיוצאת מחדר lockstep: מהלך הופך לקלט, נחיתה לסימון בלבד,
+    וכל השאר (סוף משחק, הודעות מערכת) עובר כמו שהוא.
+    """
+    kind = message.get("type")
+    if kind == "move_executed":
+        wire = {"type": "input", "t": message["timestamp"], "from": message["from"], "to": message["to"]}
+        if message.get("premove"):
+            wire["premove"] = True
+        return wire
+    if kind == "piece_arrived":
+        return {"type": "arrive"}
+    return message
+
+
+def promotes(piece_type: str, to_pos: str) -> bool:
+    """חייל שמגיע לשורה האחרונה שלו הופך למלכה"""
+    return piece_type in ("PW", "PB") and to_pos[1] == ("8" if piece_type == "PW" else "1")
+
+
+class LockstepSim:
+    """
+    הלוח של חדר lockstep: מיקום -> סוג כלי, הכלים שבדרך לפי סדר היציאה,
+    והגרסה והגיבוב - בדיוק כמו GameState של השרת אחרי אותם קלטים.
+    """
+
+    def __init__(self, board: Dict[str, str], version: int = 0, flights: Iterable = (),
+                 speeds: Optional[Dict[str, int]] = None, step_ms: int = SIM_STEP_MS):
+        self.board: Dict[str, str] = {pos: piece for pos, piece in board.items() if piece}
+        self.hash = hash_board(self.board)
+        self.version = version
+        self.speeds: Dict[str, int] = dict(speeds or {})
+        self.step_ms = step_ms
+        # [מ-, אל-, כלי, זמן נחיתה] - בסדר היציאה, כמו הסדר בציר הזמן של השרת
+        self.flights: List[List[Any]] = [list(flight) for flight in flights]
+
+    @classmethod
+    def from_full_state(cls, state: Dict[str, Any]) -> "LockstepSim":
+        """הלוח, הכלים שבדרך והמהירויות מתוך full_state של חדר lockstep"""
+        return cls(state["board"], state.get("version", 0), state.get("flights", []),
+                   state.get("speeds"), state.get("step_ms", SIM_STEP_MS))
+
+    def travel_ms(self, piece_type: str, from_pos: str, to_pos: str) -> int:
+        speed = self.speeds.get(piece_type)
+        if speed is None:
+            raise LockstepDesync(f"אין מהירות לכלי {piece_type}")
+        dx = (ord(to_pos[0]) - ord(from_pos[0])) * CELL_SIZE_PIX
+        dy = (int(to_pos[1]) - int(from_pos[1])) * CELL_SIZE_PIX
+        return step_up(travel_time_ms(dx, dy, speed), self.step_ms)
+
+    def depart(self, time_ms: int, from_pos: str, to_pos: str) -> Dict[str, Any]:
+        """קלט של מהלך: הכלי עוזב את המשבצת - מחזיר את move_executed שהשרת היה שולח"""
+        piece = self.board.pop(from_pos, None)
+        if piece is None:
+            raise LockstepDesync(f"אין כלי במיקום {from_pos}")
+        self.hash ^= piece_key(piece, square_index(from_pos))
+        self.version += 1
+        arrive_at = time_ms + self.travel_ms(piece, from_pos, to_pos)
+        self.flights.append([from_pos, to_pos, piece, arrive_at])
+        return {
+            "type": "move_executed",
+            "version": self.version,
+            "from": from_pos,
+            "to": to_pos,
+            "piece": piece,
+            "captured": None,
+            "promoted": promotes(piece, to_pos),
+            "timestamp": time_ms,
+            "arrive_at": arrive_at,
+            "changes": {from_pos: None},
+            "hash": self.hash,
+        }
+
+    def apply(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """קלט או סימון נחיתה מהשרת -> ההודעה המלאה שהשרת היה שולח בלי lockstep"""
+        if message.get("type") == "input":
+            result = self.depart(message["t"], message["from"], message["to"])
+            if message.get("premove"):
+                result["premove"] = True
+            return result
+        return self.arrive()
+
+    def arrive(self) -> Dict[str, Any]:
+        """
+        סימון נחיתה: הכלי הבא (זמן הנחיתה המוקדם, ובשוויון - מי שיצא קודם) נוחת,
+        אוכל את מי שביעד ומקודם אם צריך - מחזיר את piece_arrived שהשרת היה שולח.
+        """
+        if not self.flights:
+            raise LockstepDesync("סימון נחיתה בלי כלי בדרך")
+        flight = min(self.flights, key=lambda item: item[3])
+        self.flights.remove(flight)
+        from_pos, to_pos, piece, arrive_at = flight
+        square = square_index(to_pos)
+        captured = self.board.pop(to_pos, None)
+        if captured:
+            self.hash ^= piece_key(captured, square)
+        promoted = promotes(piece, to_pos)
+        if promoted:
+            piece = "Q" + piece[1]
+        self.board[to_pos] = piece
+        self.hash ^= piece_key(piece, square)
+        self.version += 1
+        return {
+            "type": "piece_arrived",
+            "version": self.version,
+            "from": from_pos,
+            "to": to_pos,
+            "piece": piece,
+            "captured": captured,
+            "promoted": promoted,
+            "timestamp": arrive_at,
+            "rest_until": arrive_at + MOVE_EXTRA_DELAY_MS + LONG_REST_MS,
+            "changes": {to_pos: piece},
+            "hash": self.hash,
+        }
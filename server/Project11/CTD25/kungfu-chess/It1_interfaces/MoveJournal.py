@@ -0,0 +1,285 @@
+"""
+יומן מהלכים לכל חדר על הדיסק, לשחזור המשחקים אחרי הפעלה מחדש של השרת.
+
+לכל חדר תיקייה משלו (שם החדר מקודד ל-URL) עם שלושה קבצים:
+- room.json - הכותרת של החדר: המצב שבו נוצר (tick_hz, step_ms של lockstep),
+  נכתבת פעם אחת עם המהלך הראשון - גם חדר שעוד אין לו תמונת מצב חוזר באותו מצב
+- journal.log - שורת JSON לכל מהלך שהתקבל, רק הוספה בסוף הקובץ
+- snapshot.json - תמונת מצב דחוסה של החדר (לוח, כלים בדרך, ניקוד, היסטוריה)
+
+הכתיבה לא חוסמת את לולאת האירועים: המהלכים נצברים בזיכרון,
+ומשימת רקע כותבת את כל המצטבר פעם ב-flush_interval ועושה fsync אחד לכל חדר
+בתוך thread נפרד.
+כל snapshot_every מהלכים בחדר נכתבת תמונת מצב חדשה (קובץ זמני + os.replace),
+והיומן של החדר מתקצר - נשאר בו רק הזנב שאחרי תמונת המצב.
+
+בשחזור: טוענים את תמונת המצב האחרונה ומריצים מחדש את זנב היומן. מהלך מהיומן
+שלא מתבצע שוב אומר שהמשחק המשוחזר סטה מהמקורי - השחזור נכשל (JournalReplayError)
+במקום להעלות חדר עם לוח אחר.
+"""
+import asyncio
+import json
+import os
+import pathlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+JOURNAL_FILE = "journal.log"
+SNAPSHOT_FILE = "snapshot.json"
+ROOM_FILE = "room.json"
+
+
+class JournalReplayError(RuntimeError):
+    """מהלכים מהיומן שלא התבצעו שוב בשחזור"""
+
+
+class MoveJournal:
+    """יומן הוספה-בלבד עם fsync מקובץ ותמונות מצב תקופתיות"""
+
+    def __init__(self, root: pathlib.Path, flush_interval: float = 0.05, snapshot_every: int = 50):
+        self.root = pathlib.Path(root)
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        # פעולות שממתינות לכתיבה, לפי חדר ובסדר שבו נוצרו
+        self._pending: Dict[str, List[Tuple[str, Any]]] = {}
+        self._seq: Dict[str, int] = {}              # מספר הרשומה האחרונה בכל חדר
+        self._since_snapshot: Dict[str, int] = {}   # מהלכים מאז תמונת המצב האחרונה
+        self._modes: Dict[str, Dict[str, Any]] = {}  # הכותרת של כל חדר שכבר נרשמה
+        self._flusher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+
+    def room_dir(self, room_id: str) -> pathlib.Path:
+        return self.root / quote(room_id, safe="")
+
+    # ─── רישום ────────────────────────────────────────────────────────
+
+    def record_move(self, room_id: str, game_state, move: Dict[str, Any],
+                    mode: Optional[Dict[str, Any]] = None):
+        """
+        רישום מהלך שהתקבל (בזיכרון בלבד - הכתיבה לדיסק במשימת הרקע).
+        mode - מצב החדר (tick_hz, step_ms) לכותרת, נכתב רק בפעם הראשונה.
+        כל snapshot_every מהלכים נלקחת גם תמונת מצב של החדר.
+        """
+        seq = self._seq.get(room_id, 0) + 1
+        self._seq[room_id] = seq
+        record = dict(move, seq=seq)
+        ops = self._pending.setdefault(room_id, [])
+        if mode is not None and room_id not in self._modes:
+            self._modes[room_id] = dict(mode)
+            ops.append(("mode", self._modes[room_id]))
+        ops.append(("move", json.dumps(record, separators=(",", ":"))))
+
+        count = self._since_snapshot.get(room_id, 0) + 1
+        if count >= self.snapshot_every:
+            self.record_snapshot(room_id, game_state)
+        else:
+            self._since_snapshot[room_id] = count
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def record_snapshot(self, room_id: str, game_state):
+        """תמונת מצב של החדר - נלקחת עכשיו, נכתבת עם שאר הפעולות"""
+        snapshot = game_state.to_snapshot()
+        snapshot["journal_seq"] = self._seq.get(room_id, 0)
+        self._pending.setdefault(room_id, []).append(("snapshot", snapshot))
+        self._since_snapshot[room_id] = 0
+
+    def discard(self, room_id: str):
+        """החדר נסגר - מוחקים את היומן שלו"""
+        self._seq.pop(room_id, None)
+        self._since_snapshot.pop(room_id, None)
+        self._modes.pop(room_id, None)
+        self._pending.setdefault(room_id, []).append(("discard", None))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # ─── כתיבה לדיסק ──────────────────────────────────────────────────
+
+    async def start(self):
+        """הפעלת משימת הרקע שכותבת את היומן"""
+        if self._flusher is None:
+            self._wakeup = asyncio.Event()
+            self._write_lock = asyncio.Lock()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """עצירת משימת הרקע וכתיבת כל מה שנשאר"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await self._wakeup.wait()
+            # ממתינים מעט כדי לאסוף כמה מהלכים ל-fsync אחד
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                # shield - ביטול בזמן כתיבה לא משאיר אצווה חצי כתובה מאחורי האצווה הבאה
+                await asyncio.shield(self.flush())
+            except OSError as e:
+                print(f"❌ שגיאה בכתיבת יומן המהלכים: {e}")
+
+    async def flush(self):
+        """כתיבת כל הפעולות הממתינות לדיסק (ב-thread נפרד)"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        if self._write_lock is None:
+            self.write_batch(batch)
+            return
+        async with self._write_lock:
+            await asyncio.to_thread(self.write_batch, batch)
+
+    def flush_sync(self):
+        """כתיבה סינכרונית - לכלים ולבדיקות שרצים בלי לולאת אירועים"""
+        batch, self._pending = self._pending, {}
+        self.write_batch(batch)
+
+    def write_batch(self, batch: Dict[str, List[Tuple[str, Any]]]):
+        """כתיבת אצווה: לכל חדר - הוספה ליומן, fsync אחד, ותמונות מצב במקומן בסדר"""
+        for room_id, ops in batch.items():
+            room_dir = self.room_dir(room_id)
+            room_dir.mkdir(parents=True, exist_ok=True)
+            journal_path = room_dir / JOURNAL_FILE
+            lines: List[str] = []
+            for kind, payload in ops:
+                if kind == "move":
+                    lines.append(payload)
+                    continue
+                self._append_lines(journal_path, lines)
+                lines = []
+                if kind == "mode":
+                    self._write_json(room_dir, ROOM_FILE, payload)
+                elif kind == "snapshot":
+                    self._write_json(room_dir, SNAPSHOT_FILE, payload)
+                    # הכל עד תמונת המצב כבר בתוכה - היומן מתחיל מחדש
+                    self._truncate(journal_path)
+                elif kind == "discard":
+                    for name in (JOURNAL_FILE, SNAPSHOT_FILE, ROOM_FILE):
+                        try:
+                            (room_dir / name).unlink()
+                        except FileNotFoundError:
+                            pass
+                    try:
+                        room_dir.rmdir()
+                    except OSError:
+                        pass
+            self._append_lines(journal_path, lines)
+
+    @staticmethod
+    def _append_lines(path: pathlib.Path, lines: List[str]):
+        if not lines:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _truncate(path: pathlib.Path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _write_json(room_dir: pathlib.Path, name: str, payload: Dict[str, Any]):
+        """כתיבה אטומית - קובץ זמני ואז החלפה, כך שתמיד יש קובץ שלם"""
+        tmp_path = room_dir / (name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, room_dir / name)
+
+    # ─── שחזור ────────────────────────────────────────────────────────
+
+    def room_mode(self, room_id: str) -> Dict[str, Any]:
+        """מצב החדר מהכותרת שלו (ריק ליומן ישן בלי כותרת - חדר רגיל)"""
+        return self._modes.get(room_id, {})
+
+    @staticmethod
+    def load_mode(room_dir: pathlib.Path) -> Dict[str, Any]:
+        mode_path = room_dir / ROOM_FILE
+        if not mode_path.exists():
+            return {}
+        with open(mode_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def load_room(self, room_dir: pathlib.Path) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """תמונת המצב האחרונה (אם יש) והרשומות שאחריה"""
+        snapshot = None
+        snapshot_path = room_dir / SNAPSHOT_FILE
+        if snapshot_path.exists():
+            with open(snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        after = snapshot["journal_seq"] if snapshot else 0
+
+        tail = []
+        journal_path = room_dir / JOURNAL_FILE
+        if journal_path.exists():
+            with open(journal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # שורה חלקית מקריסה באמצע כתיבה - זה סוף היומן
+                        break
+                    if record.get("seq", 0) > after:
+                        tail.append(record)
+        return snapshot, tail
+
+    def recover(self, state_factory: Callable[[], Any],
+                owns: Optional[Callable[[str], bool]] = None) -> Dict[str, Any]:
+        """
+        בנייה מחדש של כל החדרים שיש להם יומן.
+        owns - סינון חדרים (למשל רק החדרים של תהליך העובד הנוכחי).
+        מצב כל חדר נשמר ל-room_mode. מהלך מהזנב שלא התבצע שוב - JournalReplayError.
+        """
+        states = {}
+        if not self.root.is_dir():
+            return states
+        for room_dir in sorted(self.root.iterdir()):
+            if not room_dir.is_dir():
+                continue
+            room_id = unquote(room_dir.name)
+            if owns is not None and not owns(room_id):
+                continue
+            try:
+                mode = self.load_mode(room_dir)
+                snapshot, tail = self.load_room(room_dir)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ לא ניתן לשחזר את חדר {room_id}: {e}")
+                continue
+            if snapshot is None and not tail:
+                continue
+
+            game_state = state_factory()
+            if mode.get("step_ms"):
+                # הזמנים של חדר lockstep בצעדים - גם בהרצה מחדש של הזנב
+                game_state.enable_lockstep(mode["step_ms"])
+            if snapshot is not None:
+                game_state.restore_snapshot(snapshot)
+            failed = [record["seq"] for record in tail if not game_state.replay_move(record)]
+            if failed:
+                raise JournalReplayError(
+                    f"חדר {room_id}: {len(failed)} מהלכים מהיומן לא התבצעו שוב (seq {failed})")
+            if tail:
+                game_state.resume_clock(tail[-1]["timestamp"])
+
+            last_seq = tail[-1]["seq"] if tail else snapshot["journal_seq"]
+            self._seq[room_id] = last_seq
+            self._since_snapshot[room_id] = len(tail)
+            if mode:
+                self._modes[room_id] = mode
+            states[room_id] = game_state
+        return states
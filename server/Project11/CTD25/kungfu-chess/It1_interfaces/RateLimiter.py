@@ -0,0 +1,137 @@
+"""
+הגנה על השרת מלקוחות שמציפים אותו בהודעות.
+
+- דלי אסימונים (token bucket) לכל חיבור ולכל סוג פעולה: קצב ממוצע + פרץ מותר.
+- מסגרת גדולה מ-MAX_FRAME_BYTES נזרקת עוד לפני פענוח ה-JSON.
+- כשלולאת האירועים מפגרת מעבר לסף (LoopLagMonitor) - פעולות שאפשר לוותר
+  עליהן (get_state, verify) נזרקות לכל השרת, כדי שהמהלכים עצמם ימשיכו לעבור.
+כל זריקה נספרת לפי סיבה ופעולה (DropCounters).
+"""
+import asyncio
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+# פעולה -> (אסימונים לשנייה, גודל פרץ). "*" - כל פעולה אחרת
+DEFAULT_LIMITS: Dict[str, Tuple[float, int]] = {
+    "move": (10.0, 20),
+    "premove": (5.0, 10),
+    "get_state": (1.0, 3),
+    "verify": (1.0, 3),
+    "ping": (2.0, 8),
+    "*": (5.0, 10),
+}
+
+MAX_FRAME_BYTES = 4096
+LAG_THRESHOLD_MS = 100.0
+SHEDDABLE_ACTIONS = {"get_state", "verify"}
+
+
+class TokenBucket:
+    """דלי אסימונים - מתמלא בקצב rate עד capacity, כל הודעה צורכת אסימון"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: int, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def allow(self, now: float, cost: float = 1.0) -> bool:
+        self._refill(now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+    def retry_after(self, now: float, cost: float = 1.0) -> float:
+        """כמה שניות עד שיהיה מספיק אסימונים"""
+        self._refill(now)
+        return max(0.0, (cost - self.tokens) / self.rate)
+
+
+class ConnectionLimiter:
+    """דלי נפרד לכל סוג פעולה של חיבור אחד"""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, int]]] = None):
+        self.limits = limits or DEFAULT_LIMITS
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, action: str, now: float) -> TokenBucket:
+        key = action if action in self.limits else "*"
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            rate, burst = self.limits[key]
+            bucket = self.buckets[key] = TokenBucket(rate, burst, now)
+        return bucket
+
+    def allow(self, action: str, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return self._bucket(action, now).allow(now)
+
+    def retry_after_ms(self, action: str, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        return int(self._bucket(action, now).retry_after(now) * 1000) + 1
+
+
+class LoopLagMonitor:
+    """
+    מדידת הפיגור של לולאת האירועים: ישנים interval ובודקים באיחור של כמה התעוררנו.
+    פיגור גבוה = הלולאה עמוסה, וזה הזמן לוותר על עבודה לא חיונית.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold_ms: float = LAG_THRESHOLD_MS):
+        self.interval = interval
+        self.threshold_ms = threshold_ms
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def overloaded(self) -> bool:
+        return self.lag_ms > self.threshold_ms
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - started - self.interval) * 1000)
+            # ממוצע נע - קפיצה בודדת לא מפעילה זריקה, עומס מתמשך כן
+            self.lag_ms = 0.5 * self.lag_ms + 0.5 * lag_ms
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+
+
+class DropCounters:
+    """ספירת ההודעות שנזרקו - לפי סיבה ולפי פעולה"""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    def record(self, reason: str, action: Optional[str] = None):
+        self.counts[f"{reason}:{action}" if action else reason] += 1
+
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def report(self) -> Dict[str, int]:
+        return dict(self.counts)
@@ -0,0 +1,146 @@
+"""
+תיבת דואר ומשימה אחת לכל חדר (actor).
+
+קוראי החיבורים רק מפענחים את ההודעה, בודקים קצב ומכניסים בקשה לתיבה של החדר.
+המשימה של החדר היא הצרכן היחיד: היא מבצעת את הבקשות אחת-אחת לפי סדר ההגעה
+(מהלכים, premoves, בקשות מצב, והתעוררויות של ציר הזמן), ומעבירה את התוצאות
+לתורים היוצאים (ClientWriter) בלי לחכות לשליחה. כך לקוח שהשידור אליו איטי
+לא מעכב את קריאת הקלט הבא - לא שלו ולא של אף אחד אחר בחדר.
+
+תיבה שמגיעה ל-max_depth (החדר לא עומד בקצב) זורקת בקשות חדשות של לקוחות, והקורא
+עונה ללקוח כמו בעומס. אירועים פנימיים של החדר (התעוררות של ציר הזמן, טיק, תפוגת
+מושב) נכנסים גם לתיבה מלאה - אין מי שישלח אותם שוב, ויש לכל היותר אחד מכל סוג. העומק, זמן ההמתנה בתיבה וזמן הביצוע נמדדים (metrics).
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+DEFAULT_MAX_DEPTH = 1024
+
+Job = Callable[[], Awaitable[Any]]
+
+
+class RoomActor:
+    """התיבה של חדר אחד ומשימה שמבצעת את מה שבה לפי הסדר"""
+
+    def __init__(self, room_id: str, max_depth: int = DEFAULT_MAX_DEPTH):
+        self.room_id = room_id
+        self.max_depth = max_depth
+
+        # (סוג הבקשה, הפעולה, זמן הכניסה לתיבה)
+        self.inbox: Deque[Tuple[str, Job, float]] = deque()
+        self.closed = False
+        self.max_depth_seen = 0
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.total_run_ms = 0.0
+        self.max_run_ms = 0.0
+
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: Optional[asyncio.Task] = None
+        self._waiting: Set[asyncio.Future] = set()  # מי שמחכה לתוצאה של call
+
+    def submit(self, kind: str, job: Job, internal: bool = False) -> bool:
+        """
+        הכנסת בקשה לתיבה - לא מחכה לביצוע. False אם התיבה מלאה או שהחדר נסגר.
+        internal - אירוע של החדר עצמו, שלא נזרק בגלל עומק התיבה.
+        """
+        if self.closed or (len(self.inbox) >= self.max_depth and not internal):
+            self.dropped += 1
+            return False
+        self.inbox.append((kind, job, time.perf_counter()))
+        self.max_depth_seen = max(self.max_depth_seen, len(self.inbox))
+        self._idle.clear()
+        self._ready.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return True
+
+    async def call(self, kind: str, job: Job) -> Any:
+        """
+        פעולה פנימית שהמבקש צריך את התוצאה שלה (כניסה לחדר, חזרה, ניתוק):
+        נכנסת לתיבה ומחכה לתורה. מחזיר None אם החדר נסגר לפני שהגיע תורה.
+        בקשה מתוך המשימה של החדר עצמו רצה מיד - המתנה לתיבה מתוכה הייתה נתקעת.
+        """
+        if asyncio.current_task() is self._task and self._task is not None:
+            return await job()
+        result = asyncio.get_running_loop().create_future()
+
+        async def run():
+            try:
+                value = await job()
+            except Exception as e:
+                if not result.done():
+                    result.set_exception(e)
+                raise
+            if not result.done():
+                result.set_result(value)
+
+        if not self.submit(kind, run, internal=True):
+            return None
+        self._waiting.add(result)
+        try:
+            return await result
+        finally:
+            self._waiting.discard(result)
+
+    async def _run(self):
+        while not self.closed:
+            await self._ready.wait()
+            self._ready.clear()
+            while self.inbox and not self.closed:
+                kind, job, enqueued = self.inbox.popleft()
+                started = time.perf_counter()
+                wait_ms = (started - enqueued) * 1000
+                self.total_wait_ms += wait_ms
+                self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+                try:
+                    await job()
+                except Exception as e:
+                    # בקשה אחת שנכשלה לא עוצרת את החדר
+                    self.failed += 1
+                    print(f"❌ שגיאה בביצוע {kind} בחדר {self.room_id}: {e}")
+                run_ms = (time.perf_counter() - started) * 1000
+                self.processed += 1
+                self.total_run_ms += run_ms
+                self.max_run_ms = max(self.max_run_ms, run_ms)
+            if not self.inbox:
+                self._idle.set()
+
+    async def join(self):
+        """המתנה עד שכל מה שבתיבה בוצע"""
+        await self._idle.wait()
+
+    def close(self):
+        """
+        סגירת התיבה - בקשות שעוד מחכות נזרקות, והמשימה יוצאת אחרי הבקשה הנוכחית
+        (בלי ביטול באמצע מהלך - אפשר לקרוא לזה גם מתוך בקשה של החדר עצמו).
+        """
+        self.closed = True
+        self.dropped += len(self.inbox)
+        self.inbox.clear()
+        for result in self._waiting:
+            if not result.done():
+                result.set_result(None)
+        self._idle.set()
+        self._ready.set()
+
+    def metrics(self) -> Dict[str, Any]:
+        done = max(1, self.processed)
+        return {
+            "depth": len(self.inbox),
+            "max_depth": self.max_depth_seen,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait_ms / done, 3),
+            "max_wait_ms": round(self.max_wait_ms, 3),
+            "avg_run_ms": round(self.total_run_ms / done, 3),
+            "max_run_ms": round(self.max_run_ms, 3),
+        }
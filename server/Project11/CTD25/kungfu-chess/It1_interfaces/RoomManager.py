@@ -0,0 +1,203 @@
+"""
+חדרים - שרת אחד מארח משחקים רבים, ולקוח בוחר חדר עם ?room=<id> (ברירת מחדל default).
+
+לכל חדר מצב משחק, שחקנים, צופים ומאגר השידורים האחרונים שלו (replay) להשלמה
+אחרי חיבור מחדש. החדר שומר גם את ה-full_state האחרון יחד עם הבתים המקודדים שלו
+לכל פורמט, לפי גרסת הלוח, game_started ו-seq - בקשות get_state, חזרות והצטרפויות
+באותה גרסה לא בונות את הלוח ולא מקודדות אותו מחדש.
+"""
+import itertools
+from collections import deque
+from typing import Deque, Dict, Any, Callable, List, Optional, Tuple
+
+import WireProtocol
+
+# כמה הודעות אחרונות נשמרות בכל חדר להשלמה אחרי חיבור מחדש
+REPLAY_BUFFER_SIZE = 256
+
+
+class Room:
+    """חדר משחק בודד - מצב משחק, שחקנים ושידור משלו"""
+
+    def __init__(self, room_id: str, game_state: Any, max_players: int = 2,
+                 replay_size: int = REPLAY_BUFFER_SIZE, tick_hz: float = 0.0):
+        self.room_id = room_id
+        self.game_state = game_state
+        self.max_players = max_players
+        # websocket -> {"color": str, "player_id": str, "resume_token": str, "send_stats": {...}}
+        self.clients: Dict[Any, Dict[str, Any]] = {}
+        # מושבים של שחקנים שהתנתקו ועוד יכולים לחזור: resume token -> פרטי השחקן
+        self.held_seats: Dict[str, Dict[str, Any]] = {}
+        # צופים - לא תופסים מקום של שחקן ולא שולחים מהלכים: websocket -> {"spectator_id": str}
+        self.spectators: Dict[Any, Dict[str, Any]] = {}
+        self._spectator_numbers = itertools.count(1)
+        self._player_numbers = itertools.count(1)
+        
+        # מספור ההודעות המשודרות בחדר + ההודעות האחרונות להשלמת פערים
+        self.seq = 0
+        self.replay: Deque[Dict[str, Any]] = deque(maxlen=replay_size)
+
+        # מצב טיקים: 0 - כל שינוי לוח משודר מיד; אחרת שינויי הלוח מצטברים
+        # ויוצאים כעדכון אחד בכל טיק (tick_hz פעמים בשנייה לכל היותר)
+        self.tick_hz = tick_hz
+        self.pending_updates: List[Dict[str, Any]] = []
+
+        # המצב המלא האחרון ששודר, והקידוד שלו לכל פורמט - תקפים עד שהחדר משתנה
+        self._snapshot_key: Optional[Tuple[Any, ...]] = None
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._snapshot_payloads: Dict[str, Any] = {}
+        self.snapshots_built = 0
+        self.snapshot_hits = 0
+
+    def is_full(self) -> bool:
+        """האם כל המקומות בחדר תפוסים (כולל מושבים שמחכים לשחקן שהתנתק)"""
+        return len(self.clients) + len(self.held_seats) >= self.max_players
+
+    def is_empty(self) -> bool:
+        """האם לא נשארו לקוחות או צופים בחדר ואף אחד לא צפוי לחזור"""
+        return not self.clients and not self.held_seats and not self.spectators
+
+    def next_player_id(self) -> str:
+        return f"player_{next(self._player_numbers)}"
+
+    def next_spectator_id(self) -> str:
+        return f"spectator_{next(self._spectator_numbers)}"
+
+    def stamp(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """מספור הודעה משודרת ושמירתה במאגר ההשלמה"""
+        self.seq += 1
+        stamped = dict(message, seq=self.seq)
+        self.replay.append(stamped)
+        return stamped
+
+    def snapshot_key(self) -> Tuple[Any, ...]:
+        """
+        מונה השינויים של החדר: גרסת הלוח (עולה בכל מהלך ונחיתה), התחלת המשחק,
+        ו-seq - המצב המלא נושא אותו, והלקוח ממשיך לספור ממנו.
+        """
+        return (self.game_state.version, self.game_state.game_started, self.seq)
+
+    def full_state(self, max_lag: int = 0) -> Dict[str, Any]:
+        """
+        המצב המלא של החדר - נבנה מחדש רק כשהחדר השתנה (לקריאה בלבד!).
+        max_lag - למי שמשלים את הזנב מהיומן (הממסר לצופים): המצב השמור טוב
+        עד max_lag הודעות אחרי ראש היומן, כל עוד הזנב שאחריו עוד כולו ביומן.
+        """
+        key = self.snapshot_key()
+        if key != self._snapshot_key and not self._recent_enough(max_lag):
+            self._snapshot = dict(self.game_state.get_full_state(), seq=self.seq)
+            self._snapshot_key = key
+            self._snapshot_payloads = {}
+            self.snapshots_built += 1
+        return self._snapshot
+
+    def _recent_enough(self, max_lag: int) -> bool:
+        if self._snapshot is None or max_lag <= 0:
+            return False
+        seq = self._snapshot["seq"]
+        return self.seq - seq <= max_lag and self.messages_since(seq) is not None
+
+    def encoded_full_state(self, fmt: str, max_lag: int = 0):
+        """המצב המלא מקודד לפורמט - בקשות חוזרות באותה גרסה עולות חיפוש במילון"""
+        message = self.full_state(max_lag)
+        payload = self._snapshot_payloads.get(fmt)
+        if payload is None:
+            payload = self._snapshot_payloads[fmt] = WireProtocol.encode(message, fmt)
+        else:
+            self.snapshot_hits += 1
+        return payload
+
+    def messages_since(self, last_seq: Optional[int]) -> Optional[List[Dict[str, Any]]]:
+        """
+        ההודעות שלקוח פספס אחרי last_seq.
+        None - הפער גדול מהמאגר (או שהמספר לא מוכר), וצריך מצב מלא במקום.
+        """
+        if last_seq is None or last_seq < 0 or last_seq > self.seq:
+            return None
+        if last_seq == self.seq:
+            return []
+        oldest = self.replay[0]["seq"] if self.replay else self.seq + 1
+        if last_seq + 1 < oldest:
+            return None
+        return list(itertools.islice(self.replay, last_seq + 1 - oldest, None))
+
+    def hold_seat(self, token: str, client: Dict[str, Any]):
+        """שמירת המושב של שחקן שהתנתק"""
+        self.held_seats[token] = {"color": client["color"], "player_id": client["player_id"]}
+
+    def take_seat(self, token: str) -> Optional[Dict[str, Any]]:
+        """שחקן חוזר עם ה-token שלו - מחזיר את המושב (או None אם פג)"""
+        return self.held_seats.pop(token, None)
+
+    def record_send_latency(self, websocket, latency_ms: float):
+        """עדכון סטטיסטיקת זמן השליחה של נמען (אחרון, ממוצע נע ומקסימום)"""
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        stats = client.setdefault("send_stats", {"last_ms": 0.0, "avg_ms": 0.0, "max_ms": 0.0, "count": 0})
+        stats["last_ms"] = latency_ms
+        stats["avg_ms"] = latency_ms if stats["count"] == 0 else 0.9 * stats["avg_ms"] + 0.1 * latency_ms
+        stats["max_ms"] = max(stats["max_ms"], latency_ms)
+        stats["count"] += 1
+
+    def send_latency_report(self) -> Dict[str, Dict[str, float]]:
+        """זמני שליחה לכל נמען בחדר, לפי מזהה שחקן"""
+        return {client["player_id"]: dict(client.get("send_stats", {})) for client in self.clients.values()}
+
+    def taken_colors(self):
+        """הצבעים שכבר הוקצו בחדר (כולל מושבים שמחכים לשחקן שהתנתק)"""
+        return [client["color"] for client in self.clients.values()] + \
+            [seat["color"] for seat in self.held_seats.values()]
+
+
+class RoomManager:
+    """
+    רישום החדרים בשרת - מזהה חדר -> Room
+    יצירה, חיפוש ומחיקה ב-O(1), כך שמספר החדרים לא משפיע על משחק בודד
+    """
+
+    DEFAULT_ROOM = "default"
+
+    def __init__(self, state_factory: Callable[[], Any], max_players: int = 2, tick_hz: float = 0.0):
+        self.state_factory = state_factory
+        self.max_players = max_players
+        self.tick_hz = tick_hz  # מצב הטיקים של חדרים שלא ביקשו אחרת
+        self.rooms: Dict[str, Room] = {}
+
+    def get(self, room_id: str) -> Optional[Room]:
+        """חיפוש חדר לפי מזהה"""
+        return self.rooms.get(room_id)
+
+    def get_or_create(self, room_id: str, tick_hz: Optional[float] = None, lockstep: bool = False) -> Room:
+        """
+        מחזיר את החדר הקיים או יוצר חדר חדש עם GameState משלו.
+        tick_hz ו-lockstep קובעים את מצב החדר רק לחדר חדש - מי שיוצר את החדר בוחר.
+        """
+        room = self.rooms.get(room_id)
+        if room is None:
+            game_state = self.state_factory()
+            if lockstep:
+                game_state.enable_lockstep()
+            room = Room(room_id, game_state, self.max_players,
+                        tick_hz=self.tick_hz if tick_hz is None else tick_hz)
+            self.rooms[room_id] = room
+            print(f"🏠 נוצר חדר חדש: {room_id}")
+        return room
+
+    def restore(self, room_id: str, game_state, tick_hz: Optional[float] = None) -> Room:
+        """רישום חדר עם מצב משחק קיים (למשל אחרי שחזור מהיומן) - tick_hz מהכותרת שלו"""
+        room = Room(room_id, game_state, self.max_players,
+                    tick_hz=self.tick_hz if tick_hz is None else tick_hz)
+        self.rooms[room_id] = room
+        return room
+
+    def remove_if_empty(self, room: Room) -> bool:
+        """מחיקת חדר שאין בו לקוחות"""
+        if room.is_empty() and self.rooms.get(room.room_id) is room:
+            del self.rooms[room.room_id]
+            print(f"🗑️ חדר {room.room_id} נסגר")
+            return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self.rooms)
@@ -0,0 +1,88 @@
+"""
+חוקי הכלים של כל התהליך - נטענים פעם אחת ומשותפים לכל החדרים.
+
+pieces/*/moves.txt ו-pieces/*/states/move/config.json נקראים ומחושבים (טבלאות
+bitboard ומהירויות) בפעם הראשונה שמבקשים אותם, ומכאן כל GameState מקבל הפניה
+לאותו אובייקט - בניית חדר חדש לא קוראת אף קובץ.
+הרישום לא משתנה אחרי הטעינה (MappingProxyType וטבלאות ב-tuple), כך שמותר לשתף
+אותו בין חדרים, ותהליכי עובדים שנוצרים ב-fork אחרי הטעינה יורשים אותו בלי להעתיק.
+תיקייה חסרה, או סוג כלי בלי moves.txt תקין, עוצרים את העלייה (FileNotFoundError /
+ValueError) - שרת בלי חוקים היה מאשר כל מהלך של הכלי הזה.
+"""
+import json
+import os
+import pathlib
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+
+from BitBoard import MoveTables, PieceRules
+from BoardHash import PIECE_TYPES
+
+# תיקיית חוקי הכלים - עותק אחד לשרת וללקוח (התיקייה של הלקוח בריפו), או לפי PIECES_DIR
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[5]
+PIECES_DIR = pathlib.Path(os.getenv("PIECES_DIR", REPO_ROOT / "client" / "Project11" / "CTD25" / "kungfu-chess" / "pieces"))
+
+DEFAULT_SPEED_M_PER_SEC = 1.5
+
+
+def load_move_speeds(pieces_dir: pathlib.Path) -> Dict[str, float]:
+    """מהירות התנועה של כל סוג כלי מ-pieces/*/states/move/config.json"""
+    speeds = {}
+    if not pieces_dir.is_dir():
+        return speeds
+    for piece_dir in sorted(pieces_dir.iterdir()):
+        config_file = piece_dir / "states" / "move" / "config.json"
+        if not config_file.exists():
+            continue
+        try:
+            with open(config_file, encoding="utf-8") as f:
+                physics = json.load(f).get("physics", {})
+            speeds[piece_dir.name] = float(physics.get("speed_m_per_sec", DEFAULT_SPEED_M_PER_SEC))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ שגיאה בקריאת {config_file}: {e}")
+    return speeds
+
+
+def _freeze(rules: PieceRules) -> PieceRules:
+    """הטבלאות של הכלי הופכות ל-tuple - אף חדר לא יכול לשנות אותן בטעות"""
+    rules.slide_directions = tuple(rules.slide_directions)
+    rules.jump_table = tuple(rules.jump_table)
+    if rules.push_table is not None:
+        rules.push_table = tuple(rules.push_table)
+        rules.capture_table = tuple(rules.capture_table)
+    return rules
+
+
+class RulesRegistry:
+    """חוקי התזוזה והמהירות של כל סוגי הכלים, לפי סוג כלי (PW, NB, ...) - לקריאה בלבד"""
+
+    def __init__(self, rules: Mapping[str, PieceRules], move_speeds: Mapping[str, float]):
+        self.move_tables = MoveTables(MappingProxyType({
+            piece_type: _freeze(piece_rules) for piece_type, piece_rules in rules.items()
+        }))
+        self.move_speeds: Mapping[str, float] = MappingProxyType(dict(move_speeds))
+
+    @classmethod
+    def load(cls, pieces_dir: pathlib.Path) -> "RulesRegistry":
+        pieces_dir = pathlib.Path(pieces_dir)
+        rules = MoveTables.load(pieces_dir).rules
+        missing = [piece_type for piece_type in PIECE_TYPES if piece_type not in rules]
+        if missing:
+            raise ValueError(f"אין חוקי תזוזה ל-{', '.join(missing)} בתיקייה {pieces_dir}")
+        return cls(rules, load_move_speeds(pieces_dir))
+
+    @property
+    def piece_types(self):
+        return self.move_tables.rules.keys()
+
+
+_registries: Dict[pathlib.Path, RulesRegistry] = {}
+
+
+def shared_rules(pieces_dir: Optional[pathlib.Path] = None) -> RulesRegistry:
+    """הרישום המשותף של התהליך לתיקיית הכלים - נטען בקריאה הראשונה בלבד"""
+    key = pathlib.Path(pieces_dir or PIECES_DIR).resolve()
+    registry = _registries.get(key)
+    if registry is None:
+        registry = _registries[key] = RulesRegistry.load(key)
+    return registry
@@ -0,0 +1,220 @@
+"""
+שידור לצופים של חדר אחד.
+
+השחקנים מקבלים את ההודעות ישירות מ-broadcast_to_all; הצופים לא נמצאים בנתיב הזה.
+השידור רק "מעיר" את הממסר, והממסר רץ במשימה משלו: לכל צופה יש סמן (seq אחרון
+שקיבל), והממסר מעתיק לתור שלו את מה שנוסף מאז ביומן השידור של החדר (room.replay).
+כל הודעה מקודדת פעם אחת לכל פורמט, והממסר מוותר על הלולאה כל כמה צופים -
+כך שאלפי צופים לא מעכבים את השחקנים.
+
+צופה שמצטרף באמצע מקבל את תמונת המצב השמורה והמקודדת של החדר
+(Room.encoded_full_state - אותו מטמון של השחקנים), גם אם היא מפגרת עד
+SNAPSHOT_REFRESH הודעות, ואת זנב היומן שאחריה. צופה שפיגר מעבר לתחילת
+היומן מקבל תמונת מצב חדשה.
+
+צופה יכול להגביל את קצב העדכונים שלו (max_rate - עדכונים לשנייה). צופה כזה
+מקבל עדכון רק פעם במרווח, וכל שינויי הלוח שהצטברו בינתיים מתמזגים
+להודעת board_delta אחת. צופה בלי הגבלה שהתור שלו מתחיל להתמלא (קו חלש)
+עובר אוטומטית לקצב WEAK_LINK_RATE. המרווחים מיושרים לשעון משותף, כך שצופים
+באותו קצב מקבלים את אותה הודעה ממוזגת והיא מקודדת פעם אחת.
+"""
+import asyncio
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import WireProtocol
+
+SPECTATORS_PER_SLICE = 200  # כמה צופים לטפל לפני שמשחררים את הלולאה
+SNAPSHOT_REFRESH = 32       # כמה הודעות אפשר להשלים מהיומן לפני שבונים תמונת מצב חדשה
+WEAK_LINK_BACKLOG = 16      # כמה הודעות ממתינות בתור של צופה לפני שמורידים לו את הקצב
+WEAK_LINK_RATE = 2.0        # עדכונים לשנייה לצופה על קו חלש
+
+# השדות של כל מהלך שנשמרים בתוך board_delta
+EXECUTED_FIELDS = ("version", "from", "to", "piece", "captured", "promoted", "timestamp")
+
+
+def coalesce(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    מיזוג רצף של הודעות שמשנות את הלוח (יש להן changes) להודעת board_delta אחת.
+    הודעות אחרות (סוף משחק, שחקן התנתק...) נשארות כמו שהן ובמקומן בסדר.
+    הודעה בודדת שאין עם מה למזג אותה נשלחת כמו שהיא.
+    המהלכים עצמם נשמרים ב-executed, כדי שהלקוח יוכל להנפיש אותם.
+    """
+    merged: List[Dict[str, Any]] = []
+    run: List[Dict[str, Any]] = []
+
+    def close_run():
+        if len(run) == 1:
+            merged.append(run[0])
+        elif run:
+            changes: Dict[str, Any] = {}
+            captured = []
+            executed = []
+            moves = 0
+            for message in run:
+                changes.update(message["changes"])
+                if message.get("type") == "board_delta":
+                    # דלתא שכבר מוזגה (למשל בטיק של החדר) ממוזגת שוב כמו שהיא
+                    captured.extend(message.get("captured") or [])
+                    executed.extend(message.get("executed") or [])
+                    moves += message.get("moves", 0)
+                    continue
+                if message.get("captured"):
+                    captured.append(message["captured"])
+                if message.get("type") == "move_executed":
+                    moves += 1
+                    executed.append({key: message.get(key) for key in EXECUTED_FIELDS})
+            merged.append({
+                "type": "board_delta",
+                "base_version": run[0].get("base_version", run[0]["version"] - 1),
+                "version": run[-1]["version"],
+                "hash": run[-1].get("hash"),
+                "changes": changes,
+                "captured": captured,
+                "moves": moves,
+                "executed": executed,
+                "timestamp": run[-1].get("timestamp"),
+                "seq": run[-1].get("seq"),
+            })
+        run.clear()
+
+    for message in messages:
+        if "changes" in message and "version" in message:
+            run.append(message)
+        else:
+            close_run()
+            merged.append(message)
+    close_run()
+    return merged
+
+
+class SpectatorRelay:
+    """ממסר לצופים של חדר - סמן לכל צופה מעל יומן השידור"""
+
+    def __init__(self, room, writer_for: Callable[[Any], Any]):
+        self.room = room
+        self.writer_for = writer_for
+        self.cursors: Dict[Any, int] = {}  # websocket -> seq אחרון שנכנס לתור שלו
+        self.rates: Dict[Any, float] = {}    # websocket -> עדכונים לשנייה (רק לצופים מוגבלים)
+        self.due: Dict[Any, float] = {}      # websocket -> מתי מותר העדכון הבא (time.monotonic)
+        self.coalesced = 0  # הודעות שנחסכו בזכות מיזוג
+        self.downshifted = 0  # צופים שהועברו לקצב של קו חלש (מונה - לא הדפסה לכל צופה)
+
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at: Optional[float] = None
+
+    def add(self, websocket, max_rate: Optional[float] = None):
+        """צופה חדש - תמונת מצב ואחריה כל מה שיתווסף ליומן (עד max_rate עדכונים לשנייה)"""
+        if max_rate is not None and math.isfinite(max_rate) and max_rate > 0:
+            self.rates[websocket] = max_rate
+        self.cursors[websocket] = self._send_snapshot(websocket)
+        self.notify()
+
+    def resync(self, websocket):
+        """הצופה ביקש מצב מלא - תמונת מצב (שמורה אם אפשר) וממשיכים ממנה"""
+        if websocket in self.cursors:
+            self.cursors[websocket] = self._send_snapshot(websocket)
+            self.notify()
+
+    def remove(self, websocket):
+        self.cursors.pop(websocket, None)
+        self.rates.pop(websocket, None)
+        self.due.pop(websocket, None)
+
+    def notify(self):
+        """נוספו הודעות ליומן - מעירים את משימת הממסר"""
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def close(self):
+        """עצירת הממסר (החדר נסגר)"""
+        self.cursors.clear()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def _run(self):
+        while self.cursors:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self.pump()
+
+    async def pump(self):
+        """העברת כל מה שנוסף ליומן לתורים של הצופים, עד ראש היומן הנוכחי"""
+        head = self.room.seq
+        now = time.monotonic()
+        encoded: Dict[Tuple[int, str], Any] = {}
+        # (seq התחלה, seq סוף, פורמט) -> ההודעות הממוזגות המקודדות
+        batches: Dict[Tuple[int, int, str], List[Tuple[Any, Optional[str]]]] = {}
+        wake_at: Optional[float] = None
+        for index, websocket in enumerate(list(self.cursors)):
+            if index % SPECTATORS_PER_SLICE == SPECTATORS_PER_SLICE - 1:
+                await asyncio.sleep(0)
+            cursor = self.cursors.get(websocket)
+            if cursor is None or cursor >= head:
+                continue
+            writer = self.writer_for(websocket)
+            rate = self.rates.get(websocket)
+            if rate is None and len(writer.queue) >= WEAK_LINK_BACKLOG:
+                rate = self.rates[websocket] = WEAK_LINK_RATE
+                self.downshifted += 1
+            if rate is not None:
+                due = self.due.get(websocket, 0.0)
+                if now < due:
+                    wake_at = due if wake_at is None else min(wake_at, due)
+                    continue
+                # המרווח הבא מיושר לשעון משותף לכל הצופים באותו קצב
+                self.due[websocket] = (math.floor(now * rate) + 1) / rate
+
+            missed = self.room.messages_since(cursor)
+            if missed is None:
+                # הצופה פיגר מעבר לתחילת היומן - מתחילים מתמונת מצב
+                self.cursors[websocket] = self._send_snapshot(websocket)
+                continue
+            missed = [message for message in missed if message["seq"] <= head]
+            fmt = WireProtocol.format_of(websocket)
+            if rate is not None:
+                key = (cursor, head, fmt)
+                if key not in batches:
+                    merged = coalesce(missed)
+                    self.coalesced += len(missed) - len(merged)
+                    batches[key] = [(WireProtocol.encode(message, fmt), message.get("type")) for message in merged]
+                for payload, kind in batches[key]:
+                    writer.enqueue(payload, kind)
+            else:
+                for message in missed:
+                    key = (message["seq"], fmt)
+                    if key not in encoded:
+                        encoded[key] = WireProtocol.encode(message, fmt)
+                    writer.enqueue(encoded[key], message.get("type"))
+            self.cursors[websocket] = head
+
+        if wake_at is not None:
+            self._wake_at(wake_at)
+
+    def _wake_at(self, when: float):
+        """התעוררות כשמגיע הזמן של הצופה המוגבל הבא"""
+        if self._timer is not None and self._timer_at is not None and self._timer_at <= when:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_at = when
+        self._timer = asyncio.get_running_loop().call_later(max(0.0, when - time.monotonic()), self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._timer_at = None
+        self.notify()
+
+    def _send_snapshot(self, websocket) -> int:
+        """שליחת תמונת המצב העדכנית מספיק מהמטמון של החדר - מחזיר את ה-seq שלה"""
+        seq = self.room.full_state(SNAPSHOT_REFRESH)["seq"]
+        payload = self.room.encoded_full_state(WireProtocol.format_of(websocket), SNAPSHOT_REFRESH)
+        self.writer_for(websocket).enqueue(payload, "full_state")
+        return seq
@@ -0,0 +1,77 @@
+import heapq
+import itertools
+from typing import Any, List, Optional
+
+
+class TimelineEvent:
+    """אירוע מתוזמן בציר הזמן של חדר"""
+
+    __slots__ = ("due_ms", "order", "kind", "payload", "cancelled")
+
+    def __init__(self, due_ms: int, order: int, kind: str, payload: Any):
+        self.due_ms = due_ms
+        self.order = order
+        self.kind = kind
+        self.payload = payload
+        self.cancelled = False
+
+    def __lt__(self, other: "TimelineEvent") -> bool:
+        return (self.due_ms, self.order) < (other.due_ms, other.order)
+
+
+class Timeline:
+    """
+    תור עדיפויות (heap) של אירועי משחק - הגעות של כלים וסיום מנוחות.
+    במקום לבדוק כל פריים, מעירים את החדר רק בזמן של האירוע הקרוב.
+    אירועים באותו זמן יוצאים לפי סדר התזמון, כך שהתוצאה דטרמיניסטית.
+    """
+
+    def __init__(self):
+        self._heap: List[TimelineEvent] = []
+        self._order = itertools.count()
+        self._live = 0
+
+    def schedule(self, due_ms: int, kind: str, payload: Any = None) -> TimelineEvent:
+        """תזמון אירוע חדש"""
+        event = TimelineEvent(due_ms, next(self._order), kind, payload)
+        heapq.heappush(self._heap, event)
+        self._live += 1
+        return event
+
+    def cancel(self, event: TimelineEvent):
+        """ביטול אירוע (מחיקה עצלה - הוא יידלג כשיגיע לראש התור)"""
+        if not event.cancelled:
+            event.cancelled = True
+            self._live -= 1
+
+    def next_due(self) -> Optional[int]:
+        """זמן האירוע הקרוב, או None אם אין"""
+        self._drop_cancelled()
+        return self._heap[0].due_ms if self._heap else None
+
+    def pop_due(self, now_ms: int) -> List[TimelineEvent]:
+        """הוצאת כל האירועים שזמנם הגיע, לפי הסדר"""
+        due = []
+        self._drop_cancelled()
+        while self._heap and self._heap[0].due_ms <= now_ms:
+            event = heapq.heappop(self._heap)
+            if not event.cancelled:
+                self._live -= 1
+                due.append(event)
+            self._drop_cancelled()
+        return due
+
+    def pop_next(self, now_ms: int) -> Optional[TimelineEvent]:
+        """הוצאת האירוע הבא בלבד אם זמנו הגיע"""
+        self._drop_cancelled()
+        if self._heap and self._heap[0].due_ms <= now_ms:
+            self._live -= 1
+            return heapq.heappop(self._heap)
+        return None
+
+    def _drop_cancelled(self):
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+
+    def __len__(self) -> int:
+        return self._live
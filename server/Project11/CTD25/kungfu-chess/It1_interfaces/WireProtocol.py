@@ -0,0 +1,414 @@
+"""
+פרוטוקול התקשורת בין הלקוח לשרת - JSON (ברירת מחדל) או בינארי דחוס.
+
+הפורמט נבחר בלחיצת היד של ה-WebSocket דרך subprotocol:
+לקוח שמציע "kfc.bin" מקבל ושולח מסגרות בינאריות, כל השאר ממשיכים ב-JSON.
+
+מבנה מסגרת בינארית: [בית סוג][שדות קבועים][varint אורך][JSON של שדות נוספים]
+- משבצת = בית אחד (a1=0 ... h8=63, 255 = אין)
+- כלי = קוד קטן (0 = אין), מזהה כלי "NW_1" = קוד + varint של המספר
+- גרסאות וזמנים = varint
+שדות שאין להם קידוד קבוע עוברים בחלק ה-JSON בסוף, כך שאף שדה לא הולך לאיבוד.
+הודעה מסוג לא מוכר, או בצורה שאין לה קידוד דחוס (כלי שאינו מהטבלה, מזהה כלי
+בלי מספר), נשלחת כמסגרת כללית (סוג 0 + JSON), וכל נפילה כזו נספרת ב-fallbacks.
+כל שגיאה אחרת בקידוד היא באג ועולה לקורא - לא מוסתרת מאחורי מסגרת כללית.
+
+בחדר lockstep עוברים רק קלטים (input) וסימוני נחיתה (arrive) - המסגרות שלהם
+הן כמה בתים בודדים: זמן בצעדים של SIM_STEP_MS ו-seq כ-varint (0 = אין seq).
+
+כמה הודעות לאותו חיבור יכולות לצאת במסגרת אחת (pack_batch): ב-JSON זו מעטפת
+{"type": "batch", "messages": [...]}, ובבינארי [סוג batch][varint מספר][varint אורך + מסגרת]...
+הפענוח מחזיר את אותה מעטפת בשני הפורמטים.
+"""
+import json
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from Lockstep import SIM_STEP_MS
+
+SUBPROTOCOL_JSON = "kfc.json"
+SUBPROTOCOL_BINARY = "kfc.bin"
+SUBPROTOCOLS = [SUBPROTOCOL_BINARY, SUBPROTOCOL_JSON]
+
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+
+NO_SQUARE = 0xFF
+
+PIECE_TYPES = ["PW", "NW", "BW", "RW", "QW", "KW", "PB", "NB", "BB", "RB", "QB", "KB"]
+PIECE_CODES = {piece_type: code for code, piece_type in enumerate(PIECE_TYPES, start=1)}
+
+# סוגי מסגרות
+FRAME_GENERIC = 0x00
+FRAME_MOVE = 0x01
+FRAME_GET_STATE = 0x02
+FRAME_MOVE_EXECUTED = 0x10
+FRAME_FULL_STATE = 0x11
+FRAME_MOVE_ERROR = 0x12
+FRAME_BOARD_DELTA = 0x13
+FRAME_BATCH = 0x14
+FRAME_INPUT = 0x15
+FRAME_ARRIVE = 0x16
+
+FLAG_PROMOTED = 0x01
+FLAG_GAME_STARTED = 0x01
+
+
+def select_subprotocol(connection, subprotocols):
+    """בחירת subprotocol בצד השרת - בינארי אם הלקוח הציע, אחרת בלי subprotocol (JSON)"""
+    if SUBPROTOCOL_BINARY in subprotocols:
+        return SUBPROTOCOL_BINARY
+    if SUBPROTOCOL_JSON in subprotocols:
+        return SUBPROTOCOL_JSON
+    return None
+
+
+class NotCompact(ValueError):
+    """הודעה בצורה שאין לה קידוד דחוס - נשלחת כמסגרת כללית"""
+
+
+# סוג הודעה (או פעולה) -> כמה פעמים נשלחה כמסגרת כללית במקום דחוסה
+fallbacks: Counter = Counter()
+
+
+def format_of(websocket) -> str:
+    """הפורמט שסוכם עם החיבור"""
+    if getattr(websocket, "subprotocol", None) == SUBPROTOCOL_BINARY:
+        return FORMAT_BINARY
+    return FORMAT_JSON
+
+
+# ─── קידוד בסיסי ───────────────────────────────────────────────────────
+
+def write_varint(out: bytearray, value: int):
+    """כתיבת מספר שלם אי-שלילי בקידוד LEB128"""
+    if value < 0:
+        raise ValueError(f"varint שלילי: {value}")
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """קריאת varint - מחזיר (ערך, מיקום הבא)"""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+
+def square_name(index: int) -> Optional[str]:
+    """28 -> 'e4'"""
+    if index == NO_SQUARE:
+        return None
+    return f"{chr(ord('a') + index % 8)}{index // 8 + 1}"
+
+
+# טבלת חיפוש - קידוד לוח מלא עושה 32 חיפושים כאלה
+SQUARE_CODES = {square_name(index): index for index in range(64)}
+
+
+def square_index(pos: Optional[str]) -> int:
+    """'e4' -> 28"""
+    if pos is None:
+        return NO_SQUARE
+    index = SQUARE_CODES.get(pos)
+    if index is None:
+        raise ValueError(f"משבצת לא תקינה: {pos}")
+    return index
+
+
+def piece_code(piece_type: Optional[str]) -> int:
+    if not piece_type:
+        return 0
+    code = PIECE_CODES.get(piece_type)
+    if code is None:
+        raise NotCompact(f"כלי לא מוכר: {piece_type}")
+    return code
+
+
+def piece_type_of(code: int) -> Optional[str]:
+    return PIECE_TYPES[code - 1] if code else None
+
+
+def write_piece_ref(out: bytearray, piece_id: str):
+    """מזהה כלי 'NW_3' -> קוד סוג + varint של המספר (0 = בלי מספר)"""
+    piece_type, _, number = (piece_id or "").partition("_")
+    if number and not number.isdigit():
+        raise NotCompact(f"מזהה כלי לא נתמך: {piece_id}")
+    out.append(piece_code(piece_type))
+    write_varint(out, int(number) if number else 0)
+
+
+def read_piece_ref(data: bytes, offset: int) -> Tuple[str, int]:
+    piece_type = piece_type_of(data[offset]) or ""
+    number, offset = read_varint(data, offset + 1)
+    return (f"{piece_type}_{number}" if number else piece_type), offset
+
+
+def write_string(out: bytearray, text: str):
+    raw = text.encode("utf-8")
+    write_varint(out, len(raw))
+    out += raw
+
+
+def read_string(data: bytes, offset: int) -> Tuple[str, int]:
+    length, offset = read_varint(data, offset)
+    return data[offset:offset + length].decode("utf-8"), offset + length
+
+
+def write_squares(out: bytearray, squares: Dict[str, Optional[str]]):
+    """מפה של משבצת -> סוג כלי (או None)"""
+    write_varint(out, len(squares))
+    try:
+        out += bytes([code for pos, piece_type in squares.items()
+                      for code in (SQUARE_CODES[pos], PIECE_CODES[piece_type] if piece_type else 0)])
+    except KeyError:
+        # הדרך האיטית רק כדי להעלות את השגיאה הנכונה (משבצת לא תקינה / כלי לא מוכר)
+        for pos, piece_type in squares.items():
+            square_index(pos)
+            piece_code(piece_type)
+        raise
+
+
+def read_squares(data: bytes, offset: int) -> Tuple[Dict[str, Optional[str]], int]:
+    count, offset = read_varint(data, offset)
+    squares = {}
+    for _ in range(count):
+        squares[square_name(data[offset])] = piece_type_of(data[offset + 1])
+        offset += 2
+    return squares, offset
+
+
+def write_seq(out: bytearray, message: Dict[str, Any]):
+    """seq של החדר כ-varint של seq+1 (0 = הודעה בלי seq)"""
+    seq = message.get("seq")
+    write_varint(out, 0 if seq is None else seq + 1)
+
+
+def read_seq(data: bytes, offset: int, message: Dict[str, Any]) -> int:
+    value, offset = read_varint(data, offset)
+    if value:
+        message["seq"] = value - 1
+    return offset
+
+
+def write_extra(out: bytearray, message: Dict[str, Any], known):
+    """שדות שאין להם קידוד קבוע - JSON קטן בסוף המסגרת"""
+    extra = {key: value for key, value in message.items() if key not in known}
+    if not extra:
+        write_varint(out, 0)
+        return
+    raw = json.dumps(extra, separators=(",", ":")).encode("utf-8")
+    write_varint(out, len(raw))
+    out += raw
+
+
+def read_extra(data: bytes, offset: int, message: Dict[str, Any]) -> Dict[str, Any]:
+    length, offset = read_varint(data, offset)
+    if length:
+        message.update(json.loads(data[offset:offset + length].decode("utf-8")))
+    return message
+
+
+# ─── קידוד הודעות ──────────────────────────────────────────────────────
+
+def _encode_move(message, out):
+    out.append(FRAME_MOVE)
+    out.append(square_index(message["from"]))
+    out.append(square_index(message["to"]))
+    write_piece_ref(out, message.get("piece", ""))
+    write_extra(out, message, ("action", "from", "to", "piece"))
+
+
+def _encode_get_state(message, out):
+    out.append(FRAME_GET_STATE)
+    write_extra(out, message, ("action",))
+
+
+def _encode_move_executed(message, out):
+    out.append(FRAME_MOVE_EXECUTED)
+    write_varint(out, message.get("version", 0))
+    out.append(square_index(message["from"]))
+    out.append(square_index(message["to"]))
+    out.append(piece_code(message.get("piece")))
+    out.append(piece_code(message.get("captured")))
+    out.append(FLAG_PROMOTED if message.get("promoted") else 0)
+    write_varint(out, message.get("timestamp", 0))
+    write_squares(out, message.get("changes", {}))
+    write_extra(out, message, ("type", "version", "from", "to", "piece", "captured", "promoted", "timestamp", "changes"))
+
+
+def _encode_full_state(message, out):
+    out.append(FRAME_FULL_STATE)
+    write_varint(out, message.get("version", 0))
+    out.append(FLAG_GAME_STARTED if message.get("game_started") else 0)
+    write_squares(out, message.get("board", {}))
+    write_extra(out, message, ("type", "version", "game_started", "board"))
+
+
+def _encode_move_error(message, out):
+    out.append(FRAME_MOVE_ERROR)
+    write_string(out, message.get("message", ""))
+    write_extra(out, message, ("type", "message"))
+
+
+def _encode_board_delta(message, out):
+    out.append(FRAME_BOARD_DELTA)
+    write_varint(out, message.get("base_version", 0))
+    write_varint(out, message.get("version", 0))
+    write_squares(out, message.get("changes", {}))
+    write_extra(out, message, ("type", "base_version", "version", "changes"))
+
+
+def _encode_input(message, out):
+    time_ms = message["t"]
+    if time_ms % SIM_STEP_MS:
+        raise ValueError(f"זמן קלט מחוץ לצעד: {time_ms}")
+    out.append(FRAME_INPUT)
+    out.append(square_index(message["from"]))
+    out.append(square_index(message["to"]))
+    write_varint(out, time_ms // SIM_STEP_MS)
+    write_seq(out, message)
+    write_extra(out, message, ("type", "from", "to", "t", "seq"))
+
+
+def _encode_arrive(message, out):
+    out.append(FRAME_ARRIVE)
+    write_seq(out, message)
+    write_extra(out, message, ("type", "seq"))
+
+
+ACTION_ENCODERS = {"move": _encode_move, "get_state": _encode_get_state}
+TYPE_ENCODERS = {
+    "move_executed": _encode_move_executed,
+    "full_state": _encode_full_state,
+    "move_error": _encode_move_error,
+    "board_delta": _encode_board_delta,
+    "input": _encode_input,
+    "arrive": _encode_arrive,
+}
+
+
+def encode_binary(message: Dict[str, Any]) -> bytes:
+    """
+    קידוד הודעה למסגרת בינארית (דחוסה אם אפשר, אחרת כללית).
+    רק NotCompact נופל למסגרת כללית (ונספר) - כל חריגה אחרת היא באג בקידוד.
+    """
+    encoder = TYPE_ENCODERS.get(message.get("type")) or ACTION_ENCODERS.get(message.get("action"))
+    if encoder is not None:
+        out = bytearray()
+        try:
+            encoder(message, out)
+            return bytes(out)
+        except NotCompact:
+            fallbacks[message.get("type") or message.get("action")] += 1
+    return bytes([FRAME_GENERIC]) + json.dumps(message, separators=(",", ":")).encode("utf-8")
+
+
+def decode_binary(data: bytes) -> Dict[str, Any]:
+    """פענוח מסגרת בינארית לאותו מילון שהיה מגיע ב-JSON"""
+    if not data:
+        raise ValueError("מסגרת ריקה")
+    frame_type = data[0]
+    if frame_type == FRAME_GENERIC:
+        return json.loads(data[1:].decode("utf-8"))
+
+    if frame_type == FRAME_MOVE:
+        piece, offset = read_piece_ref(data, 3)
+        message = {"action": "move", "from": square_name(data[1]), "to": square_name(data[2]), "piece": piece}
+        return read_extra(data, offset, message)
+
+    if frame_type == FRAME_GET_STATE:
+        return read_extra(data, 1, {"action": "get_state"})
+
+    if frame_type == FRAME_MOVE_EXECUTED:
+        version, offset = read_varint(data, 1)
+        message = {
+            "type": "move_executed",
+            "version": version,
+            "from": square_name(data[offset]),
+            "to": square_name(data[offset + 1]),
+            "piece": piece_type_of(data[offset + 2]),
+            "captured": piece_type_of(data[offset + 3]),
+            "promoted": bool(data[offset + 4] & FLAG_PROMOTED),
+        }
+        message["timestamp"], offset = read_varint(data, offset + 5)
+        message["changes"], offset = read_squares(data, offset)
+        return read_extra(data, offset, message)
+
+    if frame_type == FRAME_FULL_STATE:
+        version, offset = read_varint(data, 1)
+        game_started = bool(data[offset] & FLAG_GAME_STARTED)
+        board, offset = read_squares(data, offset + 1)
+        message = {"type": "full_state", "version": version, "board": board, "game_started": game_started}
+        return read_extra(data, offset, message)
+
+    if frame_type == FRAME_MOVE_ERROR:
+        text, offset = read_string(data, 1)
+        return read_extra(data, offset, {"type": "move_error", "message": text})
+
+    if frame_type == FRAME_BATCH:
+        count, offset = read_varint(data, 1)
+        messages = []
+        for _ in range(count):
+            length, offset = read_varint(data, offset)
+            messages.append(decode_binary(data[offset:offset + length]))
+            offset += length
+        return {"type": "batch", "messages": messages}
+
+    if frame_type == FRAME_BOARD_DELTA:
+        base_version, offset = read_varint(data, 1)
+        version, offset = read_varint(data, offset)
+        changes, offset = read_squares(data, offset)
+        message = {"type": "board_delta", "base_version": base_version, "version": version, "changes": changes}
+        return read_extra(data, offset, message)
+
+    if frame_type == FRAME_INPUT:
+        message = {"type": "input", "from": square_name(data[1]), "to": square_name(data[2])}
+        steps, offset = read_varint(data, 3)
+        message["t"] = steps * SIM_STEP_MS
+        offset = read_seq(data, offset, message)
+        return read_extra(data, offset, message)
+
+    if frame_type == FRAME_ARRIVE:
+        message = {"type": "arrive"}
+        offset = read_seq(data, 1, message)
+        return read_extra(data, offset, message)
+
+    raise ValueError(f"סוג מסגרת לא מוכר: {frame_type}")
+
+
+def encode(message: Dict[str, Any], fmt: str) -> Union[str, bytes]:
+    """קידוד לפי הפורמט של החיבור"""
+    if fmt == FORMAT_BINARY:
+        return encode_binary(message)
+    return json.dumps(message)
+
+
+def pack_batch(payloads: List[Union[str, bytes]], fmt: str) -> Union[str, bytes]:
+    """
+    איחוד הודעות שכבר קודדו למסגרת אחת - בלי לפענח ולקודד אותן מחדש.
+    הסדר נשמר, והלקוח מיישם את כולן יחד.
+    """
+    if fmt == FORMAT_BINARY:
+        out = bytearray([FRAME_BATCH])
+        write_varint(out, len(payloads))
+        for payload in payloads:
+            write_varint(out, len(payload))
+            out += payload
+        return bytes(out)
+    return '{"type": "batch", "messages": [' + ", ".join(payloads) + ']}'
+
+
+def decode(frame: Union[str, bytes]) -> Dict[str, Any]:
+    """פענוח מסגרת שהתקבלה - בינארית או טקסט JSON"""
+    if isinstance(frame, (bytes, bytearray)):
+        return decode_binary(bytes(frame))
+    return json.loads(frame)
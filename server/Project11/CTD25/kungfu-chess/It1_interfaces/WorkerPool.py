@@ -0,0 +1,124 @@
+"""
+הרצה בכמה תהליכים (WORKERS=N).
+
+כל חדר שייך לעובד אחד (crc32 של שם החדר), שמאזין על PORT+1 ... PORT+N. המקבל
+הקדמי על PORT לא מחזיק משחקים - הוא רק מפנה כל חיבור חדש לעובד של החדר, כך
+שהמצב של חדר לא עובר בין תהליכים. PUBLIC_HOST קובע את שם המארח בהפניה, כשהעובדים
+נגישים מבחוץ בשם אחר. חוקי הכלים נטענים לפני ה-fork, וכל העובדים חולקים אותם.
+"""
+import asyncio
+import gc
+import multiprocessing
+import pathlib
+import zlib
+from http import HTTPStatus
+from typing import List, Optional
+from urllib.parse import urlparse, parse_qs
+
+import websockets
+
+from RoomManager import RoomManager
+from RulesRegistry import shared_rules
+import WireProtocol
+
+
+def room_worker(room_id: str, workers: int) -> int:
+    """
+    מיפוי יציב של חדר לתהליך עובד.
+    משתמשים ב-crc32 ולא ב-hash() כי hash של מחרוזות משתנה בין תהליכים.
+    """
+    return zlib.crc32(room_id.encode("utf-8")) % workers
+
+
+def _run_worker(index: int, host: str, port: int, workers: int = 1, journal_dir: Optional[str] = None):
+    """נקודת הכניסה של תהליך עובד - GameServer רגיל על פורט פנימי"""
+    from GameServer import GameServer
+    from MoveJournal import MoveJournal
+
+    async def serve():
+        journal = MoveJournal(pathlib.Path(journal_dir)) if journal_dir else None
+        game_server = GameServer(journal)
+        # כל עובד משחזר רק את החדרים שממופים אליו
+        await game_server.start(owns=lambda room_id: room_worker(room_id, workers) == index)
+        try:
+            async with websockets.serve(game_server.handle_client, host, port,
+                                        select_subprotocol=WireProtocol.select_subprotocol):
+                try:
+                    print(f"👷 עובד {index} מחכה לחיבורים על פורט {port}")
+                    await asyncio.Future()
+                finally:
+                    game_server.shutting_down = True
+        finally:
+            await game_server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+class WorkerPool:
+    """
+    מאגר תהליכים עם זיקה לחדר:
+    כל חדר שייך לעובד אחד בלבד, כך שה-GameState שלו לא עובר בין תהליכים.
+    המקבל הקדמי לא מחזיק משחקים - הוא רק מפנה כל חיבור חדש (הפניית 307)
+    לפורט של העובד שאחראי על החדר שלו.
+    """
+
+    def __init__(self, workers: int, host: str = "0.0.0.0", port: int = 8765,
+                 public_host: Optional[str] = None, journal_dir: Optional[str] = None):
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.public_host = public_host
+        self.journal_dir = journal_dir
+        self.worker_ports: List[int] = [port + 1 + i for i in range(workers)]
+        self.processes: List[multiprocessing.Process] = []
+
+    def start_workers(self):
+        """הפעלת תהליכי העובדים"""
+        # חוקי הכלים נטענים כאן, לפני ה-fork - כל העובדים יורשים את אותם דפי זיכרון.
+        # gc.freeze מוציא אותם ממעקב ה-GC, כדי שסריקת GC בעובד לא תכתוב אליהם ותעתיק אותם
+        shared_rules()
+        gc.freeze()
+        for index, worker_port in enumerate(self.worker_ports):
+            process = multiprocessing.Process(
+                target=_run_worker,
+                args=(index, self.host, worker_port, self.workers, self.journal_dir),
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+
+    def stop_workers(self):
+        """עצירת כל העובדים"""
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        self.processes.clear()
+
+    def worker_port_for(self, path: str) -> int:
+        """הפורט של העובד שאחראי על החדר שבכתובת"""
+        query = parse_qs(urlparse(path).query)
+        room_id = query.get("room", [RoomManager.DEFAULT_ROOM])[-1]
+        return self.worker_ports[room_worker(room_id, self.workers)]
+
+    def route(self, connection, request):
+        """process_request של המקבל הקדמי - מפנה את החיבור לעובד של החדר"""
+        worker_port = self.worker_port_for(request.path)
+        host = self.public_host or request.headers.get("Host", "localhost").rsplit(":", 1)[0]
+        response = connection.respond(HTTPStatus.TEMPORARY_REDIRECT, "")
+        response.headers["Location"] = f"ws://{host}:{worker_port}{request.path}"
+        return response
+
+    async def serve_front(self):
+        """המקבל הקדמי - רץ לנצח"""
+        async with websockets.serve(self._never_called, self.host, self.port, process_request=self.route):
+            print(f"🚦 מקבל קדמי על פורט {self.port} -> {self.workers} עובדים {self.worker_ports}")
+            await asyncio.Future()
+
+    @staticmethod
+    async def _never_called(websocket):
+        # כל בקשה מקבלת הפניה ב-process_request, אז אין כאן לחיצת יד
+        await websocket.close()
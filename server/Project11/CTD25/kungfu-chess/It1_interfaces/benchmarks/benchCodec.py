@@ -0,0 +1,67 @@
+"""
+השוואת הקידוד הבינארי מול JSON: בתים להודעה וזמן קידוד/פענוח.
+
+הרצה (מתוך התיקייה It1_interfaces):
+    python benchmarks/benchCodec.py --iterations 100000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import WireProtocol
+from GameServer import GameState
+
+SAMPLES = {
+    "move (client)": {"action": "move", "from": "g1", "to": "f3", "piece": "NW_2"},
+    "move_executed": {
+        "type": "move_executed", "version": 1532, "from": "g1", "to": "f3", "piece": "NW",
+        "captured": "PB", "promoted": False, "timestamp": 754213, "changes": {"g1": None, "f3": "NW"},
+    },
+}
+
+
+def full_state_sample():
+    state = GameState()
+    state.start_game()
+    return state.get_full_state()
+
+
+def measure(name, message, iterations):
+    text = json.dumps(message)
+    binary = WireProtocol.encode_binary(message)
+    assert WireProtocol.decode_binary(binary) == json.loads(text)
+
+    def per_op_us(stmt):
+        return timeit.timeit(stmt, number=iterations) / iterations * 1e6
+
+    return (
+        name,
+        len(text.encode("utf-8")), len(binary),
+        per_op_us(lambda: json.dumps(message)), per_op_us(lambda: WireProtocol.encode_binary(message)),
+        per_op_us(lambda: json.loads(text)), per_op_us(lambda: WireProtocol.decode_binary(binary)),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    out = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    samples = dict(SAMPLES, full_state=full_state_sample())
+
+    print(f"{'message':<16} {'json B':>7} {'bin B':>6} {'json enc us':>12} {'bin enc us':>11} "
+          f"{'json dec us':>12} {'bin dec us':>11}", file=out)
+    for name, message in samples.items():
+        row = measure(name, message, args.iterations)
+        print(f"{row[0]:<16} {row[1]:>7} {row[2]:>6} {row[3]:>12.2f} {row[4]:>11.2f} {row[5]:>12.2f} {row[6]:>11.2f}",
+              file=out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+מדידת זמן השחזור מהיומן: טעינת תמונת מצב + הרצת זנב היומן לכל חדר.
+
+הרצה (מתוך התיקייה It1_interfaces):
+    python benchmarks/benchRecovery.py --rooms 10000 --moves 12 --snapshot-every 8
+
+בכל חדר משוחקים אותם מהלכים (פרשים הלוך-חזור בשני הצדדים), כך שכל חדר
+נשאר עם תמונת מצב וזנב של moves % snapshot-every מהלכים.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from GameServer import GameState
+from MoveJournal import MoveJournal
+
+# (מ, אל, כלי, צבע) - מחזור של ארבעה מהלכים שחוזר על עצמו
+CYCLE = [
+    ("b1", "c3", "NW_1", "white"),
+    ("g8", "f6", "NB_1", "black"),
+    ("c3", "b1", "NW_1", "white"),
+    ("f6", "g8", "NB_1", "black"),
+]
+MOVE_GAP_MS = 4000  # מספיק כדי שכל כלי ינחת וינוח לפני המהלך הבא שלו
+
+
+def build_journal(root: str, rooms: int, moves: int, snapshot_every: int) -> float:
+    """כתיבת היומן של כל החדרים - מחזיר את זמן הכתיבה בשניות"""
+    journal = MoveJournal(root, snapshot_every=snapshot_every)
+    started = time.perf_counter()
+    for index in range(rooms):
+        room_id = f"room-{index}"
+        state = GameState()
+        state.start_game()
+        for number in range(moves):
+            from_pos, to_pos, piece_id, player = CYCLE[number % len(CYCLE)]
+            now_ms = number * MOVE_GAP_MS
+            state.advance(now_ms)
+            ok, _ = state.execute_move(from_pos, to_pos, piece_id, player, now_ms)
+            assert ok, (room_id, number)
+            journal.record_move(room_id, state, {"from": from_pos, "to": to_pos, "piece_id": piece_id,
+                                                 "player": player, "timestamp": now_ms})
+        if index % 500 == 0:
+            journal.flush_sync()
+    journal.flush_sync()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rooms", type=int, default=10000)
+    parser.add_argument("--moves", type=int, default=12)
+    parser.add_argument("--snapshot-every", type=int, default=8)
+    args = parser.parse_args()
+
+    out = sys.stdout
+    # GameState מדפיס כל אירוע - משתיקים כדי למדוד את השחזור ולא את הטרמינל
+    sys.stdout = open(os.devnull, "w")
+
+    with tempfile.TemporaryDirectory() as root:
+        write_seconds = build_journal(root, args.rooms, args.moves, args.snapshot_every)
+
+        started = time.perf_counter()
+        states = MoveJournal(root).recover(GameState)
+        recover_seconds = time.perf_counter() - started
+
+    assert len(states) == args.rooms
+    tail = args.moves % args.snapshot_every
+    print(f"rooms={args.rooms} moves/room={args.moves} snapshot-every={args.snapshot_every} tail={tail}", file=out)
+    print(f"write:   {write_seconds:8.2f}s", file=out)
+    print(f"recover: {recover_seconds:8.2f}s  ({recover_seconds / args.rooms * 1e6:.0f} us/room)", file=out)
+
+
+if __name__ == "__main__":
+    main()
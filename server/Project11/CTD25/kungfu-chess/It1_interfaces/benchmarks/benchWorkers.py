@@ -0,0 +1,195 @@
+"""
+מדידת תפוקת מהלכים (moves/sec) וניצולת המעבד של כל עובד, כתלות במספר העובדים.
+
+הרצה (מתוך התיקייה It1_interfaces):
+    python benchmarks/benchWorkers.py --workers 1 2 4 --rooms 1024 --seconds 10
+
+כל תהליך עומס פותח כמה חדרים דרך המקבל הקדמי, ובכל חדר שני שחקנים. כל צד
+מקדם ארבעה חיילים צעד אחד (פתיחה), ואז מזיז שישה כלים הלוך-חזור בבת אחת -
+שני פרשים, שני צריחים, מלכה ומלך - כך שבכל חדר 12 כלים בתנועה או במנוחה.
+כלי זז שוב רק אחרי piece_arrived שלו ועוד משך המנוחה (rest_until), כך שכל
+מהלך חוקי, ומהלך שנדחה בגלל הגבלת הקצב נשלח שוב רק אחרי retry_after_ms.
+קצב המשחק מגביל כל חדר לכמה מהלכים בשנייה, ולכן העומס בא ממספר החדרים: עם
+מספיק חדרים העובדים עמוסים עד הסוף (cpu% קרוב ל-100), ורק אז התפוקה מראה אם
+עוד עובדים עוזרים. לצד התפוקה מודפסת ניצולת המעבד של כל עובד ושל תהליכי
+העומס (מ-/proc, לינוקס) - עובד שלא הגיע ל-100% אומר שהמדידה לא חסומה בשרת.
+רק move_executed נספר כמהלך - מהלך שנדחה נספר בנפרד, כדי שהמדידה לא תהפוך
+למדידה של מהירות הדחייה.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import websockets
+
+from WorkerPool import WorkerPool
+
+# (מזהה, משבצת בית, משבצת יעד) לכל צד. פתיחה - מהלך אחד שמפנה משבצות לכלים
+# שמאחור; הלוך-חזור - הכלי זז בין שתי המשבצות עד סוף המדידה
+OPENINGS = {
+    "white": [("PW_1", "a2", "a3"), ("PW_4", "d2", "d3"), ("PW_5", "e2", "e3"), ("PW_8", "h2", "h3")],
+    "black": [("PB_1", "a7", "a6"), ("PB_4", "d7", "d6"), ("PB_5", "e7", "e6"), ("PB_8", "h7", "h6")],
+}
+SHUTTLES = {
+    "white": [("NW_1", "b1", "c3"), ("NW_2", "g1", "f3"), ("RW_1", "a1", "a2"),
+              ("RW_2", "h1", "h2"), ("QW_1", "d1", "d2"), ("KW_1", "e1", "e2")],
+    "black": [("NB_1", "b8", "c6"), ("NB_2", "g8", "f6"), ("RB_1", "a8", "a7"),
+              ("RB_2", "h8", "h7"), ("QB_1", "d8", "d7"), ("KB_1", "e8", "e7")],
+}
+EXECUTED = "move_executed"
+REJECTED = "move_error"
+REJECT_BACKOFF_MS = 50
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def free_port_block(size: int) -> int:
+    """מחפש פורט בסיס שאחריו size פורטים פנויים"""
+    while True:
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            base = probe.getsockname()[1]
+        if base + size >= 65535:
+            continue
+        try:
+            for offset in range(size + 1):
+                with socket.socket() as check:
+                    check.bind(("127.0.0.1", base + offset))
+            return base
+        except OSError:
+            continue
+
+
+def cpu_seconds(pid: int) -> float:
+    """זמן המעבד (user + system) של תהליך עד עכשיו, מ-/proc/<pid>/stat"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+async def play_side(uri: str, deadline: float):
+    """שחקן אחד בחדר - הצבע נקבע בכניסה. מחזיר (מהלכים שבוצעו, מהלכים שנדחו)"""
+    executed = rejected = 0
+    async with websockets.connect(uri) as websocket:
+        color = None
+        while color is None:
+            message = json.loads(await websocket.recv())
+            color = message.get("color") if message.get("type") == "assign_color" else None
+        # מזהה -> [מיקום נוכחי, המשבצת הבאה (None = סיים), מתי מותר לזוז שוב (None = בדרך)].
+        # הפתיחה נשלחת ראשונה, והתיבה של החדר מבצעת לפי הסדר - המשבצות פנויות כשהכלים שמאחור זזים
+        pieces = {piece: [home, away, 0.0] for piece, home, away in OPENINGS[color] + SHUTTLES[color]}
+        openings = {piece for piece, _, _ in OPENINGS[color]}
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            for piece, knight in pieces.items():
+                if knight[1] is not None and knight[2] is not None and knight[2] <= now:
+                    knight[2] = None
+                    await websocket.send(json.dumps({"action": "move", "from": knight[0], "to": knight[1], "piece": piece}))
+
+            waiting = [knight[2] for knight in pieces.values() if knight[1] is not None and knight[2] is not None]
+            timeout = max(0.0, min(waiting + [deadline]) - time.perf_counter())
+            try:
+                reply = await asyncio.wait_for(websocket.recv(), timeout)
+            except asyncio.TimeoutError:
+                continue
+            if not isinstance(reply, str):
+                continue
+            message = json.loads(reply)
+            kind = message.get("type")
+            piece = next((p for p, k in pieces.items() if k[0] == message.get("from") and k[1] == message.get("to")), None)
+            if piece is None:
+                continue  # מהלך של הצד השני
+            knight = pieces[piece]
+            if kind == EXECUTED:
+                executed += 1
+            elif kind == REJECTED:
+                rejected += 1
+                # דחייה בגלל קצב (rate_limited / inbox_full) אומרת כמה לחכות - לא מציפים שוב
+                knight[2] = time.perf_counter() + message.get("retry_after_ms", REJECT_BACKOFF_MS) / 1000
+            elif kind == "piece_arrived":
+                # המנוחה נמדדת בשעון השרת - מוסיפים את המשך שלה לזמן הקבלה אצלנו
+                rest_s = (message["rest_until"] - message["timestamp"]) / 1000
+                knight[0], knight[1] = knight[1], None if piece in openings else knight[0]
+                knight[2] = time.perf_counter() + rest_s
+    return executed, rejected
+
+
+def load_process(port: int, rooms, seconds: float, results):
+    async def run():
+        deadline = time.perf_counter() + seconds
+        counts = await asyncio.gather(*(
+            play_side(f"ws://127.0.0.1:{port}/?room={room}", deadline) for room in rooms for _ in range(2)
+        ))
+        results.put((sum(executed for executed, _ in counts), sum(rejected for _, rejected in counts)))
+
+    asyncio.run(run())
+
+
+def measure(workers: int, rooms: int, loaders: int, seconds: float):
+    """(מהלכים לשנייה, דחיות לשנייה, cpu% של כל עובד, cpu% של כל תהליכי העומס יחד)"""
+    port = free_port_block(workers)
+    pool = WorkerPool(workers, "127.0.0.1", port, public_host="127.0.0.1")
+    pool.start_workers()
+    front = multiprocessing.Process(target=lambda: asyncio.run(pool.serve_front()), daemon=True)
+    front.start()
+    time.sleep(1.0)
+
+    results = multiprocessing.Queue()
+    room_ids = [f"bench-{workers}-{i}" for i in range(rooms)]
+    procs = [
+        multiprocessing.Process(target=load_process, args=(port, room_ids[i::loaders], seconds, results))
+        for i in range(loaders)
+    ]
+    for proc in procs:
+        proc.start()
+    started = time.perf_counter()
+    worker_cpu = [cpu_seconds(process.pid) for process in pool.processes]
+    loader_cpu = [cpu_seconds(proc.pid) for proc in procs]
+    totals = [results.get() for _ in procs]
+    # לפני join - תהליך שיצא כבר לא מופיע ב-/proc
+    worker_cpu = [cpu_seconds(process.pid) - before for process, before in zip(pool.processes, worker_cpu)]
+    loader_cpu = sum(cpu_seconds(proc.pid) - before for proc, before in zip(procs, loader_cpu))
+    elapsed = time.perf_counter() - started
+    for proc in procs:
+        proc.join()
+
+    front.terminate()
+    front.join()
+    pool.stop_workers()
+    executed = sum(done for done, _ in totals)
+    rejected = sum(failed for _, failed in totals)
+    worker_pct = [100 * used / elapsed for used in worker_cpu]
+    return executed / seconds, rejected / seconds, worker_pct, 100 * loader_cpu / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rooms", type=int, default=1024)
+    parser.add_argument("--loaders", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    out = sys.stdout
+    # השרת מדפיס כל אירוע - משתיקים כדי למדוד את המשחק ולא את הטרמינל
+    sys.stdout = open(os.devnull, "w")
+
+    print(f"cpus={os.cpu_count()} rooms={args.rooms} loaders={args.loaders} seconds={args.seconds}", file=out)
+    print(f"{'workers':>8} {'moves/sec':>12} {'rejected/sec':>14} {'loaders cpu%':>13}  worker cpu%", file=out)
+    for workers in args.workers:
+        rate, rejected, worker_pct, loader_pct = measure(workers, args.rooms, args.loaders, args.seconds)
+        per_worker = " ".join(f"{pct:.0f}" for pct in worker_pct)
+        print(f"{workers:>8} {rate:>12.0f} {rejected:>14.0f} {loader_pct:>13.0f}  {per_worker}", file=out)
+
+
+if __name__ == "__main__":
+    multiprocessing.set_start_method("fork")
+    main()
@@ -0,0 +1,33 @@
+"""
+חיבור מדומה משותף לטסטים של השרת - במקום עותק מעט שונה בכל קובץ טסט.
+
+שומר כל מסגרת שנשלחה אליו כמו שהיא (frames) וגם מפוענחת (sent), בטקסט JSON
+או בפרוטוקול הבינארי - לפי ה-subprotocol שסוכם, כמו חיבור אמיתי.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import WireProtocol
+
+
+class FakeWebSocket:
+    """חיבור מדומה ששומר את כל ההודעות שנשלחו אליו"""
+
+    def __init__(self, path="/", subprotocol=None):
+        self.path = path
+        self.subprotocol = subprotocol
+        self.frames = []
+        self.sent = []
+        self.closed = False
+
+    async def send(self, frame):
+        self.frames.append(frame)
+        self.sent.append(WireProtocol.decode(frame))
+
+    async def close(self):
+        self.closed = True
+
+    def types(self):
+        return [m["type"] for m in self.sent]
@@ -0,0 +1,93 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from BitBoard import BitBoard, square_index, square_name, iter_bits
+from GameServer import GameState, PIECES_DIR
+
+
+def targets_of(state, pos):
+    """כל משבצות היעד החוקיות של הכלי שבמשבצת, כשמות אלגבריים"""
+    piece_type = state.board.piece_at(square_index(pos))
+    rules = state.move_tables.get(piece_type)
+    own = state.board.colors[piece_type[-1]]
+    mask = rules.targets(square_index(pos), state.board.occupied, state.board.occupied & ~own) & ~own
+    return {square_name(square) for square in iter_bits(mask)}
+
+
+@pytest.fixture
+def state():
+    game_state = GameState()
+    game_state.start_game()
+    return game_state
+
+
+def set_board(state, board_state):
+    state.board = BitBoard.from_dict(board_state)
+
+
+# === טסט 1: כל סוגי הכלים נטענים מ-moves.txt ===
+def test_all_piece_types_loaded(state):
+    assert PIECES_DIR.is_dir()
+    assert set(state.move_tables.rules) == {c + s for c in "PNBRQK" for s in "WB"}
+
+
+# === טסט 2: bitboard והמילון מסונכרנים ===
+def test_board_roundtrip(state):
+    assert len(state.board_state) == 32
+    assert state.board_state["e1"] == "QW"
+    assert bin(state.board.colors['W']).count("1") == 16
+
+
+# === טסט 3: פרש קופץ, מלך זז צעד אחד ===
+def test_leapers(state):
+    assert targets_of(state, "b1") == {"a3", "c3"}
+    set_board(state, {"e4": "KW", "e5": "PB", "d4": "PW"})
+    assert targets_of(state, "e4") == {"d3", "e3", "f3", "f4", "f5", "e5", "d5"}
+
+
+# === טסט 4: כלים גולשים נעצרים בחוסם הראשון ===
+def test_sliders_blocked(state):
+    set_board(state, {"d4": "RW", "d6": "PB", "f4": "PW", "a1": "KW", "h8": "KB"})
+    assert targets_of(state, "d4") == {"d5", "d6", "d3", "d2", "d1", "c4", "b4", "a4", "e4"}
+    set_board(state, {"c1": "BW", "e3": "PB", "b2": "PW"})
+    assert targets_of(state, "c1") == {"d2", "e3"}
+
+
+# === טסט 5: בפתיחה רץ, צריח ומלכה חסומים לגמרי ===
+def test_opening_blocked(state):
+    for pos in ("a1", "c1", "e1", "h8", "f8"):
+        assert targets_of(state, pos) == set()
+    ok, response = state.execute_move("a1", "a5", "RW_1", "white")
+    assert not ok
+
+
+# === טסט 6: חייל - צעד ישר רק לריק, אלכסון רק לאכילה ===
+def test_pawns(state):
+    assert targets_of(state, "e2") == {"e3"}
+    assert targets_of(state, "e7") == {"e6"}
+    set_board(state, {"e4": "PW", "e5": "PB", "d5": "PB", "f4": "PW"})
+    assert targets_of(state, "e4") == {"d5"}
+    assert targets_of(state, "e5") == {"f4"}
+
+
+# === טסט 7: אי אפשר לאכול כלי של אותו שחקן ===
+def test_cannot_capture_own_piece(state):
+    set_board(state, {"d1": "QW", "d2": "PW", "h8": "KB"})
+    ok, response = state.execute_move("d1", "d2", "QW_1", "white")
+    assert not ok
+
+
+# === טסט 8: מהלך חוקי מעדכן את ה-bitboards ===
+def test_execute_updates_bitboards(state):
+    ok, response = state.execute_move("e2", "e3", "PW_5", "white", now_ms=0)
+    assert ok
+    state.advance(response["arrive_at"])
+    assert state.board.piece_at(square_index("e3")) == "PW"
+    assert state.board.piece_at(square_index("e2")) is None
+    assert state.board.pieces["PW"] & (1 << square_index("e3"))
+    ok, _ = state.execute_move("f1", "c4", "BW_2", "white", now_ms=response["arrive_at"])
+    assert ok
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import BoardHash
+from BitBoard import BitBoard
+from FakeWebSocket import FakeWebSocket
+from GameServer import GameServer, GameState
+from RateLimiter import ConnectionLimiter
+
+
+# === טסט 1: הגיבוב המתעדכן בכל הצבה והסרה שווה לגיבוב של הלוח כולו ===
+def test_incremental_hash_matches_full_hash():
+    state = GameState()
+    state.start_game()
+    assert state.board.hash == BoardHash.hash_board(state.board_state)
+
+    state.board = BitBoard.from_dict({"d1": "QW", "d7": "PB", "e1": "KW", "e8": "KB", "a7": "PW"})
+    for move in (("d1", "d7", "QW_1"), ("a7", "a8", "PW_1")):
+        _, message = state.execute_move(*move, "white", now_ms=0)
+        assert message["hash"] == state.board.hash
+    state.advance(10000)
+    assert state.board_state["a8"] == "QW" and state.board_state["d7"] == "QW"
+    assert state.board.hash == BoardHash.hash_board(state.board_state)
+
+
+# === טסט 2: מראה של הלוח שמתעדכן מהדלתאות מגיע לאותו גיבוב כמו השרת ===
+def test_mirror_follows_server_hash():
+    state = GameState()
+    state.start_game()
+    mirror = dict(state.board_state)
+    mirror_hash = BoardHash.hash_board(mirror)
+    _, moved = state.execute_move("b1", "c3", "NW_1", "white", now_ms=0)
+    messages = [moved] + state.advance(moved["arrive_at"])
+    for message in messages:
+        mirror_hash = BoardHash.apply_changes(mirror_hash, mirror, message["changes"])
+        for pos, piece_type in message["changes"].items():
+            if piece_type:
+                mirror[pos] = piece_type
+            else:
+                mirror.pop(pos, None)
+        assert mirror_hash == message["hash"]
+    assert state.hash_at(moved["version"]) == moved["hash"]
+    assert state.hash_at(state.version + 1) is None
+
+
+# === טסט 3: verify - מצב מלא נשלח רק כשהגיבוב לא תואם או שהגרסה כבר נשכחה ===
+def test_verify_sends_snapshot_only_on_mismatch():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("verify")
+        white, black = FakeWebSocket(), FakeWebSocket()
+        await server.register_client(white, room)
+        await server.register_client(black, room)
+        await server.handle_move_request(white, {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"})
+        await server.drain()
+        moved = next(m for m in black.sent if m["type"] == "move_executed")
+
+        async def verify(version, board_hash):
+            before = black.types().count("full_state")
+            await server.handle_message(black, room, ConnectionLimiter(), json.dumps(
+                {"action": "verify", "version": version, "hash": board_hash}))
+            await server.drain()
+            return black.types().count("full_state") - before
+
+        assert await verify(moved["version"], moved["hash"]) == 0
+        assert await verify(moved["version"], moved["hash"] ^ 1) == 1
+        assert await verify(-5, moved["hash"]) == 1
+        assert server.hash_mismatches == 2
+        assert black.sent[-1]["hash"] == room.game_state.board.hash
+        await server.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import GameServer as game_server_module
+from ClientWriter import ClientWriter
+from FakeWebSocket import FakeWebSocket
+from GameServer import GameServer
+
+
+class GatedWebSocket(FakeWebSocket):
+    """חיבור שהשליחה אליו נתקעת עד שפותחים את השער (כמו חלון TCP מלא)"""
+
+    def __init__(self, path="/"):
+        super().__init__(path)
+        self.gate = asyncio.Event()
+
+    async def send(self, message):
+        await self.gate.wait()
+        await super().send(message)
+
+
+# === טסט 1: full_state ישן שעוד מחכה בתור מוחלף בחדש ===
+def test_full_state_collapsed():
+    async def scenario():
+        websocket = GatedWebSocket()
+        writer = ClientWriter(websocket)
+        writer.enqueue(json.dumps({"type": "info"}), "info")
+        await asyncio.sleep(0)  # הכותב לוקח את הראשונה ונתקע בשליחה
+        for version in (1, 2, 3):
+            writer.enqueue(json.dumps({"type": "full_state", "version": version}), "full_state")
+        writer.enqueue(json.dumps({"type": "move_executed"}), "move_executed")
+        assert writer.metrics()["collapsed"] == 2
+
+        websocket.gate.set()
+        await writer.drain()
+        assert [m.get("version") for m in websocket.sent] == [None, 3, None]
+        await writer.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 2: תור מלא - הצרכן מנותק והשרת מקבל הודעה ===
+def test_overflow_disconnects():
+    async def scenario():
+        slow = []
+        writer = ClientWriter(GatedWebSocket(), max_depth=2, on_slow=lambda ws, reason: slow.append(reason))
+        results = [writer.enqueue(json.dumps({"type": "info", "n": n}), "info") for n in range(4)]
+        assert results == [True, True, False, False]
+        assert slow == ["overflow"]
+        metrics = writer.metrics()
+        assert metrics["disconnect_reason"] == "overflow" and metrics["depth"] == 0 and metrics["dropped"] == 4
+        await writer.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 3: שליחה שנתקעת מעבר לזמן המותר מנתקת את הצרכן ===
+def test_stuck_send_disconnects():
+    async def scenario():
+        slow = []
+        writer = ClientWriter(GatedWebSocket(), slow_deadline=0.05, on_slow=lambda ws, reason: slow.append(reason))
+        writer.enqueue(json.dumps({"type": "info"}), "info")
+        await asyncio.sleep(0.15)
+        assert slow == ["slow"] and writer.closed
+        await writer.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 4: לקוח תקוע מנותק מהחדר (המושב נשמר לו) והשני ממשיך לקבל ===
+def test_server_drops_slow_consumer(monkeypatch):
+    monkeypatch.setattr(game_server_module, "SLOW_CONSUMER_DEADLINE", 0.05)
+
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("slow")
+        stuck, healthy = GatedWebSocket(), GatedWebSocket()
+        healthy.gate.set()
+        await server.register_client(stuck, room)
+        await server.register_client(healthy, room)
+        await server.handle_move_request(healthy, {"action": "move", "from": "g8", "to": "f6", "piece": "NB_1"})
+        await asyncio.sleep(0.2)
+
+        assert stuck not in room.clients and stuck.closed
+        assert len(room.held_seats) == 1
+        assert server.drop_report()["drops"] == {"slow_consumer:slow": 1}
+        assert "move_executed" in [m["type"] for m in healthy.sent]
+        assert server.queue_report(room)[room.clients[healthy]["player_id"]]["depth"] == 0
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 5: חיבור עם אצוות - כל מה שנכנס באותו סיבוב לולאה יוצא במסגרת אחת ===
+def test_same_tick_messages_share_one_frame():
+    async def scenario():
+        websocket = GatedWebSocket()
+        websocket.gate.set()
+        writer = ClientWriter(websocket, batch_window=0)
+        for seq in (1, 2, 3):
+            writer.enqueue(json.dumps({"type": "info", "seq": seq}), "info")
+        await writer.drain()
+        assert len(websocket.sent) == 1
+        assert [m["seq"] for m in websocket.sent[0]["messages"]] == [1, 2, 3]
+
+        writer.enqueue(json.dumps({"type": "info", "seq": 4}), "info")
+        await writer.drain()
+        assert websocket.sent[-1] == {"type": "info", "seq": 4}  # הודעה בודדת בלי מעטפת
+        assert writer.metrics()["sent"] == 4 and writer.metrics()["frames"] == 2
+        await writer.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 6: לקוח עם batch=1 מקבל אותן הודעות באותו סדר, בפחות מסגרות ===
+def test_batching_client_gets_same_messages_in_fewer_frames():
+    async def scenario():
+        server = GameServer()
+        views = {}
+        for path in ("/?room=plain", "/?room=batched&batch=1"):
+            room = server.rooms.get_or_create(path.split("room=")[1].split("&")[0])
+            white, black = GatedWebSocket(path), GatedWebSocket(path)
+            white.gate.set()
+            black.gate.set()
+            await server.register_client(white, room)
+            await server.register_client(black, room)
+            await server.handle_move_request(white, {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"})
+            await server.drain()
+            views[path] = black.sent
+
+        plain, batched = views.values()
+        flattened = [m for frame in batched for m in (frame["messages"] if frame["type"] == "batch" else [frame])]
+        strip = lambda m: {key: value for key, value in m.items() if key not in ("timestamp", "resume_token", "player_id", "room")}
+        assert [strip(m) for m in flattened] == [strip(m) for m in plain]
+        assert len(batched) < len(plain)
+        await server.close()
+
+    asyncio.run(scenario())
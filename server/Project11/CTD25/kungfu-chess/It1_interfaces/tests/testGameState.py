@@ -0,0 +1,159 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from BitBoard import BitBoard
+from GameServer import GameState
+
+
+@pytest.fixture
+def state():
+    """מצב משחק שכבר התחיל"""
+    game_state = GameState()
+    game_state.start_game()
+    return game_state
+
+
+def set_board(state, board_state):
+    state.board = BitBoard.from_dict(board_state)
+
+
+# === טסט 1: הודעות היציאה וההגעה נושאות רק את המשבצות שהשתנו ===
+def test_move_message_is_delta(state):
+    ok, response = state.execute_move("b1", "c3", "NW_1", "white", now_ms=0)
+    assert ok
+    assert "board_state" not in response
+    assert response["changes"] == {"b1": None}
+    arrived, = state.advance(response["arrive_at"])
+    assert arrived["type"] == "piece_arrived"
+    assert arrived["changes"] == {"c3": "NW"}
+
+
+# === טסט 2: כל מהלך מקדם את גרסת הלוח באחד ===
+def test_version_increments_per_move(state):
+    assert state.get_full_state()["version"] == 0
+    _, first = state.execute_move("b1", "c3", "NW_1", "white", now_ms=0)
+    _, second = state.execute_move("g8", "f6", "NB_1", "black", now_ms=0)
+    assert (first["version"], second["version"]) == (1, 2)
+    assert state.get_full_state()["version"] == 2
+
+
+# === טסט 3: מהלך שנדחה לא משנה את הגרסה ===
+def test_rejected_move_keeps_version(state):
+    ok, _ = state.execute_move("b1", "b1", "NW_1", "white")
+    assert not ok
+    assert state.version == 0
+
+
+# === טסט 4: הכלי בדרך עד זמן ההגעה, שמחושב כמו MovePhysics ===
+def test_piece_in_flight_until_arrival(state):
+    set_board(state, {"a1": "RW", "e1": "KW", "e8": "KB"})
+    ok, response = state.execute_move("a1", "a3", "RW_1", "white", now_ms=1000)
+    assert ok
+    # שתי משבצות * 80 פיקסלים במהירות 1.5 מ'/שנייה
+    assert response["arrive_at"] == 1000 + int(160 / 150 * 1000)
+    assert state.board_state.get("a1") is None and state.board_state.get("a3") is None
+    assert state.advance(response["arrive_at"] - 1) == []
+    assert len(state.advance(response["arrive_at"])) == 1
+    assert state.board_state["a3"] == "RW"
+
+
+# === טסט 5: כלי שנחת נח, ומהלך ממנו נדחה עד סוף המנוחה ===
+def test_cooldown_rejects_moves(state):
+    _, response = state.execute_move("g1", "f3", "NW_2", "white", now_ms=0)
+    arrived, = state.advance(response["arrive_at"])
+    rest_until = arrived["rest_until"]
+    ok, result = state.execute_move("f3", "g5", "NW_2", "white", now_ms=rest_until - 1)
+    assert not ok and "מנוחה" in result["error"]
+    state.advance(rest_until)
+    ok, _ = state.execute_move("f3", "g5", "NW_2", "white", now_ms=rest_until)
+    assert ok
+
+
+# === טסט 6: אכילה נקבעת בזמן ההגעה - כלי שברח בזמן ניצל ===
+def test_capture_resolved_on_arrival(state):
+    set_board(state, {"a1": "RW", "a8": "RB", "h8": "KB", "e1": "KW"})
+    _, attack = state.execute_move("a1", "a8", "RW_1", "white", now_ms=0)
+    # הצריח השחור בורח לפני שהלבן מגיע
+    ok, _ = state.execute_move("a8", "b8", "RB_1", "black", now_ms=100)
+    assert ok
+    arrived = state.advance(attack["arrive_at"])[-1]
+    assert arrived["to"] == "a8" and arrived["captured"] is None
+
+    set_board(state, {"a1": "RW", "a8": "RB", "h8": "KB", "e1": "KW"})
+    _, attack = state.execute_move("a1", "a8", "RW_1", "white", now_ms=10000)
+    arrived, = state.advance(attack["arrive_at"])
+    assert arrived["captured"] == "RB"
+    assert state.scoreboard.get_score("W") == 5
+
+
+# === טסט 7: אכילת מלך בהגעה מסיימת את המשחק ===
+def test_king_capture_on_arrival_ends_game(state):
+    set_board(state, {"d1": "QW", "d8": "KB", "e1": "KW"})
+    _, attack = state.execute_move("d1", "d8", "QW_1", "white", now_ms=0)
+    messages = state.advance(attack["arrive_at"])
+    assert [m["type"] for m in messages] == ["piece_arrived", "game_over"]
+    assert messages[1]["winner"] == "white"
+
+
+# === טסט 8: שני כלים של אותו שחקן לא יכולים לטוס לאותה משבצת ===
+def test_destination_reserved_for_own_flight(state):
+    ok, _ = state.execute_move("b1", "c3", "NW_1", "white", now_ms=0)
+    assert ok
+    ok, result = state.execute_move("b2", "b3", "PW_2", "white", now_ms=0)
+    assert ok
+    ok, result = state.execute_move("d2", "d3", "PW_4", "white", now_ms=0)
+    assert ok
+    ok, result = state.execute_move("c2", "c3", "PW_3", "white", now_ms=0)
+    assert not ok and "בדרך" in result["error"]
+
+
+# === טסט 9: premove יוצא בדיוק ברגע שהמנוחה נגמרת, והגעתו נפתרת באותה ריצה ===
+def test_premove_runs_when_cooldown_ends(state):
+    _, response = state.execute_move("g1", "f3", "NW_2", "white", now_ms=0)
+    arrived, = state.advance(response["arrive_at"])
+    rest_until = arrived["rest_until"]
+    ok, queued = state.queue_premove("f3", "g5", "NW_2", "white", now_ms=rest_until - 500)
+    assert ok and queued == {"type": "premove_queued", "from": "f3", "to": "g5", "execute_at": rest_until}
+    assert state.advance(rest_until - 1) == []
+    messages = state.advance(rest_until + 5000)
+    assert [m["type"] for m in messages] == ["move_executed", "piece_arrived"]
+    assert messages[0]["timestamp"] == rest_until and messages[0]["premove"]
+    assert state.board_state["g5"] == "NW" and not state.premoves
+
+
+# === טסט 10: מקום אחד לכל כלי, ורק לכלי שלנו שבמנוחה ===
+def test_premove_one_slot_per_piece(state):
+    _, response = state.execute_move("g1", "f3", "NW_2", "white", now_ms=0)
+    arrived, = state.advance(response["arrive_at"])
+    now = arrived["timestamp"]
+    assert not state.queue_premove("b1", "c3", "NW_1", "white", now_ms=now)[0]  # לא במנוחה
+    assert not state.queue_premove("f3", "g5", "NW_2", "black", now_ms=now)[0]  # לא שלנו
+    state.queue_premove("f3", "g5", "NW_2", "white", now_ms=now)
+    state.queue_premove("f3", "h4", "NW_2", "white", now_ms=now)
+    assert [p["to"] for p in state.premoves.values()] == ["h4"]
+    ok, cancelled = state.queue_premove("f3", None, "NW_2", "white", now_ms=now)
+    assert ok and cancelled["type"] == "premove_cancelled" and not state.premoves
+
+
+# === טסט 11: premove של כלי שנאכל מתבטל, ו-premove שכבר לא חוקי לא מבוצע ===
+def test_premove_cancelled_on_capture_or_illegal(state):
+    set_board(state, {"a1": "RW", "a3": "PW", "h3": "RB", "e1": "KW", "e8": "KB"})
+    state.cooldowns[0] = 5000    # a1
+    state.cooldowns[16] = 5000   # a3
+    state.timeline.schedule(5000, "cooldown_end", 0)
+    state.timeline.schedule(5000, "cooldown_end", 16)
+    state.queue_premove("a3", "a4", "PW_1", "white", now_ms=0)
+    state.queue_premove("a1", "a2", "RW_1", "white", now_ms=0)
+    _, attack = state.execute_move("h3", "a3", "RB_1", "black", now_ms=0)
+    messages = state.advance(attack["arrive_at"])
+    assert [m["type"] for m in messages] == ["piece_arrived", "premove_cancelled"]
+    assert messages[1]["reason"] == "captured" and messages[1]["player"] == "white"
+    # כלי שלנו נכנס בינתיים ל-a2 - ה-premove של הצריח כבר לא חוקי כשהמנוחה נגמרת
+    state.board.place(8, "PW")
+    cancelled, = state.advance(5000)
+    assert cancelled["type"] == "premove_cancelled" and cancelled["from"] == "a1"
+    assert state.board_state["a1"] == "RW"
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import WireProtocol
+from BitBoard import BitBoard
+from FakeWebSocket import FakeWebSocket
+from GameServer import GameServer, GameState
+from Lockstep import LockstepDesync, LockstepSim, SIM_STEP_MS, step_up, to_wire, travel_time_ms
+
+
+@pytest.fixture
+def state():
+    """חדר lockstep שהמשחק בו כבר התחיל"""
+    game_state = GameState()
+    game_state.enable_lockstep()
+    game_state.start_game()
+    return game_state
+
+
+def play(state, moves, until_ms):
+    """הרצת מהלכים (זמן, מ-, אל-, צבע) על השרת - מחזיר את כל ההודעות לפי הסדר"""
+    messages = []
+    for now_ms, from_pos, to_pos, color in moves:
+        messages.extend(state.advance(now_ms))
+        ok, result = state.execute_move(from_pos, to_pos, "", color, now_ms)
+        assert ok, result
+        messages.append(result)
+    messages.extend(state.advance(until_ms))
+    return messages
+
+
+# === טסט 1: משך התנועה במספרים שלמים - כמו החישוב הישן, ונחיתה על גבול צעד ===
+def test_integer_travel_time():
+    assert travel_time_ms(0, 160, 150) == int(160 / 150 * 1000)
+    assert travel_time_ms(80, 80, 150) == int((80 * 80 * 2) ** 0.5 / 150 * 1000)
+    assert travel_time_ms(0, 0, 150) == 1
+    assert step_up(1066) == 1070 and step_up(1070) == 1070
+
+
+# === טסט 2: הסימולציה מהקלטים בלבד משחזרת כל הודעה של השרת - אכילה, קידום, גרסה וגיבוב ===
+def test_sim_reproduces_server_messages(state):
+    state.board = BitBoard.from_dict({"e1": "KW", "e8": "KB", "a7": "PW", "b8": "RB", "h1": "RW", "h5": "PB"})
+    sim = LockstepSim.from_full_state(state.get_full_state())
+    messages = play(state, [(0, "a7", "b8", "white"), (20, "h5", "h4", "black"), (30, "h1", "h4", "white")], 10000)
+
+    kinds = [message["type"] for message in messages]
+    assert kinds == ["move_executed", "move_executed", "move_executed", "piece_arrived", "piece_arrived", "piece_arrived"]
+    for message in messages:
+        assert sim.apply(to_wire(message)) == message
+    assert (sim.version, sim.hash) == (state.version, state.board.hash)
+    assert sim.board == state.board_state and sim.board["b8"] == "QW"
+
+
+# === טסט 3: בחדר lockstep כל הזמנים על גבול של צעד, והקלט עצמו רק זמן ושתי משבצות ===
+def test_lockstep_times_are_quantized(state):
+    assert state.now_ms() % SIM_STEP_MS == 0
+    ok, response = state.execute_move("b1", "c3", "NW_1", "white", now_ms=120)
+    assert ok and response["arrive_at"] % SIM_STEP_MS == 0
+    assert to_wire(response) == {"type": "input", "t": 120, "from": "b1", "to": "c3"}
+    arrived, = state.advance(response["arrive_at"])
+    assert arrived["rest_until"] % SIM_STEP_MS == 0
+    assert to_wire(arrived) == {"type": "arrive"}
+    # הודעות שאינן על הלוח עוברות כמו שהן
+    assert to_wire({"type": "game_over", "winner": "white"}) == {"type": "game_over", "winner": "white"}
+
+
+# === טסט 4: סימולציה שנבנתה ממצב מלא באמצע טיסה ממשיכה מאותה נקודה ===
+def test_sim_resumes_from_full_state_mid_flight(state):
+    play(state, [(0, "b1", "c3", "white"), (0, "g8", "f6", "black")], 0)
+    sim = LockstepSim.from_full_state(state.get_full_state())
+    assert [flight[:2] for flight in sim.flights] == [["b1", "c3"], ["g8", "f6"]]
+    for message in play(state, [(50, "e2", "e3", "white")], 5000):
+        assert sim.apply(to_wire(message)) == message
+    assert (sim.version, sim.hash) == (state.version, state.board.hash)
+
+
+# === טסט 5: קלט שלא מתאים ללוח המקומי הוא desync - הלקוח יבקש מצב מלא ===
+def test_desync_raises():
+    sim = LockstepSim({"e1": "KW"}, speeds={"KW": 150})
+    with pytest.raises(LockstepDesync):
+        sim.apply({"type": "input", "t": 0, "from": "a1", "to": "a2"})
+    with pytest.raises(LockstepDesync):
+        sim.apply({"type": "arrive"})
+
+
+# === טסט 6: חדר lockstep משדר רק קלטים וסימוני נחיתה - כמה בתים למהלך, והלקוח מגיע לאותו לוח ===
+def test_lockstep_room_sends_only_inputs():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("lockstep", lockstep=True)
+        assert server.rooms.get_or_create("lockstep").game_state.lockstep
+        # חיבורים בינאריים - כמו לקוח lockstep אמיתי
+        white, black = (FakeWebSocket("/?mode=lockstep", WireProtocol.SUBPROTOCOL_BINARY) for _ in range(2))
+        await server.register_client(white, room)
+        await server.register_client(black, room)
+        await server.drain()
+        full_state = next(m for m in white.sent if m["type"] == "full_state")
+        assert full_state["lockstep"] and full_state["speeds"]["NW"] > 0
+        sim = LockstepSim.from_full_state(full_state)
+        white.frames.clear()
+        white.sent.clear()
+
+        await server.handle_move_request(white, {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"})
+        room.game_state.resume_clock(room.game_state.flights[1]["arrive_at"] + 1)
+        await server.run_room_events(room)
+        await server.drain()
+
+        inputs = [frame for frame in white.frames if frame[0] == WireProtocol.FRAME_INPUT]
+        arrivals = [frame for frame in white.frames if frame[0] == WireProtocol.FRAME_ARRIVE]
+        assert len(inputs) == 1 and len(arrivals) == 1
+        assert len(inputs[0]) <= 8 and len(arrivals[0]) <= 4
+        for message in white.sent:
+            sim.apply(message)
+        assert (sim.version, sim.hash) == (room.game_state.version, room.game_state.board.hash)
+        await server.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from FakeWebSocket import FakeWebSocket
+from GameServer import GameServer, GameState
+from MoveJournal import MoveJournal, JournalReplayError, JOURNAL_FILE, ROOM_FILE, SNAPSHOT_FILE
+
+
+MOVES = [
+    ("b1", "c3", "NW_1", "white", 0),
+    ("g8", "f6", "NB_1", "black", 100),
+    ("e2", "e3", "PW_5", "white", 5000),
+    ("c3", "d5", "NW_1", "white", 6000),
+]
+
+
+def play(state, journal, room_id, moves):
+    for from_pos, to_pos, piece_id, player, now_ms in moves:
+        state.advance(now_ms)
+        ok, _ = state.execute_move(from_pos, to_pos, piece_id, player, now_ms)
+        assert ok
+        journal.record_move(room_id, state, {"from": from_pos, "to": to_pos, "piece_id": piece_id,
+                                             "player": player, "timestamp": now_ms})
+
+
+def journal_lines(journal, room_id):
+    path = journal.room_dir(room_id) / JOURNAL_FILE
+    return path.read_text(encoding="utf-8").splitlines() if path.exists() else []
+
+
+# === טסט 1: שחזור מתמונת מצב וזנב היומן מחזיר את אותו משחק ===
+def test_recover_snapshot_and_tail(tmp_path):
+    journal = MoveJournal(tmp_path, snapshot_every=3)
+    state = GameState()
+    state.start_game()
+    play(state, journal, "room/1", MOVES)
+    journal.flush_sync()
+
+    recovered = MoveJournal(tmp_path).recover(GameState)
+    restored = recovered["room/1"]
+    assert restored.version == state.version
+    assert restored.board_state == state.board_state
+    assert restored.flights == state.flights
+    assert restored.cooldowns == state.cooldowns
+    assert len(restored.move_history.get_moves()) == len(MOVES)
+
+    # מה שהיה בדרך נוחת גם אחרי השחזור
+    arrive_at = max(flight["arrive_at"] for flight in state.flights.values())
+    assert restored.advance(arrive_at)[-1]["to"] == "d5"
+    state.advance(arrive_at)
+    assert restored.board_state == state.board_state
+
+
+# === טסט 2: תמונת מצב מקצרת את היומן ===
+def test_snapshot_truncates_journal(tmp_path):
+    journal = MoveJournal(tmp_path, snapshot_every=3)
+    state = GameState()
+    state.start_game()
+    play(state, journal, "r", MOVES[:3])
+    journal.flush_sync()
+    assert (journal.room_dir("r") / SNAPSHOT_FILE).exists()
+    assert journal_lines(journal, "r") == []
+
+    play(state, journal, "r", MOVES[3:])
+    journal.flush_sync()
+    assert [json.loads(line)["seq"] for line in journal_lines(journal, "r")] == [4]
+
+
+# === טסט 3: שורה חלקית בסוף היומן (קריסה באמצע כתיבה) מדולגת ===
+def test_partial_tail_ignored(tmp_path):
+    journal = MoveJournal(tmp_path)
+    state = GameState()
+    state.start_game()
+    play(state, journal, "r", MOVES[:2])
+    journal.flush_sync()
+    with open(journal.room_dir("r") / JOURNAL_FILE, "a", encoding="utf-8") as f:
+        f.write('{"from":"e2","to"')
+
+    restored = MoveJournal(tmp_path).recover(GameState)["r"]
+    assert restored.version == state.version
+
+
+# === טסט 4: חדר שנסגר נמחק מהיומן ולא חוזר ===
+def test_discard_removes_room(tmp_path):
+    journal = MoveJournal(tmp_path)
+    state = GameState()
+    state.start_game()
+    play(state, journal, "r", MOVES[:1])
+    journal.discard("r")
+    journal.flush_sync()
+    assert not journal.room_dir("r").exists()
+    assert MoveJournal(tmp_path).recover(GameState) == {}
+
+
+# === טסט 5: שרת שכובה ועולה מחדש ממשיך את המשחקים ===
+def test_server_restart_recovers_rooms(tmp_path):
+    async def scenario():
+        server = GameServer(MoveJournal(tmp_path, flush_interval=0.01))
+        await server.start()
+        room = server.rooms.get_or_create("keep")
+        white = FakeWebSocket()
+        await server.register_client(white, room)
+        await server.handle_move_request(white, {"action": "move", "from": "b1", "to": "a3", "piece": "NW_1"})
+        await server.close()
+
+        restarted = GameServer(MoveJournal(tmp_path))
+        await restarted.start()
+        restored = restarted.rooms.get("keep")
+        assert restored is not None and restored.game_state.version == 1
+        assert "keep" in restarted.room_timers
+        await restarted.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 6: חדר lockstep במצב טיקים חוזר באותו מצב גם לפני תמונת המצב הראשונה ===
+def test_room_mode_survives_restart_without_snapshot(tmp_path):
+    async def scenario():
+        server = GameServer(MoveJournal(tmp_path, flush_interval=0.01))
+        await server.start()
+        room = server.rooms.get_or_create("steps", tick_hz=20, lockstep=True)
+        white = FakeWebSocket()
+        await server.register_client(white, room)
+        await server.handle_move_request(white, {"action": "move", "from": "b1", "to": "a3", "piece": "NW_1"})
+        await server.close()
+        assert (tmp_path / "steps" / ROOM_FILE).exists()
+        assert not (tmp_path / "steps" / SNAPSHOT_FILE).exists()
+
+        restarted = GameServer(MoveJournal(tmp_path))
+        await restarted.start()
+        restored = restarted.rooms.get("steps")
+        assert restored.tick_hz == 20
+        assert restored.game_state.step_ms == room.game_state.step_ms > 0
+        assert restored.game_state.flights == room.game_state.flights
+        await restarted.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 7: מהלך ביומן שלא מתבצע שוב מכשיל את השחזור ===
+def test_replay_failure_fails_recovery(tmp_path):
+    journal = MoveJournal(tmp_path)
+    state = GameState()
+    state.start_game()
+    play(state, journal, "r", MOVES[:2])
+    journal.flush_sync()
+    with open(journal.room_dir("r") / JOURNAL_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"from": "a1", "to": "a5", "piece_id": "RW_1", "player": "white",
+                            "timestamp": 200, "seq": 3}) + "\n")
+
+    with pytest.raises(JournalReplayError):
+        MoveJournal(tmp_path).recover(GameState)
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from FakeWebSocket import FakeWebSocket
+from GameServer import GameServer
+from RateLimiter import ConnectionLimiter, LoopLagMonitor, MAX_FRAME_BYTES, TokenBucket
+
+
+# === טסט 1: הדלי מאפשר פרץ ואז מתמלא בקצב הקבוע ===
+def test_token_bucket_burst_and_refill():
+    bucket = TokenBucket(rate=2.0, capacity=3, now=0.0)
+    assert [bucket.allow(0.0) for _ in range(4)] == [True, True, True, False]
+    assert bucket.retry_after(0.0) == 0.5
+    assert bucket.allow(0.5)
+    assert not bucket.allow(0.5)
+
+
+# === טסט 2: לכל סוג פעולה דלי משלו ===
+def test_limiter_separate_buckets():
+    limiter = ConnectionLimiter({"move": (1.0, 1), "*": (1.0, 1)})
+    assert limiter.allow("move", 0.0)
+    assert not limiter.allow("move", 0.0)
+    assert limiter.allow("get_state", 0.0)
+    assert not limiter.allow("something", 0.0)  # get_state ושאר הפעולות חולקים את "*"
+
+
+async def connected_server():
+    server = GameServer()
+    room = server.rooms.get_or_create("spam")
+    websocket = FakeWebSocket()
+    await server.register_client(websocket, room)
+    await server.drain()
+    websocket.sent.clear()
+    return server, room, websocket
+
+
+# === טסט 3: הצפת מהלכים - מעבר לפרץ כל מהלך נדחה עם סיבה ונספר ===
+def test_move_spam_rate_limited():
+    async def scenario():
+        server, room, websocket = await connected_server()
+        limiter = ConnectionLimiter({"move": (1.0, 5)})
+        frame = json.dumps({"action": "move", "from": "a2", "to": "a3", "piece": "PW_1"})
+        for _ in range(12):
+            await server.handle_message(websocket, room, limiter, frame)
+        await server.drain()
+        limited = [m for m in websocket.sent if m.get("reason") == "rate_limited"]
+        assert len(limited) == 7
+        assert limited[0]["type"] == "move_error" and limited[0]["retry_after_ms"] > 0
+        assert (limited[0]["from"], limited[0]["to"]) == ("a2", "a3")
+        assert server.drop_report()["drops"] == {"rate_limited:move": 7}
+
+    asyncio.run(scenario())
+
+
+# === טסט 4: מסגרת גדולה מדי נזרקת בלי פענוח ובלי תשובה ===
+def test_oversized_frame_dropped():
+    async def scenario():
+        server, room, websocket = await connected_server()
+        await server.handle_message(websocket, room, ConnectionLimiter(), "{" * (MAX_FRAME_BYTES + 1))
+        await server.handle_message(websocket, room, ConnectionLimiter(), b"\x7f")
+        assert websocket.sent == []
+        assert server.drops.report() == {"frame_too_large": 1, "bad_frame": 1}
+
+    asyncio.run(scenario())
+
+
+# === טסט 5: בעומס get_state נזרק אבל מהלכים עוברים ===
+def test_overload_sheds_get_state_only():
+    async def scenario():
+        server, room, websocket = await connected_server()
+        server.lag_monitor.lag_ms = 500.0
+        limiter = ConnectionLimiter()
+        await server.handle_message(websocket, room, limiter, json.dumps({"action": "get_state"}))
+        await server.handle_message(websocket, room, limiter,
+                                    json.dumps({"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"}))
+        await server.drain()
+        types = [m["type"] for m in websocket.sent]
+        assert types[0] == "rate_limited" and websocket.sent[0]["reason"] == "overload"
+        assert "move_executed" in types and "full_state" not in types
+        assert server.drops.report() == {"overload:get_state": 1}
+
+    asyncio.run(scenario())
+
+
+# === טסט 6: חסימה של הלולאה נמדדת כפיגור ===
+def test_lag_monitor_detects_blocking():
+    async def scenario():
+        monitor = LoopLagMonitor(interval=0.02, threshold_ms=50)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        assert not monitor.overloaded
+        time.sleep(0.3)  # חוסם את הלולאה בכוונה
+        await asyncio.sleep(0.03)
+        assert monitor.overloaded and monitor.max_lag_ms >= 200
+        await monitor.stop()
+
+    asyncio.run(scenario())
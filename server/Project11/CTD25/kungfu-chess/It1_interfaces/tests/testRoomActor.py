@@ -0,0 +1,205 @@
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from FakeWebSocket import FakeWebSocket
+from GameServer import GameServer
+from RateLimiter import ConnectionLimiter
+from RoomActor import RoomActor
+
+
+# === טסט 1: הבקשות מתבצעות אחת-אחת לפי סדר ההגעה, גם כשבקשה מחכה באמצע ===
+def test_jobs_run_in_order_one_at_a_time():
+    async def scenario():
+        actor = RoomActor("order")
+        log = []
+
+        def job(name, delay):
+            async def run():
+                log.append(f"start {name}")
+                await asyncio.sleep(delay)
+                log.append(f"end {name}")
+            return run
+
+        actor.submit("move", job("a", 0.01))
+        actor.submit("move", job("b", 0))
+        assert actor.metrics()["depth"] == 2
+        await actor.join()
+        assert log == ["start a", "end a", "start b", "end b"]
+        metrics = actor.metrics()
+        assert metrics["processed"] == 2 and metrics["depth"] == 0 and metrics["max_depth"] == 2
+        assert metrics["max_run_ms"] >= 10 and metrics["max_wait_ms"] >= metrics["avg_wait_ms"]
+
+    asyncio.run(scenario())
+
+
+# === טסט 2: תיבה מלאה זורקת, בקשה שנכשלה לא עוצרת את החדר, וסגירה זורקת את מה שמחכה ===
+def test_full_inbox_failures_and_close():
+    async def scenario():
+        actor = RoomActor("full", max_depth=2)
+        done = []
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        async def ok():
+            done.append(1)
+
+        assert actor.submit("move", fail)
+        assert actor.submit("move", ok)
+        assert not actor.submit("move", ok)
+        await actor.join()
+        assert done == [1]
+        assert actor.metrics()["failed"] == 1 and actor.metrics()["dropped"] == 1
+
+        actor.submit("move", ok)
+        actor.close()
+        await actor.join()
+        assert done == [1] and actor.metrics()["dropped"] == 2
+        assert not actor.submit("move", ok)
+
+    asyncio.run(scenario())
+
+
+# === טסט 3: הקורא רק מכניס לתיבה - המהלך מתבצע במשימה של החדר, והמדדים נחשפים ===
+def test_reader_only_enqueues():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("actor")
+        white = FakeWebSocket()
+        await server.register_client(white, room)
+        await server.drain()
+        limiter = ConnectionLimiter()
+
+        await server.handle_message(white, room, limiter, json.dumps(
+            {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"}))
+        # הקורא חזר לפני שהמהלך בוצע - הוא מחכה בתיבה
+        assert room.game_state.version == 0
+        assert server.inbox_report()["actor"]["depth"] == 1
+        await server.drain()
+        assert room.game_state.version == 1
+        assert any(m["type"] == "move_executed" for m in white.sent)
+        # הכניסה לחדר והמהלך - שניהם עברו בתיבה
+        assert server.inbox_report()["actor"]["processed"] == 2
+
+        # ping נענה ישר מהקורא, בלי לעבור בתיבה
+        await server.handle_message(white, room, limiter, json.dumps({"action": "ping", "t0": 5}))
+        assert server.inbox_report()["actor"]["depth"] == 0
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 4: תיבה מלאה - המהלך נדחה מיד עם from/to כדי שהלקוח יבטל את הניחוש ===
+def test_inbox_full_rejects_move():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("busy")
+        white = FakeWebSocket()
+        await server.register_client(white, room)
+        await server.drain()
+        server.actors["busy"] = RoomActor("busy", max_depth=1)
+        limiter = ConnectionLimiter()
+
+        await server.handle_message(white, room, limiter, json.dumps(
+            {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"}))
+        await server.handle_message(white, room, limiter, json.dumps(
+            {"action": "move", "from": "g1", "to": "f3", "piece": "NW_2"}))
+        await server.drain()
+        rejected = [m for m in white.sent if m.get("reason") == "inbox_full"]
+        assert len(rejected) == 1 and (rejected[0]["from"], rejected[0]["to"]) == ("g1", "f3")
+        assert server.drops.report() == {"inbox_full:move": 1}
+        assert server.inbox_report()["busy"]["dropped"] == 1
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 5: התעוררות של ציר הזמן נכנסת גם לתיבה מלאה - ההגעה לא נתקעת ===
+def test_timeline_wakeup_not_dropped_when_inbox_full():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("wake")
+        white = FakeWebSocket()
+        await server.register_client(white, room)
+        await server.drain()
+        await server.handle_move_request(white, {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"})
+        server.actors["wake"] = RoomActor("wake", max_depth=1)
+        limiter = ConnectionLimiter()
+        await server.handle_message(white, room, limiter, json.dumps({"action": "get_state"}))
+        assert server.inbox_report()["wake"]["depth"] == 1
+
+        due_ms = room.game_state.next_event_ms()
+        room.game_state.resume_clock(due_ms + 1)
+        assert server.fire_timers(server.clock_ms() + 10 ** 6) >= 1
+        assert server.inbox_report()["wake"]["depth"] == 2
+        await server.drain()
+        assert any(m["type"] == "piece_arrived" for m in white.sent)
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 6: כניסה, ניתוק ותפוגת מושב עוברים בתיבה - לפי הסדר מול המהלכים שכבר בה ===
+def test_lifecycle_runs_in_room_order():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("life")
+        white, black = FakeWebSocket(), FakeWebSocket()
+        await server.register_client(white, room)
+        await server.register_client(black, room)
+        await server.drain()
+        token = white.sent[0]["resume_token"]
+        limiter = ConnectionLimiter()
+
+        await server.handle_message(white, room, limiter, json.dumps(
+            {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"}))
+        await server.remove_client(white)
+        await server.drain()
+        kinds = [m["type"] for m in black.sent]
+        assert kinds.index("move_executed") < kinds.index("player_disconnected")
+
+        # תפוגת המושב נכנסת לתיבה ומשדרת ממנה, לא ממשימה צדדית
+        processed = server.inbox_report()["life"]["processed"]
+        server.fire_timers(server.seat_timers[token].due_ms + 1000)
+        assert server.inbox_report()["life"]["depth"] >= 1
+        await server.drain()
+        assert "player_left" in [m["type"] for m in black.sent]
+        assert server.inbox_report()["life"]["processed"] > processed
+        assert token not in server.seat_timers and not server.room_tasks
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 7: "המשחק מלא" נשלח מהקורא - חיבור איטי שנדחה לא תוקע את התיבה של החדר ===
+def test_full_room_error_not_sent_from_inbox():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("crowded")
+        await server.register_client(FakeWebSocket(), room)
+        await server.register_client(FakeWebSocket(), room)
+        release = asyncio.Event()
+        slow = FakeWebSocket()
+        deliver = slow.send
+
+        async def stalled_send(frame):
+            await release.wait()
+            await deliver(frame)
+        slow.send = stalled_send
+
+        joining = asyncio.ensure_future(server.register_client(slow, room))
+        await asyncio.sleep(0.01)
+
+        async def probe():
+            return "free"
+        assert await asyncio.wait_for(server.actor_for(room).call("probe", probe), 1) == "free"
+        release.set()
+        assert await joining is None
+        assert slow.types() == ["error"]
+        await server.close()
+
+    asyncio.run(scenario())
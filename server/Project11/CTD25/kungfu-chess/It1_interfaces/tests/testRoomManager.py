@@ -0,0 +1,424 @@
+import asyncio
+import json
+import os
+import sys
+from collections import deque
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import GameServer as game_server_module
+from FakeWebSocket import FakeWebSocket
+from GameServer import GameServer, GameState
+from RateLimiter import ConnectionLimiter
+from RoomManager import Room, RoomManager
+
+
+# === טסט 1: יצירה וחיפוש של חדר מחזירים את אותו אובייקט ===
+def test_get_or_create_returns_same_room():
+    manager = RoomManager(GameState)
+    room = manager.get_or_create("abc")
+    assert manager.get_or_create("abc") is room
+    assert manager.get("abc") is room
+    assert len(manager) == 1
+
+
+# === טסט 2: לכל חדר מצב משחק נפרד ===
+def test_rooms_have_separate_game_state():
+    manager = RoomManager(GameState)
+    first = manager.get_or_create("a")
+    second = manager.get_or_create("b")
+    assert first.game_state is not second.game_state
+
+
+# === טסט 3: חדר ריק נמחק מהרישום ===
+def test_remove_if_empty():
+    manager = RoomManager(GameState)
+    room = manager.get_or_create("gone")
+    assert manager.remove_if_empty(room)
+    assert manager.get("gone") is None
+
+
+# === טסט 4: מהלך בחדר אחד משודר רק ללקוחות של אותו חדר ===
+def test_move_broadcast_stays_in_room():
+    async def scenario():
+        server = GameServer()
+        room_a = server.rooms.get_or_create("a")
+        room_b = server.rooms.get_or_create("b")
+        white_a, black_a, white_b = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+
+        assert await server.register_client(white_a, room_a) == "white"
+        assert await server.register_client(black_a, room_a) == "black"
+        assert await server.register_client(white_b, room_b) == "white"
+
+        await server.drain()
+        before_b = len(white_b.sent)
+        await server.handle_move_request(white_a, {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"})
+        await server.drain()
+
+        assert "move_executed" in black_a.types()
+        assert len(white_b.sent) == before_b
+        assert room_b.game_state.board_state.get("b1") == "NW"
+
+    asyncio.run(scenario())
+
+
+# === טסט 5: שחקן שלישי בחדר נדחה, אבל חדר אחר עדיין פתוח ===
+def test_third_player_rejected_per_room():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("full")
+        for _ in range(2):
+            await server.register_client(FakeWebSocket(), room)
+        extra = FakeWebSocket()
+        assert await server.register_client(extra, room) is None
+        assert extra.types() == ["error"]
+
+        other = server.rooms.get_or_create("other")
+        assert await server.register_client(FakeWebSocket(), other) == "white"
+
+    asyncio.run(scenario())
+
+
+# === טסט 6: מזהה החדר נקרא מכתובת החיבור ===
+def test_connection_params_room():
+    assert GameServer.get_connection_params(FakeWebSocket("/?room=xyz")) == {"room": "xyz"}
+    assert GameServer.get_connection_params(FakeWebSocket("/")) == {}
+
+
+class SlowWebSocket(FakeWebSocket):
+    """חיבור שכל שליחה אליו לוקחת זמן"""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    async def send(self, message):
+        await asyncio.sleep(self.delay)
+        await super().send(message)
+
+
+# === טסט 7: שידור לא מחכה לחיבור איטי - כל לקוח מקבל מהתור שלו, עם זמני שליחה ===
+def test_broadcast_is_concurrent_and_timed():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("fanout")
+        slow, fast = SlowWebSocket(0.2), FakeWebSocket()
+        room.clients[slow] = {"color": "white", "player_id": "player_1"}
+        room.clients[fast] = {"color": "black", "player_id": "player_2"}
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        assert await server.broadcast_to_all(room, {"type": "info", "message": "hi"}) == 2
+        assert loop.time() - start < 0.05
+
+        await server.writers[fast].drain()
+        assert fast.types() == ["info"] and slow.sent == []
+        await server.drain()
+        assert loop.time() - start < 0.35
+        report = room.send_latency_report()
+        assert report["player_1"]["count"] == 1 and report["player_1"]["last_ms"] >= 150
+        assert report["player_2"]["count"] == 1 and report["player_2"]["last_ms"] < 50
+
+    asyncio.run(scenario())
+
+
+# === טסט 8: ההגעה משודרת מתוך ציר הזמן של החדר, בלי בקשה נוספת מהלקוח ===
+def test_arrival_broadcast_from_timeline():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("timeline")
+        white = FakeWebSocket()
+        await server.register_client(white, room)
+        await server.handle_move_request(white, {"action": "move", "from": "b1", "to": "a3", "piece": "NW_1"})
+        assert "piece_arrived" not in white.types()
+        assert room.room_id in server.room_timers
+
+        await asyncio.sleep(1.4)
+        arrived = [m for m in white.sent if m["type"] == "piece_arrived"]
+        assert len(arrived) == 1 and arrived[0]["changes"] == {"a3": "NW"}
+        assert room.game_state.board_state["a3"] == "NW"
+
+    asyncio.run(scenario())
+
+
+# === טסט 9: מאגר ההשלמה מחזיר רק את מה שפוספס, או None כשהפער גדול מדי ===
+def test_messages_since():
+    room = Room("r", None, replay_size=3)
+    for number in range(5):
+        room.stamp({"type": "info", "n": number})
+    assert [m["seq"] for m in room.messages_since(3)] == [4, 5]
+    assert room.messages_since(5) == []
+    assert room.messages_since(2) == [room.replay[0], room.replay[1], room.replay[2]]
+    assert room.messages_since(1) is None
+    assert room.messages_since(9) is None
+
+
+# === טסט 10: שחקן שחוזר עם token מקבל את אותו צבע ורק את ההודעות שפספס ===
+def test_resume_same_seat_with_missed_messages():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("resume")
+        white, black = FakeWebSocket(), FakeWebSocket()
+        await server.register_client(white, room)
+        await server.register_client(black, room)
+        await server.drain()
+        token = white.sent[0]["resume_token"]
+        last_seq = max(m.get("seq", 0) for m in white.sent)
+
+        await server.remove_client(white)
+        # המושב שמור - שחקן חדש לא יכול לתפוס את הצבע הלבן
+        intruder = FakeWebSocket()
+        assert await server.register_client(intruder, room) is None
+
+        await server.handle_move_request(black, {"action": "move", "from": "g8", "to": "f6", "piece": "NB_1"})
+
+        back = FakeWebSocket()
+        assert await server.resume_client(back, room, token, last_seq) == "white"
+        await server.drain()
+        assert back.types()[0] == "resumed"
+        assert "full_state" not in back.types()
+        missed_seqs = [m["seq"] for m in back.sent[1:] if "seq" in m]
+        assert missed_seqs == list(range(last_seq + 1, missed_seqs[-1] + 1))
+        assert "move_executed" in back.types()
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 11: פער גדול מהמאגר - מצב מלא אחד במקום השלמה ===
+def test_resume_gap_too_large_sends_snapshot():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("gap")
+        room.replay = deque(maxlen=2)
+        white, black = FakeWebSocket(), FakeWebSocket()
+        await server.register_client(white, room)
+        await server.register_client(black, room)
+        await server.drain()
+        token = white.sent[0]["resume_token"]
+
+        await server.remove_client(white)
+        for _ in range(3):
+            await server.broadcast_to_all(room, {"type": "info", "message": "x"})
+
+        back = FakeWebSocket()
+        await server.resume_client(back, room, token, 1)
+        await server.drain()
+        assert back.types()[:2] == ["resumed", "full_state"]
+        assert back.sent[1]["seq"] == room.seq - 1  # לפני ההודעה על החזרה
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 12: מושב שלא חזרו אליו בזמן מתפנה, וחדר ריק נסגר ===
+def test_held_seat_expires(monkeypatch):
+    monkeypatch.setattr(game_server_module, "SEAT_HOLD_SECONDS", 0.05)
+
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("expire")
+        white = FakeWebSocket()
+        await server.register_client(white, room)
+        await server.drain()
+        token = white.sent[0]["resume_token"]
+        await server.remove_client(white)
+        assert server.rooms.get("expire") is room
+
+        await asyncio.sleep(0.1)
+        assert server.rooms.get("expire") is None
+        assert await server.resume_client(FakeWebSocket(), room, token, 0) is None
+
+    asyncio.run(scenario())
+
+
+# === טסט 13: בקשות get_state חוזרות באותה גרסה - מצב מלא אחד נבנה ומקודד פעם אחת ===
+def test_full_state_cached_until_room_changes():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("cache")
+        white, black = FakeWebSocket(), FakeWebSocket()
+        await server.register_client(white, room)
+        await server.register_client(black, room)
+        await server.drain()
+
+        built, hits = room.snapshots_built, room.snapshot_hits
+        for _ in range(5):
+            await server.handle_message(white, room, ConnectionLimiter(), json.dumps({"action": "get_state"}))
+            await server.drain()
+        assert room.snapshots_built == built + 1
+        assert room.snapshot_hits == hits + 4
+        states = [m for m in white.sent if m["type"] == "full_state"][-5:]
+        assert all(state == states[0] for state in states)
+        assert states[0]["seq"] == room.seq
+
+        await server.handle_move_request(white, {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"})
+        await server.handle_message(white, room, ConnectionLimiter(), json.dumps({"action": "get_state"}))
+        await server.drain()
+        fresh = white.sent[-1]
+        assert fresh["type"] == "full_state"
+        assert room.snapshots_built == built + 2
+        assert fresh["version"] == room.game_state.version
+        assert fresh["seq"] == room.seq
+        assert fresh["board"].get("b1") is None
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 14: חדר במצב טיקים שולח מהלכים מהירים כעדכון אחד, וחדר רגיל ממשיך לשדר מיד ===
+def test_tick_mode_room_sends_one_update_per_tick():
+    async def scenario():
+        server = GameServer()
+        ticked = server.rooms.get_or_create("ticked", tick_hz=20)
+        immediate = server.rooms.get_or_create("immediate")
+        assert (ticked.tick_hz, immediate.tick_hz) == (20, 0)
+        views = {}
+        for room in (ticked, immediate):
+            white, black = FakeWebSocket(), FakeWebSocket()
+            await server.register_client(white, room)
+            await server.register_client(black, room)
+            for move in ({"from": "b1", "to": "c3", "piece": "NW_1"},
+                         {"from": "g1", "to": "f3", "piece": "NW_2"},
+                         {"from": "b2", "to": "b3", "piece": "PW_2"}):
+                await server.handle_move_request(white, dict(move, action="move"))
+            views[room.room_id] = black
+
+        await server.drain()
+        assert views["immediate"].types().count("move_executed") == 3
+        assert "move_executed" not in views["ticked"].types()
+
+        await asyncio.sleep(0.12)
+        await server.drain()
+        update = next(m for m in views["ticked"].sent if m["type"] == "board_delta")
+        assert [move["to"] for move in update["executed"]] == ["c3", "f3", "b3"]
+        assert update["moves"] == 3
+        assert all(update["changes"][square] is None for square in ("b1", "g1", "b2"))
+        assert update["seq"] == ticked.replay[-1]["seq"]
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 15: הודעה שאינה שינוי לוח לא עוקפת שינויים שמחכים לטיק ===
+def test_tick_mode_flushes_before_other_messages():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("ordered", tick_hz=10)
+        white, black = FakeWebSocket(), FakeWebSocket()
+        await server.register_client(white, room)
+        await server.register_client(black, room)
+        await server.handle_move_request(white, {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"})
+        await server.broadcast_to_all(room, {"type": "info", "message": "שלום"})
+        await server.drain()
+
+        assert black.types()[-2:] == ["move_executed", "info"]
+        assert room.pending_updates == [] and room.room_id not in server.tick_timers
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 16: מצב טיקים נבחר מכתובת החיבור, רק למי שיוצר את החדר ===
+def test_tick_param_selects_mode_for_new_room():
+    class SilentWebSocket(FakeWebSocket):
+        """חיבור שנרשם ונסגר בלי לשלוח אף הודעה"""
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            raise StopAsyncIteration
+
+    async def scenario():
+        server = GameServer()
+        await server.handle_client(SilentWebSocket("/?room=t&tick=30"))
+        await server.handle_client(SilentWebSocket("/?room=t&tick=5"))
+        await server.handle_client(SilentWebSocket("/?room=bad&tick=nan"))
+        assert server.rooms.get("t").tick_hz == 30
+        assert server.rooms.get("bad").tick_hz == game_server_module.ROOM_TICK_HZ
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 17: ping מקבל pong עם ה-t0 של הלקוח וזמן המשחק של החדר ===
+def test_ping_answered_with_room_game_time():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("clock")
+        white = FakeWebSocket()
+        await server.register_client(white, room)
+        room.game_state.resume_clock(60000)
+
+        await server.handle_message(white, room, ConnectionLimiter(), json.dumps({"action": "ping", "t0": 1234}))
+        await server.handle_message(white, room, ConnectionLimiter(), json.dumps({"action": "ping", "t0": "x"}))
+        await server.drain()
+        pongs = [m for m in white.sent if m["type"] == "pong"]
+        assert len(pongs) == 1 and pongs[0]["t0"] == 1234
+        assert 60000 <= pongs[0]["server_ms"] < 61000
+        assert "seq" not in pongs[0]
+        assert server.drops.report() == {"bad_frame": 1}
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 18: move_error מחזיר את ה-from/to של המהלך, כדי שהלקוח יבטל את הניחוש שלו ===
+def test_move_error_names_rejected_move():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("predict")
+        white, black = FakeWebSocket(), FakeWebSocket()
+        await server.register_client(white, room)
+        await server.register_client(black, room)
+        await server.handle_message(white, room, ConnectionLimiter(), json.dumps(
+            {"action": "move", "from": "a2", "to": "a5", "piece": "PW_1"}))
+        await server.drain()
+        errors = [m for m in white.sent if m["type"] == "move_error"]
+        assert len(errors) == 1 and (errors[0]["from"], errors[0]["to"]) == ("a2", "a5")
+        assert "move_error" not in black.types()
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 19: premove - אישור וביטול רק לבעליו, והמהלך עצמו משודר לכולם בסוף המנוחה ===
+def test_premove_private_replies_and_public_move():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("premove")
+        white, black = FakeWebSocket(), FakeWebSocket()
+        await server.register_client(white, room)
+        await server.register_client(black, room)
+        limiter = ConnectionLimiter()
+        await server.handle_move_request(white, {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"})
+        room.game_state.resume_clock(room.game_state.flights[1]["arrive_at"] + 1)
+
+        await server.handle_message(white, room, limiter, json.dumps(
+            {"action": "premove", "from": "c3", "to": "e4", "piece": "NW_1"}))
+        await server.handle_message(black, room, limiter, json.dumps(
+            {"action": "premove", "from": "c3", "to": "d5", "piece": "NW_1"}))  # כלי במנוחה - אבל לא שלו
+        await server.drain()
+        queued = next(m for m in white.sent if m["type"] == "premove_queued")
+        assert queued["to"] == "e4"
+        assert [m["type"] for m in black.sent if m["type"].startswith("premove")] == ["premove_cancelled"]
+        assert "premove_queued" not in black.types()
+
+        room.game_state.resume_clock(queued["execute_at"] + 5)
+        await server.run_room_events(room)
+        await server.drain()
+        for websocket in (white, black):
+            premoved = [m for m in websocket.sent if m["type"] == "move_executed" and m.get("premove")]
+            assert len(premoved) == 1 and premoved[0]["timestamp"] == queued["execute_at"]
+
+        # premove לכלי שכבר לא במנוחה הוא מהלך רגיל
+        await server.handle_message(black, room, limiter, json.dumps(
+            {"action": "premove", "from": "b8", "to": "c6", "piece": "NB_1"}))
+        await server.drain()
+        assert any(m["type"] == "move_executed" and m["from"] == "b8" and not m.get("premove") for m in white.sent)
+        await server.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,75 @@
+import os
+import pathlib
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import RulesRegistry
+from BoardHash import PIECE_TYPES
+from GameServer import GameState
+from RulesRegistry import PIECES_DIR, RulesRegistry as Registry, shared_rules
+
+
+# === טסט 1: כל החדרים חולקים את אותו רישום חוקים ===
+def test_rooms_share_one_registry():
+    first, second = GameState(), GameState()
+    assert first.rules is second.rules is shared_rules()
+    assert first.move_tables.get("NW") is second.move_tables.get("NW")
+
+
+# === טסט 2: יצירת חדר אחרי הטעינה לא קוראת קבצים ===
+def test_new_room_reads_no_files(monkeypatch):
+    shared_rules()
+
+    def no_io(*args, **kwargs):
+        raise AssertionError("קריאת קבצים בזמן בניית חדר")
+
+    monkeypatch.setattr(RulesRegistry.MoveTables, "load", no_io)
+    monkeypatch.setattr(RulesRegistry, "load_move_speeds", no_io)
+    state = GameState()
+    assert state.move_speeds["NW"] > 0
+
+
+# === טסט 3: הרישום לקריאה בלבד ===
+def test_registry_is_read_only():
+    registry = shared_rules()
+    with pytest.raises(TypeError):
+        registry.move_speeds["NW"] = 99.0
+    with pytest.raises(TypeError):
+        registry.move_tables.rules["XX"] = None
+    with pytest.raises(TypeError):
+        registry.move_tables.get("NW").jump_table[0] = 0
+
+
+# === טסט 4: רישום נפרד (למשל לבדיקות) עובר ל-GameState במפורש ===
+def test_explicit_registry():
+    registry = Registry.load(PIECES_DIR)
+    state = GameState(rules=registry)
+    assert state.rules is registry is not shared_rules()
+    assert set(registry.piece_types) == set(shared_rules().piece_types)
+
+
+# === טסט 5: ברירת המחדל של השרת היא תיקיית הכלים של הלקוח בריפו ===
+def test_default_pieces_dir_is_client_copy():
+    repo_root = pathlib.Path(__file__).resolve().parents[6]
+    client_pieces = repo_root / "client" / "Project11" / "CTD25" / "kungfu-chess" / "pieces"
+    assert RulesRegistry.REPO_ROOT == repo_root
+    if "PIECES_DIR" not in os.environ:
+        assert PIECES_DIR == client_pieces
+    assert all((client_pieces / piece_type / "moves.txt").exists() for piece_type in PIECE_TYPES)
+
+
+# === טסט 6: תיקייה חסרה או כלי בלי חוקים עוצרים את הטעינה, וכלי לא מוכר לא זז ===
+def test_missing_rules_fail_loudly(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        Registry.load(tmp_path / "nowhere")
+    shutil.copytree(PIECES_DIR / "NW", tmp_path / "NW")
+    with pytest.raises(ValueError):
+        Registry.load(tmp_path)
+
+    state = GameState()
+    assert state.is_piece_move_valid("b1", "c3", "NW")
+    assert not state.is_piece_move_valid("b1", "c3", "XW")
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from FakeWebSocket import FakeWebSocket
+from GameServer import GameServer
+from RateLimiter import ConnectionLimiter
+from SpectatorRelay import WEAK_LINK_BACKLOG, WEAK_LINK_RATE, coalesce
+
+
+async def settle(server, room):
+    """המתנה עד שהממסר העביר הכל לתורים של הצופים, ושהתורים התרוקנו"""
+    relay = server.relays[room.room_id]
+    for _ in range(1000):
+        if all(cursor >= room.seq for cursor in relay.cursors.values()):
+            break
+        await asyncio.sleep(0)
+    await server.drain()
+
+
+async def start_room(server, room_id="r"):
+    room = server.rooms.get_or_create(room_id)
+    white, black = FakeWebSocket(), FakeWebSocket()
+    await server.register_client(white, room)
+    await server.register_client(black, room)
+    return room, white, black
+
+
+# === טסט 1: צופה מקבל את המהלכים עם אותו seq, ומהלך שהוא שולח לא מגיע למשחק ===
+def test_spectator_receives_relayed_moves_and_cannot_move():
+    async def scenario():
+        server = GameServer()
+        room, white, black = await start_room(server)
+        spectator = FakeWebSocket()
+        await server.register_spectator(spectator, room)
+        assert len(room.clients) == 2
+        assert spectator not in room.clients
+
+        await server.handle_move_request(white, {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"})
+        await settle(server, room)
+
+        assert spectator.types()[:2] == ["spectator_joined", "full_state"]
+        executed = [m for m in spectator.sent if m["type"] == "move_executed"]
+        assert [m["seq"] for m in executed] == [m["seq"] for m in black.sent if m["type"] == "move_executed"]
+
+        version = room.game_state.version
+        await server.handle_spectator_message(spectator, room, ConnectionLimiter(),
+                                              json.dumps({"action": "move", "from": "g8", "to": "f6", "piece": "NB_1"}))
+        assert room.game_state.version == version
+        assert server.drops.report() == {"spectator_input:move": 1}
+
+    asyncio.run(scenario())
+
+
+# === טסט 2: צופים שמצטרפים באמצע מקבלים תמונת מצב שמורה + זנב היומן ===
+def test_late_joiners_share_cached_snapshot():
+    async def scenario():
+        server = GameServer()
+        room, white, _ = await start_room(server)
+        first = FakeWebSocket()
+        await server.register_spectator(first, room)
+        built = room.snapshots_built
+        await server.handle_move_request(white, {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"})
+
+        late = [FakeWebSocket() for _ in range(5)]
+        for spectator in late:
+            await server.register_spectator(spectator, room)
+        await settle(server, room)
+
+        # המטמון של החדר, לא עותק של הממסר - והמהלך לא בנה אותו מחדש
+        assert room.snapshots_built == built
+        for spectator in late:
+            # תמונת המצב ישנה מהמהלך - הזנב משלים אותו
+            assert "move_executed" in spectator.types()
+            assert spectator.sent[-1]["seq"] == room.seq
+
+    asyncio.run(scenario())
+
+
+# === טסט 3: אלף צופים לא נכנסים לנתיב השידור של השחקנים ===
+def test_broadcast_counts_players_only_with_many_spectators():
+    async def scenario():
+        server = GameServer()
+        room, _, _ = await start_room(server)
+        spectators = [FakeWebSocket() for _ in range(1000)]
+        for spectator in spectators:
+            await server.register_spectator(spectator, room)
+
+        delivered = await server.broadcast_to_all(room, {"type": "ping"})
+        assert delivered == 2
+        await settle(server, room)
+        assert all(spectator.sent[-1]["type"] == "ping" for spectator in spectators)
+
+    asyncio.run(scenario())
+
+
+# === טסט 4: יציאת הצופה האחרון סוגרת חדר בלי שחקנים ===
+def test_spectator_leaving_closes_empty_room():
+    async def scenario():
+        server = GameServer()
+        room = server.rooms.get_or_create("watch")
+        spectator = FakeWebSocket()
+        await server.register_spectator(spectator, room)
+        assert not room.is_empty()
+
+        await server.remove_client(spectator)
+        assert server.rooms.get("watch") is None
+        assert "watch" not in server.relays
+
+    asyncio.run(scenario())
+
+
+# === טסט 5: מיזוג רצף שינויי לוח להודעת board_delta אחת, שאר ההודעות במקומן ===
+def test_coalesce_merges_board_changes():
+    messages = [
+        {"type": "move_executed", "version": 4, "seq": 10, "changes": {"b1": None}, "captured": None},
+        {"type": "piece_arrived", "version": 5, "seq": 11, "changes": {"c3": "NW"}, "captured": "PB"},
+        {"type": "move_executed", "version": 6, "seq": 12, "changes": {"c3": None}, "captured": None},
+        {"type": "player_disconnected", "seq": 13},
+        {"type": "move_executed", "version": 7, "seq": 14, "changes": {"g8": None}, "captured": None},
+    ]
+    merged = coalesce(messages)
+    assert [m["type"] for m in merged] == ["board_delta", "player_disconnected", "move_executed"]
+    delta = merged[0]
+    assert (delta["base_version"], delta["version"], delta["seq"]) == (3, 6, 12)
+    assert delta["changes"] == {"b1": None, "c3": None}
+    assert delta["captured"] == ["PB"]
+    assert delta["moves"] == 2
+    assert merged[2] is messages[4]
+
+
+# === טסט 6: צופה עם max_rate מקבל מהלכים מהירים כדלתא אחת, השחקנים מקבלים כל מהלך ===
+def test_rate_limited_spectator_gets_merged_delta():
+    async def scenario():
+        server = GameServer()
+        room, white, black = await start_room(server)
+        spectator = FakeWebSocket()
+        await server.register_spectator(spectator, room, max_rate=2)
+
+        for move in ({"from": "b1", "to": "c3", "piece": "NW_1"},
+                     {"from": "g1", "to": "f3", "piece": "NW_2"},
+                     {"from": "b2", "to": "b3", "piece": "PW_2"}):
+            await server.handle_move_request(white, dict(move, action="move"))
+        await asyncio.sleep(0.6)
+        await settle(server, room)
+
+        assert black.types().count("move_executed") == 3
+        assert "board_delta" in spectator.types()
+        updates = [m for m in spectator.sent if m["type"] in ("move_executed", "board_delta")]
+        assert len(updates) < 3
+        merged = next(m for m in updates if m["type"] == "board_delta")
+        assert merged["changes"].get("b2", "missing") is None or merged["changes"].get("g1", "missing") is None
+        assert server.relays[room.room_id].coalesced >= 1
+
+    asyncio.run(scenario())
+
+
+# === טסט 7: צופה שהתור שלו מתמלא עובר אוטומטית לקצב נמוך ===
+def test_weak_link_spectator_is_downshifted():
+    class GatedWebSocket(FakeWebSocket):
+        """שליחה שנתקעת עד שפותחים את השער (חלון TCP מלא)"""
+
+        def __init__(self):
+            super().__init__()
+            self.gate = asyncio.Event()
+
+        async def send(self, message):
+            await self.gate.wait()
+            await super().send(message)
+
+    async def scenario():
+        server = GameServer()
+        room, _, _ = await start_room(server)
+        spectator = GatedWebSocket()
+        await server.register_spectator(spectator, room)
+        relay = server.relays[room.room_id]
+
+        for _ in range(WEAK_LINK_BACKLOG + 2):
+            await server.broadcast_to_all(room, {"type": "ping"})
+        for _ in range(10):
+            await asyncio.sleep(0)
+        await server.broadcast_to_all(room, {"type": "ping"})
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        assert relay.rates[spectator] == WEAK_LINK_RATE and relay.downshifted == 1
+        spectator.gate.set()
+        await server.remove_client(spectator)
+
+    asyncio.run(scenario())
+
+
+# === טסט 8: דלתא שכבר מוזגה (טיק של החדר) ממוזגת שוב בלי לאבד מהלכים ===
+def test_coalesce_remerges_board_delta():
+    tick_update = {"type": "board_delta", "base_version": 3, "version": 5, "seq": 8,
+                   "changes": {"b1": None, "g1": None}, "captured": ["PB"], "moves": 2,
+                   "executed": [{"version": 4, "to": "c3"}, {"version": 5, "to": "f3"}]}
+    move = {"type": "move_executed", "version": 6, "seq": 9, "from": "b2", "to": "b3", "piece": "PW",
+            "captured": None, "promoted": False, "changes": {"b2": None}}
+    delta, = coalesce([tick_update, move])
+    assert (delta["base_version"], delta["version"], delta["seq"], delta["moves"]) == (3, 6, 9, 3)
+    assert [m["to"] for m in delta["executed"]] == ["c3", "f3", "b3"]
+    assert delta["captured"] == ["PB"]
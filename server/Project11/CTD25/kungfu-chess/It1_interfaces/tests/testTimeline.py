@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Timeline import Timeline
+
+
+# === טסט 1: אירועים יוצאים לפי הזמן, ובזמן שווה לפי סדר התזמון ===
+def test_pop_due_in_order():
+    timeline = Timeline()
+    timeline.schedule(300, "arrival", "c")
+    timeline.schedule(100, "arrival", "a")
+    timeline.schedule(100, "cooldown_end", "b")
+    assert timeline.next_due() == 100
+    assert [event.payload for event in timeline.pop_due(100)] == ["a", "b"]
+    assert timeline.pop_due(299) == []
+    assert [event.payload for event in timeline.pop_due(1000)] == ["c"]
+    assert len(timeline) == 0 and timeline.next_due() is None
+
+
+# === טסט 2: אירוע מבוטל לא יוצא ולא נספר ===
+def test_cancelled_event_skipped():
+    timeline = Timeline()
+    first = timeline.schedule(10, "arrival", 1)
+    timeline.schedule(20, "arrival", 2)
+    timeline.cancel(first)
+    timeline.cancel(first)
+    assert len(timeline) == 1
+    assert timeline.next_due() == 20
+    assert [event.payload for event in timeline.pop_due(50)] == [2]
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from GameServer import GameServer
+from TimerWheel import TimerWheel
+
+
+# === טסט 1: טיימרים יוצאים באצווה לפי הזמן, ולא לפני הזמן שלהם ===
+def test_advance_fires_in_order_never_early():
+    wheel = TimerWheel(tick_ms=10)
+    wheel.schedule(305, "rest", "c")
+    wheel.schedule(95, "rest", "a")
+    wheel.schedule(95, "seat", "b")
+    assert wheel.advance(90) == []
+    assert [handle.payload for handle in wheel.advance(100)] == ["a", "b"]
+    assert wheel.advance(300) == []
+    assert [handle.payload for handle in wheel.advance(310)] == ["c"]
+    assert len(wheel) == 0
+
+
+# === טסט 2: ביטול מוציא את הטיימר מיד ===
+def test_cancel():
+    wheel = TimerWheel(tick_ms=10)
+    first = wheel.schedule(50, "rest", 1)
+    wheel.schedule(60, "rest", 2)
+    wheel.cancel(first)
+    wheel.cancel(first)
+    assert len(wheel) == 1
+    assert [handle.payload for handle in wheel.advance(1000)] == [2]
+
+
+# === טסט 3: טיימרים רחוקים עוברים בין הרמות ויוצאים בזמן ===
+def test_far_timers_cascade_between_levels():
+    wheel = TimerWheel(tick_ms=10, slot_bits=2, levels=2)  # רמה 0 = 4 טיקים, רמה 1 = 16, מעבר לזה - overflow
+    dues = [35, 170, 640, 2000]
+    for due in dues:
+        wheel.schedule(due, "timeout", due)
+    fired_at = {}
+    for now in range(0, 2100, 10):
+        for handle in wheel.advance(now):
+            fired_at[handle.payload] = now
+    assert all(due <= fired_at[due] < due + 10 for due in dues)
+
+
+# === טסט 4: אלפי טיימרים אקראיים עם ביטולים - כל אחד יוצא פעם אחת, בזמן ===
+def test_random_schedule_matches_expected():
+    rng = random.Random(7)
+    wheel = TimerWheel(tick_ms=10, slot_bits=4, levels=2)
+    now, pending, fired = 0, {}, 0
+    for _ in range(5000):
+        if rng.random() < 0.5:
+            handle = wheel.schedule(now + rng.randint(1, 30000), "t")
+            pending[handle.order] = handle
+        if pending and rng.random() < 0.1:
+            wheel.cancel(pending.pop(rng.choice(list(pending))))
+        previous, now = now, now + rng.randint(0, 30)
+        for handle in wheel.advance(now):
+            assert previous // 10 * 10 < -(-handle.due_ms // 10) * 10 <= now
+            assert pending.pop(handle.order) is handle
+            fired += 1
+    wheel.advance(now + 10 ** 6)
+    assert len(wheel) == 0 and fired > 1000
+
+
+# === טסט 5: השרת - התעוררות של הרבה חדרים וטיימרי מושבים מגלגל אחד ===
+def test_server_wheel_wakes_rooms_in_one_batch():
+    async def scenario():
+        server = GameServer()
+        woken = []
+
+        async def run_room_events(room):
+            woken.append(room.room_id)
+        server.run_room_events = run_room_events
+
+        rooms = [server.rooms.get_or_create(f"r{i}") for i in range(500)]
+        for room in rooms:
+            server.room_timers[room.room_id] = server.schedule_timer(0, "room", room)
+        server.cancel_room_wakeup(rooms[0])
+
+        assert server.fire_timers(server.clock_ms() + 20) == 499
+        await server.drain()  # כל חדר מריץ את ציר הזמן במשימה שלו (RoomActor)
+        assert sorted(woken) == sorted(room.room_id for room in rooms[1:])
+        assert not server.room_timers
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+# === טסט 6: קפיצות זמן גדולות - אותן יציאות כמו בדיקה ישירה, בלי לעבור טיק-טיק ===
+def test_large_jumps_match_brute_force():
+    rng = random.Random(11)
+    wheel = TimerWheel(tick_ms=10, slot_bits=4, levels=2)
+    now, pending = 0, {}
+    started = time.perf_counter()
+    for _ in range(300):
+        for _ in range(rng.randint(0, 5)):
+            handle = wheel.schedule(now + rng.randint(1, 10 ** 7), "t", now_ms=now)
+            pending[handle.order] = handle
+        now += rng.choice((rng.randint(0, 50), rng.randint(0, 10 ** 7)))
+        expected = sorted(order for order, handle in pending.items() if -(-handle.due_ms // 10) * 10 <= now)
+        assert sorted(handle.order for handle in wheel.advance(now)) == expected
+        for order in expected:
+            del pending[order]
+        assert len(wheel) == len(pending)
+    assert time.perf_counter() - started < 1.0
+
+
+# === טסט 7: גלגל שהתרוקן ולא קודם שעות - טיימר חדש יוצא בזמן ומהר ===
+def test_idle_wheel_realigns_on_schedule():
+    wheel = TimerWheel(tick_ms=10)
+    wheel.schedule(50, "rest", "a")
+    assert [handle.payload for handle in wheel.advance(100)] == ["a"]
+    now = 6 * 3600 * 1000  # שש שעות בלי advance, כמו השרת כשאין טיימרים
+    wheel.schedule(now + 30, "rest", "b", now_ms=now)
+    started = time.perf_counter()
+    assert wheel.advance(now + 20) == []
+    assert [handle.payload for handle in wheel.advance(now + 30)] == ["b"]
+    assert time.perf_counter() - started < 0.05
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+import websockets
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import WireProtocol
+from GameServer import GameServer
+
+
+# === טסט 1: varint ומשבצות עוברים הלוך-חזור ===
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 2 ** 40])
+def test_varint_roundtrip(value):
+    out = bytearray()
+    WireProtocol.write_varint(out, value)
+    assert WireProtocol.read_varint(bytes(out), 0) == (value, len(out))
+
+
+def test_square_index():
+    assert WireProtocol.square_index("a1") == 0
+    assert WireProtocol.square_index("h8") == 63
+    assert WireProtocol.square_name(WireProtocol.square_index("e4")) == "e4"
+
+
+# === טסט 2: הודעות מוכרות מקודדות בצורה דחוסה וחוזרות זהות ===
+@pytest.mark.parametrize("message", [
+    {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"},
+    {"action": "get_state"},
+    {"type": "move_executed", "version": 7, "from": "e7", "to": "e8", "piece": "QB", "captured": None,
+     "promoted": True, "timestamp": 12345, "changes": {"e7": None, "e8": "QB"}},
+    {"type": "full_state", "version": 3, "board": {"a1": "RW", "h8": "RB"}, "game_started": True,
+     "move_history": [], "score": {}},
+    {"type": "move_error", "message": "מהלך לא חוקי"},
+    {"type": "board_delta", "base_version": 4, "version": 9, "changes": {"b1": None, "c3": "NW", "g8": None},
+     "seq": 12, "moves": 3, "captured": []},
+    {"type": "input", "t": 12340, "from": "e2", "to": "e3", "seq": 40},
+    {"type": "input", "t": 2500, "from": "c3", "to": "e4", "premove": True},
+    {"type": "arrive", "seq": 41},
+])
+def test_binary_roundtrip(message):
+    data = WireProtocol.encode_binary(message)
+    assert data[0] != WireProtocol.FRAME_GENERIC
+    assert len(data) < len(json.dumps(message))
+    assert WireProtocol.decode_binary(data) == message
+
+
+# === טסט 2ב: אצווה של מסגרות מקודדות - אותה מעטפת בבינארי וב-JSON ===
+def test_batch_roundtrip():
+    messages = [
+        {"type": "move_executed", "version": 1, "from": "e7", "to": "e8", "piece": "KB", "captured": None,
+         "promoted": False, "timestamp": 10, "changes": {"e7": None}, "seq": 5},
+        {"type": "game_over", "winner": "white", "seq": 6},
+    ]
+    for fmt in (WireProtocol.FORMAT_BINARY, WireProtocol.FORMAT_JSON):
+        frame = WireProtocol.pack_batch([WireProtocol.encode(m, fmt) for m in messages], fmt)
+        assert WireProtocol.decode(frame) == {"type": "batch", "messages": messages}
+
+
+# === טסט 3: שדות לא מוכרים לא הולכים לאיבוד ===
+def test_unknown_fields_survive():
+    message = {"type": "move_executed", "version": 1, "from": "a2", "to": "a3", "piece": "PW", "captured": None,
+               "promoted": False, "timestamp": 5, "changes": {}, "extra_field": [1, 2]}
+    assert WireProtocol.decode_binary(WireProtocol.encode_binary(message)) == message
+
+
+# === טסט 4: הודעה לא מוכרת עוברת כמסגרת כללית ===
+def test_generic_frame():
+    message = {"type": "info", "message": "שלום"}
+    data = WireProtocol.encode_binary(message)
+    assert data[0] == WireProtocol.FRAME_GENERIC
+    assert WireProtocol.decode(data) == message
+    assert WireProtocol.decode(json.dumps(message)) == message
+
+
+# === טסט 4ב: רק צורה בלי קידוד דחוס נופלת למסגרת כללית (ונספרת) - באג בקידוד עולה ===
+def test_fallback_only_for_unsupported_shapes():
+    WireProtocol.fallbacks.clear()
+    message = {"type": "move_executed", "from": "a2", "to": "a3", "piece": "PW_x", "seq": 1}
+    data = WireProtocol.encode_binary(message)
+    assert data[0] == WireProtocol.FRAME_GENERIC
+    assert WireProtocol.decode(data) == message
+    board = {"type": "board_delta", "base_version": 1, "version": 2, "changes": {"a2": "XX"}}
+    assert WireProtocol.encode_binary(board)[0] == WireProtocol.FRAME_GENERIC
+    assert WireProtocol.fallbacks == {"move_executed": 1, "board_delta": 1}
+
+    with pytest.raises(ValueError):
+        WireProtocol.encode_binary({"type": "input", "from": "a2", "to": "a3",
+                                    "t": WireProtocol.SIM_STEP_MS + 1, "seq": 0})
+    with pytest.raises(ValueError):
+        WireProtocol.encode_binary({"type": "board_delta", "base_version": 1, "version": 2,
+                                    "changes": {"z9": "PW"}})
+    assert sum(WireProtocol.fallbacks.values()) == 2
+
+
+# === טסט 5: לקוח בינארי ולקוח JSON באותו חדר מול שרת אמיתי ===
+def test_json_and_binary_clients_side_by_side():
+    async def scenario():
+        server = GameServer()
+        async with websockets.serve(server.handle_client, "127.0.0.1", 0,
+                                    select_subprotocol=WireProtocol.select_subprotocol) as ws_server:
+            port = ws_server.sockets[0].getsockname()[1]
+            uri = f"ws://127.0.0.1:{port}/?room=mixed"
+            async with websockets.connect(uri, subprotocols=WireProtocol.SUBPROTOCOLS) as white, \
+                    websockets.connect(uri) as black:
+                assert white.subprotocol == WireProtocol.SUBPROTOCOL_BINARY
+                assert black.subprotocol is None
+
+                await white.send(WireProtocol.encode_binary(
+                    {"action": "move", "from": "b1", "to": "c3", "piece": "NW_1"}))
+
+                async def wait_for_move(websocket, expect_binary):
+                    while True:
+                        frame = await websocket.recv()
+                        message = WireProtocol.decode(frame)
+                        if message["type"] == "move_executed":
+                            assert isinstance(frame, bytes) == expect_binary
+                            return message
+
+                binary_view = await wait_for_move(white, True)
+                json_view = await wait_for_move(black, False)
+                assert binary_view == json_view
+
+    asyncio.run(asyncio.wait_for(scenario(), 10))
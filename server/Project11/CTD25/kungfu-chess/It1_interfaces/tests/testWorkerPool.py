@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from WorkerPool import WorkerPool, room_worker
+
+
+# === טסט 1: אותו חדר תמיד ממופה לאותו עובד ===
+def test_room_worker_is_stable():
+    assert room_worker("match-42", 4) == room_worker("match-42", 4)
+    assert 0 <= room_worker("match-42", 4) < 4
+
+
+# === טסט 2: חדרים שונים מתפזרים על כל העובדים ===
+def test_rooms_spread_over_workers():
+    used = {room_worker(f"room-{i}", 4) for i in range(100)}
+    assert used == {0, 1, 2, 3}
+
+
+# === טסט 3: הפורט של העובד נבחר לפי החדר שבכתובת ===
+def test_worker_port_for_path():
+    pool = WorkerPool(3, port=9000)
+    assert pool.worker_ports == [9001, 9002, 9003]
+    expected = pool.worker_ports[room_worker("abc", 3)]
+    assert pool.worker_port_for("/?room=abc") == expected
+    assert pool.worker_port_for("/") == pool.worker_ports[room_worker("default", 3)]